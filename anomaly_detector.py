@@ -0,0 +1,259 @@
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import deque
+
+from result_store import flatten_result
+
+DEFAULT_WINDOW = 60
+DEFAULT_SLACK = 1.0
+DEFAULT_THRESHOLD = 6.0
+DEFAULT_CLEAR = 1.0
+DEFAULT_Z_CAP = 3.0
+DEFAULT_MIN_SAMPLES = 10
+DEFAULT_COOLDOWN = 900
+DEFAULT_MAX_ALERTS = 5
+DEFAULT_PERIOD = 600
+MAD_SCALE = 1.4826
+# تجاوز حد ثابت مرتين متتاليتين يكفي للتنبيه مع القيم الافتراضية
+LIMIT_SCORE = 4.5
+RELATIVE_FLOOR = 0.05
+
+# الاتجاه السيئ لكل مقياس: +1 الارتفاع مشكلة، -1 الانخفاض مشكلة
+WATCHED_METRICS = {
+    'ping.avg': 1,
+    'ping.loss': 1,
+    'latency.p50': 1,
+    'latency.p99': 1,
+    'latency.loss': 1,
+    'latency.jitter': 1,
+    'dns.success': -1,
+    'dns.latency': 1,
+    'tcp.success': -1,
+    'tcp.latency': 1,
+    'http.success': -1,
+    'http.latency': 1,
+    'http.tls': 1,
+    'http.ttfb': 1,
+    'http.warm_total': 1,
+    'speed.download': -1,
+    'speed.upload': -1,
+    'dnsbench.cold.p50': 1,
+    'dnsbench.warm.p50': 1,
+    'dnsbench.timeouts': 1,
+}
+METRIC_NAMES = {
+    'ping.avg': 'Ping time',
+    'ping.loss': 'Packet loss',
+    'latency.p50': 'Median latency',
+    'latency.p99': 'p99 latency',
+    'latency.loss': 'Sampling packet loss',
+    'latency.jitter': 'Jitter',
+    'dns.success': 'DNS success rate',
+    'dns.latency': 'DNS lookup time',
+    'tcp.success': 'TCP connect success rate',
+    'tcp.latency': 'TCP connect time',
+    'http.success': 'HTTP success rate',
+    'http.latency': 'HTTP request time',
+    'http.tls': 'TLS handshake time',
+    'http.ttfb': 'HTTP time to first byte',
+    'http.warm_total': 'HTTP time on a reused connection',
+    'speed.download': 'Download speed',
+    'speed.upload': 'Upload speed',
+    'dnsbench.cold.p50': 'Resolver time (cold)',
+    'dnsbench.warm.p50': 'Resolver time (cached)',
+    'dnsbench.timeouts': 'Resolver timeouts',
+}
+
+
+class MetricState:
+    """Rolling baseline of one metric of one target.
+
+    Keeps the last ``window`` samples in arrival order and sorted, and a
+    one-sided CUSUM of the robust z-score in the "bad" direction. An
+    update inserts into and deletes from the sorted list, O(window); the
+    MAD is read from the current median by walking outward through the
+    sorted samples, O(window) as well. The window is small and fixed, so
+    neither ever rescans history. A single outlier moves the CUSUM
+    by at most ``z_cap - slack``; only a sustained deviation crosses the
+    alert threshold.
+    """
+
+    __slots__ = ('direction', 'limit', 'window', 'values', 'sorted_values', 'count', 'cusum', 'alerting')
+
+    def __init__(self, direction, window=DEFAULT_WINDOW, limit=None):
+        self.direction = direction
+        self.limit = limit
+        self.window = window
+        self.values = deque()
+        self.sorted_values = []
+        self.count = 0
+        self.cusum = 0.0
+        self.alerting = False
+
+    def median(self):
+        values = self.sorted_values
+        n = len(values)
+        return (values[(n - 1) // 2] + values[n // 2]) / 2 if n else None
+
+    def mad(self):
+        values = self.sorted_values
+        n = len(values)
+        if not n:
+            return None
+        median = self.median()
+        # الانحرافات مرتبة أصلاً على جانبي الوسيط، فندمجها حتى نبلغ وسيطها
+        below = bisect_left(values, median) - 1
+        above = below + 1
+        deviations = []
+        while len(deviations) <= n // 2:
+            if above < n and (below < 0 or values[above] - median <= median - values[below]):
+                deviations.append(values[above] - median)
+                above += 1
+            else:
+                deviations.append(median - values[below])
+                below -= 1
+        return (deviations[(n - 1) // 2] + deviations[n // 2]) / 2
+
+    def score(self, value, z_cap):
+        """Robust z-score of ``value`` in the bad direction, capped at ``z_cap``.
+
+        Crossing the fixed ``limit`` scores ``LIMIT_SCORE`` instead.
+        """
+        if self.limit is not None and (value - self.limit) * self.direction > 0:
+            # تجاوز الحد الثابت (مثل سرعة تنزيل أقل من 5 Mbps) يعد انحرافاً كاملاً
+            return LIMIT_SCORE
+        median = self.median()
+        if median is None:
+            return 0.0
+        scale = max(MAD_SCALE * self.mad(), RELATIVE_FLOOR * abs(median), 1e-9)
+        return max(min((value - median) / scale * self.direction, z_cap), -z_cap)
+
+    def add(self, value):
+        self.values.append(value)
+        insort(self.sorted_values, value)
+        if len(self.values) > self.window:
+            old = self.values.popleft()
+            del self.sorted_values[bisect_left(self.sorted_values, old)]
+        self.count += 1
+
+
+class AnomalyDetector:
+    """Streaming detector over the metric rows of every result.
+
+    ``process(results)`` updates one ``MetricState`` per (target, metric)
+    and returns state changes only: an ``'alert'`` when the CUSUM rises
+    above ``threshold`` and a ``'clear'`` once it falls back below
+    ``clear`` (hysteresis), so a lasting problem is reported once. Alerts
+    for the same (target, metric) are further held back for ``cooldown``
+    seconds, and at most ``max_alerts`` notifications are let through per
+    ``period`` seconds; the number held back is reported with the next
+    one. Thread-safe.
+    """
+
+    def __init__(self, window=DEFAULT_WINDOW, slack=DEFAULT_SLACK,
+                 threshold=DEFAULT_THRESHOLD, clear=DEFAULT_CLEAR, z_cap=DEFAULT_Z_CAP,
+                 min_samples=DEFAULT_MIN_SAMPLES, cooldown=DEFAULT_COOLDOWN, max_alerts=DEFAULT_MAX_ALERTS,
+                 period=DEFAULT_PERIOD, limits=None, clock=time.monotonic):
+        self.window = window
+        self.slack = slack
+        self.threshold = threshold
+        self.clear = clear
+        self.z_cap = z_cap
+        self.min_samples = min_samples
+        self.cooldown = cooldown
+        self.max_alerts = max_alerts
+        self.period = period
+        self.limits = limits or {}
+        self.clock = clock
+        self.states = {}
+        self.last_notified = {}
+        self.sent = deque()
+        self.suppressed = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        limits = {}
+        for option, metric in (('min_download', 'speed.download'), ('min_upload', 'speed.upload')):
+            value = config.get('Alerts', option, fallback='').strip()
+            if value:
+                limits[metric] = float(value)
+        return cls(
+            window=config.getint('Alerts', 'window', fallback=DEFAULT_WINDOW),
+            threshold=config.getfloat('Alerts', 'threshold', fallback=DEFAULT_THRESHOLD),
+            cooldown=config.getfloat('Alerts', 'cooldown', fallback=DEFAULT_COOLDOWN),
+            max_alerts=config.getint('Alerts', 'max_alerts', fallback=DEFAULT_MAX_ALERTS),
+            period=config.getfloat('Alerts', 'period', fallback=DEFAULT_PERIOD),
+            limits=limits,
+        )
+
+    def observe(self, target, metric, value):
+        """Feed one sample; returns an event dict on a state change, else None."""
+        direction = WATCHED_METRICS.get(metric)
+        if direction is None:
+            return None
+        key = (target, metric)
+        state = self.states.get(key)
+        if state is None:
+            state = self.states[key] = MetricState(direction, self.window, self.limits.get(metric))
+
+        baseline = state.median()
+        if state.count >= self.min_samples or state.limit is not None:
+            z = state.score(value, self.z_cap)
+            state.cusum = max(0.0, state.cusum + z - self.slack)
+        state.add(value)
+
+        if not state.alerting and state.cusum > self.threshold:
+            state.alerting = True
+            kind = 'alert'
+        elif state.alerting and state.cusum < self.clear:
+            state.alerting = False
+            kind = 'clear'
+        else:
+            return None
+        return {'kind': kind, 'target': target, 'metric': metric, 'value': value,
+                'baseline': baseline,
+                'message': self.describe(kind, target, metric, value, baseline, state.limit)}
+
+    @staticmethod
+    def describe(kind, target, metric, value, baseline, limit=None):
+        name = METRIC_NAMES.get(metric, metric)
+        where = f" ({target})" if target else ""
+        if kind == 'clear':
+            return f"{name}{where} is back to normal: {value:.4g}"
+        text = f"{name}{where} is {value:.4g}"
+        if limit is not None and (value - limit) * WATCHED_METRICS[metric] > 0:
+            text += f", limit {limit:.4g}"
+        elif baseline is not None:
+            text += f", baseline {baseline:.4g}"
+        return text
+
+    def process(self, results):
+        events = []
+        with self.lock:
+            for _, target, metric, value in flatten_result(results):
+                event = self.observe(target, metric, value)
+                if event is not None:
+                    events.append(event)
+        return events
+
+    def should_notify(self, event):
+        """Cooldown per (target, metric) and a global rate limit; call once per alert."""
+        if event['kind'] != 'alert':
+            return False
+        now = self.clock()
+        key = (event['target'], event['metric'])
+        with self.lock:
+            while self.sent and now - self.sent[0] >= self.period:
+                self.sent.popleft()
+            last = self.last_notified.get(key)
+            if (last is not None and now - last < self.cooldown) or len(self.sent) >= self.max_alerts:
+                self.suppressed += 1
+                return False
+            self.last_notified[key] = now
+            self.sent.append(now)
+            if self.suppressed:
+                event['message'] += f" (+{self.suppressed} suppressed alerts)"
+                self.suppressed = 0
+        return True
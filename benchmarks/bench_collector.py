@@ -0,0 +1,99 @@
+"""Collector ingest rate with several agents on localhost.
+
+Usage: python benchmarks/bench_collector.py [agents] [rows-per-agent]
+
+Starts a ``Collector`` on 127.0.0.1 writing into a temporary store and
+one agent process per ``agents``, each pushing ``rows-per-agent``
+synthetic rows as fast as it can. Halfway through, every agent drops its
+connection, so unacknowledged batches are resent and must be
+deduplicated. Prints the ingest rate, the collector's CPU time per row and
+checks that the store holds every row exactly once.
+"""
+import asyncio
+import multiprocessing
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from collector import Agent, Collector, agent_target  # noqa: E402
+from result_store import ResultStore  # noqa: E402
+
+METRICS = ['ping.avg', 'ping.loss', 'latency.p50', 'latency.p99', 'dns.success', 'dns.latency']
+TARGETS = ['8.8.8.8', '1.1.1.1', 'example.com']
+CHUNK = 1000
+
+
+def synthetic_rows(count, seed):
+    rng = np.random.default_rng(seed)
+    start = int(time.time() - count) * 1_000_000
+    per_ts = len(TARGETS) * len(METRICS)
+    for first in range(0, count, CHUNK):
+        yield [(start + (first + i) // per_ts * 1_000_000, TARGETS[(first + i) // len(METRICS) % len(TARGETS)],
+                METRICS[(first + i) % len(METRICS)], float(value))
+               for i, value in enumerate(rng.lognormal(3, 0.5, min(CHUNK, count - first)))]
+
+
+def run_agent(name, port, rows):
+    agent = Agent(name, '127.0.0.1', port, batch_rows=5000, flush_interval=0.2, info={'ping': TARGETS[0]})
+    agent.start()
+    dropped = False
+    for i, chunk in enumerate(synthetic_rows(rows, seed=sum(name.encode()))):
+        agent.submit_rows(chunk)
+        if not dropped and i * CHUNK >= rows // 2 and agent.sock is not None:
+            # انقطاع مفاجئ: الدفعات غير المؤكدة يجب أن تعاد دون تكرار في المخزن
+            agent.sock.shutdown(socket.SHUT_RDWR)
+            dropped = True
+        while len(agent.rows) > 50_000:
+            time.sleep(0.001)
+    agent.close(timeout=60)
+    stats = agent.stats()
+    if stats['queued_rows'] or stats['unacked']:
+        raise SystemExit(f"{name}: undelivered {stats}")
+
+
+def main():
+    agents = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 200_000
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ResultStore(os.path.join(tmp, 'store'))
+        collector = Collector(store, '127.0.0.1', 0)
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, daemon=True).start()
+        port = asyncio.run_coroutine_threadsafe(collector.start(), loop).result()
+
+        cpu = time.process_time()
+        started = time.perf_counter()
+        processes = [multiprocessing.Process(target=run_agent, args=(f'site-{i}', port, rows))
+                     for i in range(agents)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+        cpu = time.process_time() - cpu
+        asyncio.run_coroutine_threadsafe(collector.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+        stats = collector.stats()
+        print(f"{agents} agents x {rows} rows in {elapsed:.2f} s: {stats['rows'] / elapsed:,.0f} rows/s, "
+              f"collector CPU {cpu / max(stats['rows'], 1) * 1e6:.2f} us/row")
+        print(f"batches {stats['batches']}, resent duplicates dropped {stats['duplicates']}, errors {stats['errors']}")
+        stored = store.query()
+        unique = len(np.unique(stored[['ts', 'target', 'metric']]))
+        assert all(process.exitcode == 0 for process in processes), "an agent failed"
+        assert len(stored) == unique == agents * rows, f"store holds {len(stored)} rows ({unique} unique), " \
+                                                       f"expected {agents * rows}"
+        assert len(store.query(target=agent_target('site-0', TARGETS[0]))), "rows are not stored per agent"
+        print(f"store: {len(store)} rows, every row written once")
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
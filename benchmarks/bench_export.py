@@ -0,0 +1,66 @@
+"""Export throughput and peak memory for a large result store.
+
+Usage: python benchmarks/bench_export.py [records] [format ...]
+
+Fills a temporary store with ``records`` synthetic test results (six
+metrics each) and streams it through every exporter, printing the rate
+and the tracemalloc peak (tracemalloc itself slows the run down). With
+the streaming pipeline the peak stays roughly constant whatever the
+number of records; it is dominated by the store's decoded-chunk cache.
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from exporters import EXPORTERS  # noqa: E402
+from result_store import ROW_DTYPE, ResultStore  # noqa: E402
+
+METRICS = [('8.8.8.8', 'ping.avg'), ('google.com', 'dns.success'), ('speedtest', 'speed.download'),
+           ('speedtest', 'speed.upload'), ('speedtest', 'speed.ping'), ('8.8.8.8', 'ping.loss')]
+
+
+def fill_store(store, records, interval=1):
+    rng = np.random.default_rng(0)
+    start = int(time.time() - records * interval) * 1_000_000
+    targets = [store.intern_target(target) for target, _ in METRICS]
+    metrics = [store.intern_metric(metric) for _, metric in METRICS]
+    batch_records = store.chunk_rows // len(METRICS)
+    for first in range(0, records, batch_records):
+        count = min(batch_records, records - first)
+        rows = np.empty(count * len(METRICS), dtype=ROW_DTYPE)
+        rows['ts'] = np.repeat(start + (first + np.arange(count)) * interval * 1_000_000, len(METRICS))
+        rows['target'] = np.tile(targets, count)
+        rows['metric'] = np.tile(metrics, count)
+        rows['value'] = rng.lognormal(3, 0.5, len(rows))
+        store.append_array(rows)
+
+
+def main():
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    formats = sys.argv[2:] or ['.csv', '.jsonl', '.xlsx', '.pdf']
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ResultStore(os.path.join(tmp, 'store'))
+        fill_store(store, records)
+        print(f"store: {len(store)} rows, {records} records")
+        for extension in formats:
+            path = os.path.join(tmp, 'export' + extension)
+            tracemalloc.start()
+            started = time.perf_counter()
+            exported = EXPORTERS[extension](store, path).run()
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"{extension:7} {exported:>9} records  {elapsed:7.2f} s  "
+                  f"{exported / elapsed:>9.0f} rec/s  peak {peak / 1e6:6.1f} MB  "
+                  f"file {os.path.getsize(path) / 1e6:7.1f} MB")
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""HTTP probe phases, connection reuse and TLS resumption against local servers.
+
+Usage: python benchmarks/bench_http.py [cycles] [urls] [body bytes]
+
+Starts a ``LocalHttpServer`` for HTTP and, when the ``openssl`` command is
+available to make a self-signed certificate, one for HTTPS, in a separate
+process so the servers do not compete with the prober for the GIL. Every cycle
+requests ``urls`` paths on each server concurrently through one
+``ProbeEngine``, first with keep-alive pooling and the TLS session cache
+turned off and then with both on (the defaults). Prints the median of
+every phase, the warm request time and how many requests were served by
+a pooled connection or resumed their TLS session. The pool fills over the
+first cycles; checks that by the last one every request reuses a pooled
+connection and resumes its session, and that reuse beats a new connection.
+"""
+import multiprocessing
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from http_probe import PHASES, HttpProber, LocalHttpServer  # noqa: E402
+from probe_engine import ProbeEngine  # noqa: E402
+
+
+def self_signed(directory):
+    """Certificate and key for 127.0.0.1, or None without the openssl command."""
+    if shutil.which('openssl') is None:
+        return None
+    cert, key = os.path.join(directory, 'cert.pem'), os.path.join(directory, 'key.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                    '-keyout', key, '-out', cert, '-subj', '/CN=localhost',
+                    '-addext', 'subjectAltName=IP:127.0.0.1,DNS:localhost'],
+                   check=True, capture_output=True)
+    return cert, key
+
+
+def serve(body, cert, urls, stop):
+    servers = [LocalHttpServer(body_size=body)]
+    if cert is not None:
+        servers.append(LocalHttpServer(body_size=body, certfile=cert[0], keyfile=cert[1]))
+    urls.put([server.start() for server in servers])
+    stop.wait()
+    for server in servers:
+        server.close()
+
+
+def run(bases, cycles, urls, prober):
+    engine = ProbeEngine(timeout=5, http=prober)
+    targets = [{'type': 'http', 'url': f"{base}{i}"} for base in bases for i in range(urls)]
+    probes, walls = [], []
+    cpu = time.process_time()
+    for _ in range(cycles):
+        started = time.perf_counter()
+        probes += engine.run_cycle(targets)
+        walls.append(time.perf_counter() - started)
+    cpu = time.process_time() - cpu
+    prober.close()
+    failed = [probe for probe in probes if not probe['success']]
+    assert not failed, failed[0]['output']
+    return probes, statistics.median(walls) * 1000, cpu / len(probes) * 1e6
+
+
+def report(label, probes, wall, cpu):
+    print(f"{label}: cycle {wall:.1f} ms, {cpu:.0f} us CPU per request")
+    for scheme in ('http', 'https'):
+        selected = [probe for probe in probes if probe['target'].startswith(scheme + ':')]
+        if not selected:
+            continue
+        phases = ', '.join(f"{phase} {statistics.median(p[phase] for p in selected):.2f}"
+                           for phase in PHASES if selected[0][phase] is not None)
+        warm = [probe['warm_total'] for probe in selected if probe['warm_total'] is not None]
+        print(f"  {scheme:5} cold {statistics.median(p['latency'] for p in selected):6.2f} ms ({phases})"
+              f"  warm {statistics.median(warm) if warm else float('nan'):6.2f} ms"
+              f"  pooled {sum(p['pooled'] for p in selected)}/{len(selected)}"
+              + (f"  resumed {sum(p['resumed'] for p in selected)}/{len(selected)}" if scheme == 'https' else ''))
+
+
+def main():
+    cycles = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    urls = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    body = int(sys.argv[3]) if len(sys.argv) > 3 else 16 * 1024
+    with tempfile.TemporaryDirectory() as tmp:
+        cert = self_signed(tmp)
+        if cert is None:
+            print("openssl not found; HTTPS is skipped")
+        queue, stop = multiprocessing.Queue(), multiprocessing.Event()
+        process = multiprocessing.Process(target=serve, args=(body, cert, queue, stop), daemon=True)
+        process.start()
+        bases = queue.get(timeout=30)
+        ca_file = cert[0] if cert else None
+        try:
+            plain = run(bases, cycles, urls, HttpProber(keep_alive=False, session_cache=False, ca_file=ca_file))
+            report("no pooling, no session cache", *plain)
+            reused = run(bases, cycles, urls, HttpProber(ca_file=ca_file))
+            report("pooled keep-alive, session cache", *reused)
+        finally:
+            stop.set()
+            process.join()
+
+    probes = reused[0]
+    last = probes[-len(probes) // cycles:]
+    assert all(probe['pooled'] for probe in last), "by the last cycle every warm request should find a pooled connection"
+    if cert is not None:
+        https = [probe for probe in last if probe['target'].startswith('https:')]
+        assert all(probe['resumed'] for probe in https), "cold HTTPS connections should resume the cached session"
+        full = statistics.median(p['tls'] for p in plain[0] if p['tls'] is not None)
+        resumed = statistics.median(p['tls'] for p in https)
+        print(f"TLS handshake: full {full:.2f} ms, resumed {resumed:.2f} ms")
+    cold = statistics.median(probe['latency'] for probe in probes)
+    warm = statistics.median(probe['warm_total'] for probe in probes)
+    assert warm < cold, "a reused connection should answer faster than a new one"
+
+
+if __name__ == '__main__':
+    main()
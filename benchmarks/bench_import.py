@@ -0,0 +1,67 @@
+"""Bulk import throughput, deduplication and peak memory.
+
+Usage: python benchmarks/bench_import.py [records] [format ...]
+
+Fills a temporary store with ``records`` synthetic test results, exports
+them to every format (default: .csv and .jsonl; .xlsx is slow to write
+and read with openpyxl) and imports each file into an empty store,
+printing the rate. All files are then imported together into one store
+with the default number of workers, under tracemalloc, and imported a
+second time: the first pass keeps one copy of every result, the second
+must import nothing. The peak is the importing process only; worker
+processes hold one batch each.
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_export import fill_store  # noqa: E402
+from exporters import EXPORTERS  # noqa: E402
+from importers import DEFAULT_WORKERS, Importer  # noqa: E402
+from result_store import ResultStore  # noqa: E402
+
+
+def main():
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    formats = sys.argv[2:] or ['.csv', '.jsonl']
+    with tempfile.TemporaryDirectory() as tmp:
+        source = ResultStore(os.path.join(tmp, 'source'))
+        fill_store(source, records)
+        paths = []
+        for extension in formats:
+            path = os.path.join(tmp, 'export' + extension)
+            EXPORTERS[extension](source, path).run()
+            paths.append(path)
+        source.close()
+
+        for path in paths:
+            store = ResultStore(os.path.join(tmp, 'import' + os.path.splitext(path)[1]))
+            started = time.perf_counter()
+            stats = Importer(store, [path]).run()
+            elapsed = time.perf_counter() - started
+            print(f"{os.path.splitext(path)[1]:7} {stats['imported']:>9} rows  {elapsed:7.2f} s  "
+                  f"{stats['imported'] / elapsed:>9.0f} rows/s  file {os.path.getsize(path) / 1e6:7.1f} MB")
+            store.close()
+
+        store = ResultStore(os.path.join(tmp, 'all'))
+        tracemalloc.start()
+        started = time.perf_counter()
+        stats = Importer(store, paths).run()
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"all     {stats['imported']:>9} rows  {elapsed:7.2f} s  {stats['duplicates']} duplicates  "
+              f"{DEFAULT_WORKERS} worker(s)  peak {peak / 1e6:6.1f} MB (traced)")
+        again = Importer(store, paths).run()
+        print(f"again   {again['imported']:>9} rows  {again['duplicates']} duplicates")
+        assert stats['imported'] == len(store), "every imported row should be stored once"
+        assert again['imported'] == 0, "a second import should only find duplicates"
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
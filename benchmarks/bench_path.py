@@ -0,0 +1,80 @@
+"""Path analyzer CPU and memory against a simulated 30-hop path.
+
+Usage: python benchmarks/bench_path.py [rounds] [hops]
+
+Runs ``PathAnalyzer`` against a ``SimulatedPath``: hop 7 drops 40% of its
+ICMP answers (rate limiting, no loss beyond it) and real loss of 10%
+starts at hop 20. Rounds run every 2 ms instead of once a second, so the
+CPU time per round is the cost of probing the whole path once. A second
+run adds the per-hop snapshot the GUI builds every round, with the
+default window. Checks that the loss measured over all rounds matches
+the simulation and that the interpretation blames hop 20.
+"""
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import network_core  # noqa: E402
+from path_analyzer import DEFAULT_WINDOW, PathAnalyzer, SimulatedPath  # noqa: E402
+
+LOSS_HOP = 20
+RATE_LIMITED_HOP = 7
+
+
+def simulated_hops(count):
+    hops = []
+    for ttl in range(1, count + 1):
+        loss = 10 if ttl >= LOSS_HOP else 40 if ttl == RATE_LIMITED_HOP else 0
+        hops.append((f'10.0.{ttl}.1', 0.5 + ttl * 0.2, loss, 0.1))
+    return hops
+
+
+def run(rounds, hops, snapshots, window):
+    analyzer = PathAnalyzer('127.0.0.1', interval=0.002, timeout=0.05, window=window)
+
+    async def main():
+        stop = asyncio.Event()
+
+        def on_round(snapshot):
+            if analyzer.rounds >= rounds:
+                stop.set()
+
+        # بدون لقطة في كل جولة نوقف الحلقة من مؤقت بدلاً من on_round
+        if not snapshots:
+            asyncio.get_running_loop().call_later(rounds * analyzer.interval, stop.set)
+        await analyzer.run(on_round if snapshots else None, stop, transport=SimulatedPath(hops, seed=1))
+
+    cpu = time.process_time()
+    asyncio.run(main())
+    return analyzer, time.process_time() - cpu
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    hops = simulated_hops(count)
+
+    tracemalloc.start()
+    analyzer, cpu = run(rounds, hops, snapshots=True, window=DEFAULT_WINDOW)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"with a snapshot every round: {cpu / analyzer.rounds * 1e6:.0f} us CPU per round (traced), "
+          f"peak {peak / 1024:.0f} KiB")
+    analyzer, cpu = run(rounds, hops, snapshots=False, window=rounds)
+    print(f"{analyzer.rounds} rounds x {count} hops: {cpu / analyzer.rounds * 1e6:.0f} us CPU per round")
+
+    path = analyzer.snapshot()
+    for hop in path['hops']:
+        expected = hops[hop['hop'] - 1][2]
+        assert abs(hop['loss'] - expected) < 6, f"hop {hop['hop']}: loss {hop['loss']:.1f}%, expected {expected}%"
+    verdict = network_core.interpret_path(path)
+    print(verdict)
+    assert f"hop {LOSS_HOP} " in verdict, "loss should be traced to the first lossy hop"
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Rollup build time and long-range query latency.
+
+Usage: python benchmarks/bench_rollups.py [days] [interval-seconds]
+
+Fills a temporary store with ``days`` of synthetic results (six metrics
+every ``interval`` seconds), builds the minute/hour/day rollups, checks a
+few buckets against ``np.percentile`` on the raw rows and times queries
+over the whole range, picking the resolution the way the graphs do.
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from result_store import ROW_DTYPE, ResultStore  # noqa: E402
+from rollups import DAY, RollupEngine, bucket_start  # noqa: E402
+
+METRICS = [('8.8.8.8', 'ping.avg'), ('8.8.8.8', 'latency.p50'), ('8.8.8.8', 'latency.p99'),
+           ('speedtest', 'speed.download'), ('speedtest', 'speed.upload'), ('google.com', 'dns.latency')]
+REPEAT = 20
+
+
+def fill_store(store, days, interval):
+    rng = np.random.default_rng(0)
+    end = int(time.time()) * 1_000_000
+    start = end - days * DAY
+    step = interval * 1_000_000
+    targets = [store.intern_target(target) for target, _ in METRICS]
+    metrics = [store.intern_metric(metric) for _, metric in METRICS]
+    times = np.arange(start, end, step)
+    batch = store.chunk_rows // len(METRICS)
+    for first in range(0, len(times), batch):
+        ts = times[first:first + batch]
+        rows = np.empty(len(ts) * len(METRICS), dtype=ROW_DTYPE)
+        rows['ts'] = np.repeat(ts, len(METRICS))
+        rows['target'] = np.tile(targets, len(ts))
+        rows['metric'] = np.tile(metrics, len(ts))
+        rows['value'] = rng.lognormal(3, 0.5, len(rows))
+        store.append_array(rows)
+    return start, end
+
+
+def check(store, engine, start):
+    hour = engine.levels[1][1]
+    first = int(bucket_start(start, hour, engine.offset)) + hour
+    rows = store.query(first, first + hour - 1, '8.8.8.8', 'ping.avg')
+    bucket = engine.level_buckets('1h', first, first, '8.8.8.8', 'ping.avg')[0]
+    values = rows['value'].astype(np.float64)
+    expected = (len(values), values.min(), values.max(), values.mean(), *np.percentile(values, (50, 90, 99)))
+    got = tuple(bucket[field] for field in ('count', 'min', 'max', 'mean', 'p50', 'p90', 'p99'))
+    assert np.allclose(got, expected, rtol=1e-5), (got, expected)
+
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 90
+    interval = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ResultStore(os.path.join(tmp, 'store'))
+        start, end = fill_store(store, days, interval)
+        print(f"store: {len(store)} rows over {days} days")
+
+        started = time.perf_counter()
+        engine = RollupEngine(store)
+        written = engine.update()
+        print(f"build: {written} buckets in {time.perf_counter() - started:.2f} s")
+        check(store, engine, start)
+
+        started = time.perf_counter()
+        engine.update()
+        print(f"update (nothing to seal): {(time.perf_counter() - started) * 1000:.2f} ms")
+
+        for label, span in (('1 hour', DAY // 24), ('24 hours', DAY), ('7 days', 7 * DAY), (f'{days} days', end - start)):
+            timings = []
+            for _ in range(REPEAT):
+                began = time.perf_counter()
+                resolution, buckets = engine.series(end - span, end, '8.8.8.8', 'ping.avg')
+                timings.append(time.perf_counter() - began)
+            print(f"{label:>9}: {resolution:>4} {len(buckets):>5} points  "
+                  f"median {np.median(timings) * 1000:7.2f} ms")
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Cold-start time of the GUI module and the headless CLI.
+
+Usage: python benchmarks/bench_startup.py [runs]
+
+Every measurement is a fresh interpreter, so it includes module imports
+but not the Tk main loop. ``cli run`` does a full test cycle against
+loopback targets without the speed test and without a store.
+"""
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+COMMANDS = [
+    ('python -c pass', ['-c', 'pass']),
+    ('import network_core', ['-c', 'import network_core']),
+    ('import simple_network_tool', ['-c', 'import simple_network_tool']),
+    ('cli --help', ['-m', 'network_cli', '--help']),
+    ('cli run', ['-m', 'network_cli', '--no-speedtest', '--no-store', '--ping', '127.0.0.1',
+                 '--dns', 'localhost', 'run']),
+]
+
+
+def measure(args, runs):
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=ROOT, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    for name, args in COMMANDS:
+        times = measure(args, runs)
+        print(f"{name:28} median {statistics.median(times) * 1000:7.1f} ms  "
+              f"min {min(times) * 1000:7.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
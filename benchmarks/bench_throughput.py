@@ -0,0 +1,35 @@
+"""Loopback throughput of the built-in iperf-style test.
+
+Usage: python benchmarks/bench_throughput.py [duration] [streams ...]
+
+Starts a ``ThroughputServer`` on 127.0.0.1 and runs the client with each
+stream count. No network access is needed; the numbers show how far the
+sendfile/recv_into data path is from being the bottleneck (10 GbE is
+10000 Mbps).
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from throughput import ThroughputClient, ThroughputServer  # noqa: E402
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    stream_counts = [int(arg) for arg in sys.argv[2:]] or [1, 4, 8]
+    server = ThroughputServer('127.0.0.1', 0)
+    port = server.start()
+    try:
+        for streams in stream_counts:
+            client = ThroughputClient('127.0.0.1', port, streams=streams, duration=duration,
+                                      warmup=min(1.0, duration / 4))
+            result = client.run()
+            print(f"{streams:2} streams  download {result['download']:9.0f} Mbps  "
+                  f"upload {result['upload']:9.0f} Mbps  connect {result['ping']:5.2f} ms")
+    finally:
+        server.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,370 @@
+"""Offline benchmark and regression suite.
+
+Usage: python benchmarks/suite.py [--quick] [--only GROUP ...] [--output FILE]
+                                  [--baseline FILE] [--save-baseline] [--tolerance 0.5]
+
+Everything runs against local stand-ins, so no network access is needed:
+a UDP echo responder, a TCP listener and a ``LocalHttpServer`` on
+loopback for the probes, the stub DNS server for the resolver benchmark
+and a ``ThroughputServer`` for the speed test. Groups:
+
+- ``probes``: CPU time per latency sample at 1000 probes/s (prober and
+  responder share the process), one probe cycle, one cycle of HTTP
+  requests over pooled connections, ``perform_tests``, loopback
+  throughput and the cost of a stage timer, disabled and enabled.
+- ``graphs``: full redraw and incremental append+blit of a ``LivePlot``
+  against the number of points.
+- ``storage``: store appends, exports (rate and tracemalloc peak),
+  imports of the exported CSV and JSON lines files and rollup queries.
+- ``startup``: cold start of the modules and the CLI.
+
+Repeated timings report the fastest run, which is the least disturbed by
+other load on the machine. Results are written as JSON (``--output``) and compared with the
+baseline saved on this machine by an earlier ``--save-baseline`` run
+(``benchmarks/baseline.json``, or ``baseline-quick.json`` for ``--quick``).
+A metric more than its tolerance worse than the baseline is a regression,
+and the suite exits with status 1. Timings are absolute, so no baseline
+is shipped, and a baseline recorded on another machine, Python or
+``--quick`` setting is not compared with.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import network_core  # noqa: E402
+from bench_export import fill_store  # noqa: E402
+from bench_startup import measure  # noqa: E402
+from dns_benchmark import DnsBenchmark, start_stub_resolver  # noqa: E402
+from http_probe import HttpProber, LocalHttpServer  # noqa: E402
+from instrumentation import Instruments  # noqa: E402
+from latency_prober import LatencyProber, LatencySampler, start_udp_echo_responder  # noqa: E402
+from probe_engine import ProbeEngine  # noqa: E402
+from throughput import ThroughputClient, ThroughputServer  # noqa: E402
+
+BASELINES = {False: os.path.join(BENCH_DIR, 'baseline.json'), True: os.path.join(BENCH_DIR, 'baseline-quick.json')}
+# الأزمنة مطلقة: لا تقارن إلا بخط أساس من نفس الجهاز ونفس الوضع
+COMPARABLE_META = {'quick': '--quick setting', 'host': 'host', 'cpus': 'CPU count', 'machine': 'architecture',
+                   'python': 'Python version'}
+DEFAULT_TOLERANCE = 0.5
+# التوقيتات القصيرة جداً والعمليات الفرعية تتأثر بضجيج النظام أكثر
+NOISY_TOLERANCE = 1.0
+GROUPS = ('probes', 'graphs', 'storage', 'startup')
+TIMER_CALLS = 100_000
+
+
+class Results:
+    """Collects ``name -> {value, unit, better, tolerance}``."""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def add(self, name, value, unit, better='lower', tolerance=None):
+        self.metrics[name] = {'value': round(float(value), 4), 'unit': unit, 'better': better}
+        if tolerance is not None:
+            self.metrics[name]['tolerance'] = tolerance
+        print(f"  {name:40} {value:12.3f} {unit}", flush=True)
+
+
+class LoopbackStandIns:
+    """UDP echo responder, TCP listener and stub resolver on one background loop, plus threaded servers."""
+
+    def __enter__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name='stand-ins', daemon=True)
+        self.thread.start()
+        self.echo, self.echo_port = self.call(start_udp_echo_responder())
+        self.dns_transport, self.dns_server, self.dns_port = self.call(start_stub_resolver())
+        self.tcp_server = self.call(asyncio.start_server(self._accept, '127.0.0.1', 0))
+        self.tcp_port = self.tcp_server.sockets[0].getsockname()[1]
+        self.throughput = ThroughputServer('127.0.0.1', 0)
+        self.throughput_port = self.throughput.start()
+        self.http = LocalHttpServer()
+        self.http_url = self.http.start()
+        return self
+
+    def call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    @staticmethod
+    async def _accept(reader, writer):
+        writer.close()
+
+    def __exit__(self, *exc):
+        self.throughput.close()
+        self.http.close()
+
+        async def close():
+            self.echo.close()
+            self.dns_transport.close()
+            self.dns_server.close()
+            self.tcp_server.close()
+
+        self.call(close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+def bench_probes(results, quick):
+    with LoopbackStandIns() as stand_ins:
+        # مسبارات UDP إلى خادم الصدى: كلفة المعالج لكل عينة بمعزل عن الشبكة
+        prober = LatencyProber(method='udp', udp_port=stand_ins.echo_port, timeout=0.2)
+        duration = 1.0 if quick else 3.0
+        windows = []
+
+        async def sample():
+            stop = asyncio.Event()
+            asyncio.get_running_loop().call_later(duration, stop.set)
+            await LatencySampler('127.0.0.1', rate=1000, window=0.5, prober=prober).run(windows.append, stop)
+
+        cpu = time.process_time()
+        asyncio.run(sample())
+        cpu = time.process_time() - cpu
+        received = sum(window['received'] for window in windows)
+        results.add('probes.sample_cpu', cpu / max(received, 1) * 1e6, 'us/sample')
+        results.add('probes.sample_rtt_p50', statistics.median(window['p50'] for window in windows) * 1000,
+                    'us', tolerance=NOISY_TOLERANCE)
+
+        engine = ProbeEngine(timeout=2, prober=LatencyProber(count=4, interval=0.01, timeout=0.5,
+                                                             method='udp', udp_port=stand_ins.echo_port))
+        targets = ([{'type': 'ping', 'host': '127.0.0.1'}] * 20
+                   + [{'type': 'tcp', 'host': '127.0.0.1', 'port': stand_ins.tcp_port}] * 50
+                   + [{'type': 'dns', 'host': 'localhost'}] * 10)
+        engine.run_cycle(targets)
+        cycles = [timed(lambda: engine.run_cycle(targets)) for _ in range(3 if quick else 10)]
+        results.add('probes.cycle_80_targets', min(cycles) * 1000, 'ms')
+
+        # الدورة الأولى تملأ مجمع الاتصالات، والقياس للدورات التالية
+        http = ProbeEngine(timeout=2, http=HttpProber())
+        urls = [{'type': 'http', 'url': f'{stand_ins.http_url}{i}'} for i in range(20)]
+        http.run_cycle(urls)
+        cycles = [timed(lambda: http.run_cycle(urls)) for _ in range(3 if quick else 10)]
+        http.http.close()
+        results.add('probes.http_cycle_20_urls', min(cycles) * 1000, 'ms', tolerance=NOISY_TOLERANCE)
+
+        dns_bench = DnsBenchmark([f'127.0.0.1:{stand_ins.dns_port}'], [f'host{i}.test' for i in range(50)])
+        runs = [timed(lambda: network_core.perform_tests(engine, targets[:3], dns_bench=dns_bench))
+                for _ in range(3 if quick else 10)]
+        results.add('probes.perform_tests', min(runs) * 1000, 'ms')
+
+        client = ThroughputClient('127.0.0.1', stand_ins.throughput_port, streams=4,
+                                  duration=1.0 if quick else 2.0, warmup=0.25)
+        results.add('probes.throughput_download', client.download(), 'Mbps', better='higher',
+                    tolerance=NOISY_TOLERANCE)
+
+    instruments = Instruments()
+
+    def stage_timers():
+        for _ in range(TIMER_CALLS):
+            with instruments.stage('bench'):
+                pass
+
+    for enabled in (False, True):
+        instruments.enabled = enabled
+        runs = [timed(stage_timers) for _ in range(3 if quick else 5)]
+        results.add(f"probes.stage_timer_{'enabled' if enabled else 'disabled'}", min(runs) / TIMER_CALLS * 1e9,
+                    'ns', tolerance=NOISY_TOLERANCE)
+
+
+def timed(func):
+    started = time.perf_counter()
+    func()
+    return time.perf_counter() - started
+
+
+def bench_graphs(results, quick):
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    from live_graphs import LivePlot
+
+    rng = np.random.default_rng(0)
+    for size in (1_000, 100_000) if quick else (1_000, 10_000, 100_000, 1_000_000):
+        figure = Figure(figsize=(8, 4))
+        canvas = FigureCanvasAgg(figure)
+        plot = LivePlot(canvas, figure.add_subplot(111))
+        plot.add_series('ping', 'b-', 'Ping')
+        xs = 20000 + np.arange(size) / 86400
+        plot.extend('ping', xs, rng.lognormal(3, 0.3, size))
+        canvas.draw()
+        # نافذتان متناوبتان حتى تتغير حدود المحاور فعلاً في كل إعادة رسم كاملة
+        windows = [None, (xs[-1] - xs[0]) / 2] * 4
+        redraws = [timed(lambda: plot.set_window(window)) for window in windows]
+        results.add(f'graphs.redraw.{size}', min(redraws) * 1000, 'ms')
+        plot.set_window(None)
+
+        # نقاط جديدة داخل الهامش: إلحاق + blit دون إعادة رسم المحاور
+        x = xs[-1]
+        appends = []
+        for _ in range(50):
+            x += 1 / 86400 / 100
+            appends.append(timed(lambda: (plot.append('ping', x, 20.0), plot.refresh())))
+        results.add(f'graphs.append.{size}', min(appends) * 1000, 'ms')
+
+
+def bench_storage(results, quick):
+    from exporters import EXPORTERS
+    from importers import Importer
+    from result_store import ResultStore
+    from rollups import DAY, RollupEngine
+
+    records = 20_000 if quick else 100_000
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ResultStore(os.path.join(tmp, 'store'))
+        elapsed = timed(lambda: fill_store(store, records))
+        results.add('storage.append', len(store) / elapsed, 'rows/s', better='higher')
+
+        for extension, count in (('.csv', records), ('.jsonl', records), ('.xlsx', records), ('.pdf', 1000)):
+            path = os.path.join(tmp, 'export' + extension)
+            tracemalloc.start()
+            started = time.perf_counter()
+            # PDF أبطأ بكثير: نصدر أحدث السجلات فقط
+            start = store.time_range()[1] - (count - 1) * 1_000_000 if count < records else None
+            exported = EXPORTERS[extension](store, path, start=start).run()
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            name = extension.lstrip('.')
+            results.add(f'storage.export.{name}', exported / elapsed, 'records/s', better='higher')
+            results.add(f'storage.export.{name}.peak', peak / 1e6, 'MB')
+        store.close()
+
+        # استيراد الملفات المصدرة للتو إلى مخزن فارغ
+        for extension in ('.csv', '.jsonl'):
+            target = ResultStore(os.path.join(tmp, 'import' + extension))
+            started = time.perf_counter()
+            stats = Importer(target, [os.path.join(tmp, 'export' + extension)]).run()
+            elapsed = time.perf_counter() - started
+            results.add(f"storage.import.{extension.lstrip('.')}", stats['imported'] / elapsed, 'rows/s',
+                        better='higher')
+            target.close()
+
+        # 90 يوماً من النتائج كل دقيقة لاستعلامات الملخصات
+        store = ResultStore(os.path.join(tmp, 'rollups'))
+        fill_store(store, 90 * 1440, interval=60)
+        engine = RollupEngine(store)
+        results.add('storage.rollup_build', timed(engine.update), 's')
+        end = int(time.time()) * 1_000_000
+        for label, span in (('1d', DAY), ('90d', 90 * DAY)):
+            runs = [timed(lambda: engine.series(end - span, end, '8.8.8.8', 'ping.avg')) for _ in range(20)]
+            results.add(f'storage.rollup_query.{label}', min(runs) * 1000, 'ms', tolerance=NOISY_TOLERANCE)
+        store.close()
+
+
+def bench_startup(results, quick):
+    runs = 3 if quick else 7
+    for name, args in (('network_core', ['-c', 'import network_core']),
+                       ('gui', ['-c', 'import simple_network_tool']),
+                       ('cli_help', ['-m', 'network_cli', '--help'])):
+        results.add(f'startup.{name}', min(measure(args, runs)) * 1000, 'ms',
+                    tolerance=NOISY_TOLERANCE)
+
+
+def compare(metrics, baseline, tolerance):
+    """Lines describing each metric against the baseline, and the regressions."""
+    lines, regressions = [], []
+    for name, current in metrics.items():
+        base = baseline.get(name)
+        if base is None or not base['value'] or not current['value']:
+            lines.append(f"  {name:40} {current['value']:12.3f} {current['unit']:10} (no baseline)")
+            continue
+        ratio = current['value'] / base['value']
+        worse = ratio if current['better'] == 'lower' else 1 / ratio
+        allowed = base.get('tolerance', tolerance)
+        status = 'REGRESSION' if worse > 1 + allowed else ('improved' if worse < 1 / (1 + allowed) else 'ok')
+        line = (f"  {name:40} {current['value']:12.3f} {current['unit']:10} "
+                f"baseline {base['value']:12.3f}  {(ratio - 1) * 100:+7.1f}%  {status}")
+        lines.append(line)
+        if status == 'REGRESSION':
+            regressions.append(line)
+    return lines, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark and regression suite.")
+    parser.add_argument('--quick', action='store_true', help="smaller sizes and fewer runs")
+    parser.add_argument('--only', nargs='+', choices=GROUPS, help="run only these groups")
+    parser.add_argument('--output', metavar='FILE', help="write results as JSON")
+    parser.add_argument('--baseline', metavar='FILE',
+                        help="baseline to compare with (default: benchmarks/baseline.json, or baseline-quick.json)")
+    parser.add_argument('--save-baseline', action='store_true', help="store this run as the baseline")
+    parser.add_argument('--no-baseline', action='store_true',
+                        help="only measure; do not fail when there is no comparable baseline")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f"allowed slowdown as a fraction (default: {DEFAULT_TOLERANCE})")
+    args = parser.parse_args(argv)
+    args.baseline = args.baseline or BASELINES[args.quick]
+
+    results = Results()
+    benches = {'probes': bench_probes, 'graphs': bench_graphs, 'storage': bench_storage, 'startup': bench_startup}
+    for group in args.only or GROUPS:
+        print(f"{group}:", flush=True)
+        benches[group](results, args.quick)
+
+    report = {
+        'meta': {'timestamp': datetime.now().isoformat(timespec='seconds'), 'quick': args.quick,
+                 'python': platform.python_version(), 'machine': platform.machine(),
+                 'host': socket.gethostname(), 'cpus': os.cpu_count()},
+        'metrics': results.metrics,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        # تشغيل جزئي يحدّث مقاييسه فقط ويبقي الباقي
+        baseline.setdefault('metrics', {}).update(results.metrics)
+        baseline['meta'] = report['meta']
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if args.no_baseline:
+        return 0
+    # بلا خط أساس صالح لا يمكن كشف أي تراجع، فالفشل هنا صريح وليس صامتاً
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline first, "
+              f"or pass --no-baseline to only measure.", file=sys.stderr)
+        return 2
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    differences = [label for key, label in COMPARABLE_META.items()
+                   if baseline.get('meta', {}).get(key) != report['meta'][key]]
+    if differences:
+        print(f"The baseline at {args.baseline} was recorded with a different {', '.join(differences)}; "
+              f"not comparing. Run with --save-baseline to record one here, "
+              f"or pass --no-baseline to only measure.", file=sys.stderr)
+        return 2
+    lines, regressions = compare(results.metrics, baseline['metrics'], args.tolerance)
+    print("\nCompared with the baseline:")
+    print('\n'.join(lines))
+    if regressions:
+        print(f"\n{len(regressions)} REGRESSION(S):", file=sys.stderr)
+        print('\n'.join(regressions), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
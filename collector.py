@@ -0,0 +1,435 @@
+"""Agent mode: push results from many sites into one result store.
+
+An ``Agent`` runs next to the tests on each site and streams their rows
+over one persistent TCP connection to a ``Collector``, which writes them
+into its store under ``<agent>/<target>`` so every site can be graphed on
+its own. Frames are::
+
+    header  !4sBI   magic, kind, payload length
+    HELLO   JSON    {"agent", "token", "ping", "resolvers", "http"}
+    BATCH   zlib(!QQII session, seq, row count, names length + names JSON + rows)
+    ACK     !QQ     session, seq
+
+Rows travel as ``ROW_DTYPE`` records whose target/metric ids index the
+batch's own name tables, so every batch can be resent as is after a
+reconnect. The collector acknowledges a batch once it is in the store and
+drops batches it has already written (same session, seq not newer).
+Agents must send the collector's shared ``token`` in their HELLO; a
+collector without a token only listens on a loopback address.
+"""
+import asyncio
+import hmac
+import ipaddress
+import json
+import os
+import random
+import select
+import socket
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from network_core import COLLECTOR_PORT
+from result_store import ROW_DTYPE, flatten_result
+
+DEFAULT_PORT = COLLECTOR_PORT
+DEFAULT_BIND = '127.0.0.1'
+DEFAULT_BATCH_ROWS = 5000
+DEFAULT_FLUSH_INTERVAL = 1.0
+DEFAULT_MAX_PENDING = 1000
+MAX_IN_FLIGHT = 16
+RECONNECT_DELAYS = (1, 2, 5, 10, 30)
+STATE_SAVE_INTERVAL = 1.0
+AGENTS_FILE = 'agents.json'
+# الهدف في المخزن: اسم الوكيل ثم الهدف كما قاسه
+AGENT_SEPARATOR = '/'
+
+MAGIC = b'NPA1'
+HELLO = 0
+BATCH = 1
+ACK = 2
+_FRAME = struct.Struct('!4sBI')
+_BATCH = struct.Struct('!QQII')
+_ACK = struct.Struct('!QQ')
+MAX_FRAME = 64 * 1024 * 1024
+# حد الدفعة بعد فك الضغط: دفعة صغيرة مضغوطة قد تتضخم إلى أضعاف حجمها
+MAX_BATCH = 64 * 1024 * 1024
+
+
+def agent_target(agent, target):
+    return f"{agent}{AGENT_SEPARATOR}{target}"
+
+
+def load_agents(store_path):
+    """``{name: info}`` of every agent that has reported to a collector writing into ``store_path``."""
+    try:
+        with open(os.path.join(store_path, AGENTS_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def is_loopback(host):
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def parse_address(value, default_port=DEFAULT_PORT):
+    host, _, port = value.rpartition(':') if ':' in value else (value, '', '')
+    return host, int(port) if port else default_port
+
+
+def frame(kind, payload):
+    return _FRAME.pack(MAGIC, kind, len(payload)) + payload
+
+
+def encode_batch(session, seq, rows):
+    """Pack ``(ts_us, target, metric, value)`` tuples into one compressed BATCH payload."""
+    targets, metrics = {}, {}
+    batch = np.empty(len(rows), dtype=ROW_DTYPE)
+    batch['ts'] = [row[0] for row in rows]
+    batch['target'] = [targets.setdefault(row[1], len(targets)) for row in rows]
+    batch['metric'] = [metrics.setdefault(row[2], len(metrics)) for row in rows]
+    batch['value'] = [row[3] for row in rows]
+    names = json.dumps({'targets': list(targets), 'metrics': list(metrics)}).encode()
+    body = _BATCH.pack(session, seq, len(rows), len(names)) + names + batch.tobytes()
+    return zlib.compress(body, 1)
+
+
+def decode_batch(payload):
+    """``(session, seq, target names, metric names, rows)`` of a BATCH payload."""
+    decompressor = zlib.decompressobj()
+    body = decompressor.decompress(payload, MAX_BATCH)
+    if decompressor.unconsumed_tail:
+        raise ValueError(f"Batch is larger than {MAX_BATCH} bytes")
+    if not decompressor.eof:
+        raise ValueError("Truncated batch")
+    session, seq, count, names_length = _BATCH.unpack_from(body)
+    offset = _BATCH.size
+    names = json.loads(body[offset:offset + names_length])
+    offset += names_length
+    rows = np.frombuffer(body, dtype=ROW_DTYPE, count=count, offset=offset).copy()
+    if len(names['targets']) <= int(rows['target'].max(initial=0)) and count:
+        raise ValueError("Batch refers to an unknown target")
+    if len(names['metrics']) <= int(rows['metric'].max(initial=0)) and count:
+        raise ValueError("Batch refers to an unknown metric")
+    return session, seq, names['targets'], names['metrics'], rows
+
+
+class Agent:
+    """Batches result rows and pushes them to a collector from a background thread.
+
+    Rows are sent once ``batch_rows`` are waiting or ``flush_interval``
+    seconds after the first of them. Up to ``MAX_IN_FLIGHT`` batches are
+    sent ahead of their acknowledgements; unacknowledged batches are kept
+    and resent after a reconnect. At most ``max_pending`` batches are kept
+    while the collector is unreachable, the oldest being dropped first.
+    """
+
+    def __init__(self, name, host, port=DEFAULT_PORT, batch_rows=DEFAULT_BATCH_ROWS,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, max_pending=DEFAULT_MAX_PENDING, info=None, token=''):
+        self.name = name
+        self.host = host
+        self.port = port
+        self.token = token
+        self.batch_rows = batch_rows
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.info = info or {}
+        self.session = random.getrandbits(63)
+        self.seq = 0
+        self.rows = []
+        self.first_row_at = None
+        self.unacked = deque()
+        self.sent = 0
+        self.acked = 0
+        self.dropped = 0
+        self.connected = False
+        self.condition = threading.Condition()
+        self.stopping = False
+        self.thread = None
+        self.sock = None
+
+    @classmethod
+    def from_config(cls, config, info=None):
+        """None when no ``[Agent] collector`` is configured."""
+        collector = config.get('Agent', 'collector', fallback='').strip()
+        if not collector:
+            return None
+        host, port = parse_address(collector)
+        return cls(
+            config.get('Agent', 'name', fallback='').strip() or socket.gethostname(),
+            host, port,
+            batch_rows=config.getint('Agent', 'batch_rows', fallback=DEFAULT_BATCH_ROWS),
+            flush_interval=config.getfloat('Agent', 'flush_interval', fallback=DEFAULT_FLUSH_INTERVAL),
+            max_pending=config.getint('Agent', 'max_pending', fallback=DEFAULT_MAX_PENDING),
+            info=info,
+            token=config.get('Agent', 'token', fallback='').strip(),
+        )
+
+    def submit(self, result):
+        self.submit_rows(flatten_result(result))
+
+    def submit_rows(self, rows):
+        """Queue ``(ts_us, target, metric, value)`` rows."""
+        with self.condition:
+            if not self.rows:
+                self.first_row_at = time.monotonic()
+            self.rows.extend(rows)
+            if len(self.rows) >= self.batch_rows:
+                self.condition.notify()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name=f'agent-{self.name}', daemon=True)
+        self.thread.start()
+
+    def close(self, timeout=5.0):
+        """Send what is queued, wait up to ``timeout`` seconds for acknowledgements, then stop."""
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            self.first_row_at = 0 if self.rows else self.first_row_at
+            self.condition.notify()
+            while (self.rows or self.unacked) and time.monotonic() < deadline:
+                self.condition.wait(0.05)
+            self.stopping = True
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join(max(deadline - time.monotonic(), 0.1))
+
+    def stats(self):
+        with self.condition:
+            return {'connected': self.connected, 'queued_rows': len(self.rows), 'unacked': len(self.unacked),
+                    'sent': self.sent, 'acked': self.acked, 'dropped': self.dropped}
+
+    def _take_batch(self):
+        rows, self.rows = self.rows[:self.batch_rows], self.rows[self.batch_rows:]
+        self.first_row_at = time.monotonic() if self.rows else None
+        self.seq += 1
+        self.unacked.append((self.seq, encode_batch(self.session, self.seq, rows)))
+        while len(self.unacked) > self.max_pending:
+            self.unacked.popleft()
+            self.dropped += 1
+        return self.unacked[-1]
+
+    def _run(self):
+        attempt = 0
+        while not self.stopping:
+            try:
+                self.sock = socket.create_connection((self.host, self.port), timeout=10)
+                self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                hello = dict(self.info, agent=self.name, token=self.token)
+                self.sock.sendall(frame(HELLO, json.dumps(hello).encode()))
+                with self.condition:
+                    self.connected = True
+                    resend = list(self.unacked)
+                attempt = 0
+                # الدفعات غير المؤكدة ترسل من جديد؛ المجمّع يتجاهل ما كتبه سابقاً
+                for _, payload in resend:
+                    self.sock.sendall(frame(BATCH, payload))
+                self._send_loop(len(resend))
+            except (OSError, ValueError):
+                pass
+            finally:
+                with self.condition:
+                    self.connected = False
+                    self.condition.notify_all()
+                if self.sock is not None:
+                    self.sock.close()
+                    self.sock = None
+            if not self.stopping:
+                delay = RECONNECT_DELAYS[min(attempt, len(RECONNECT_DELAYS) - 1)]
+                attempt += 1
+                with self.condition:
+                    self.condition.wait_for(lambda: self.stopping, delay)
+
+    def _send_loop(self, in_flight):
+        buffer = b''
+        while True:
+            with self.condition:
+                while not self.stopping:
+                    due = self.first_row_at is not None and (
+                        len(self.rows) >= self.batch_rows
+                        or time.monotonic() - self.first_row_at >= self.flush_interval)
+                    if (due and in_flight < MAX_IN_FLIGHT) or in_flight:
+                        break
+                    timeout = (self.flush_interval - (time.monotonic() - self.first_row_at)
+                               if self.first_row_at is not None else None)
+                    self.condition.wait(timeout)
+                if self.stopping:
+                    return
+                batch = self._take_batch() if due and in_flight < MAX_IN_FLIGHT else None
+            if batch is not None:
+                self.sock.sendall(frame(BATCH, batch[1]))
+                in_flight += 1
+                with self.condition:
+                    self.sent += 1
+            # نقرأ التأكيدات المتاحة، وننتظرها فقط عند امتلاء نافذة الإرسال
+            wait = 1.0 if in_flight >= MAX_IN_FLIGHT or batch is None else 0
+            readable, _, _ = select.select([self.sock], [], [], wait)
+            if not readable:
+                continue
+            data = self.sock.recv(65536)
+            if not data:
+                raise ConnectionError("Collector closed the connection")
+            buffer += data
+            while len(buffer) >= _FRAME.size + _ACK.size:
+                magic, kind, length = _FRAME.unpack_from(buffer)
+                if magic != MAGIC or kind != ACK:
+                    raise ValueError("Unexpected frame from the collector")
+                _, seq = _ACK.unpack_from(buffer, _FRAME.size)
+                buffer = buffer[_FRAME.size + length:]
+                in_flight = max(in_flight - 1, 0)
+                with self.condition:
+                    while self.unacked and self.unacked[0][0] <= seq:
+                        self.unacked.popleft()
+                        self.acked += 1
+                    self.condition.notify_all()
+
+
+class Collector:
+    """asyncio server that ingests agent batches into one ``ResultStore``.
+
+    Every connection is served by its own coroutine. Decoding, id mapping,
+    deduplication and the store write run on one ingest thread, so the
+    event loop keeps reading other agents meanwhile and batches are
+    written one at a time; they are vectorized, so a core ingests far more
+    than 10k rows/s. The last (session, seq) written per agent and each agent's
+    HELLO info are kept in ``agents.json`` next to the store (saved at most
+    every ``STATE_SAVE_INTERVAL`` seconds, so a crash can let a few resent
+    batches through twice).
+    """
+
+    def __init__(self, store, host=DEFAULT_BIND, port=DEFAULT_PORT, token=''):
+        self.store = store
+        self.host = host
+        self.port = port
+        self.token = token
+        self.server = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='collector-ingest')
+        self.agents = load_agents(store.path)
+        self.connections = 0
+        self.batches = 0
+        self.rows = 0
+        self.duplicates = 0
+        self.errors = 0
+        self._saved_at = 0.0
+
+    @classmethod
+    def from_config(cls, config, store):
+        return cls(store, config.get('Collector', 'bind', fallback=DEFAULT_BIND),
+                   config.getint('Collector', 'port', fallback=DEFAULT_PORT),
+                   token=config.get('Collector', 'token', fallback='').strip())
+
+    async def start(self):
+        """Start listening; returns the bound port."""
+        if not self.token and not is_loopback(self.host):
+            raise ValueError(f"A [Collector] token is needed to listen on {self.host}.")
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=True)
+        self.save_state()
+
+    async def serve(self, stop):
+        """Serve until the ``asyncio.Event`` ``stop`` is set."""
+        await self.start()
+        try:
+            await stop.wait()
+        finally:
+            await self.close()
+
+    def stats(self):
+        return {'agents': len(self.agents), 'connections': self.connections, 'batches': self.batches,
+                'rows': self.rows, 'duplicates': self.duplicates, 'errors': self.errors}
+
+    def save_state(self):
+        path = os.path.join(self.store.path, AGENTS_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.agents, f)
+        os.replace(path + '.tmp', path)
+        self._saved_at = time.monotonic()
+
+    async def _read_frame(self, reader):
+        magic, kind, length = _FRAME.unpack(await reader.readexactly(_FRAME.size))
+        if magic != MAGIC or length > MAX_FRAME:
+            raise ValueError("Bad frame")
+        return kind, await reader.readexactly(length)
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        try:
+            kind, payload = await self._read_frame(reader)
+            if kind != HELLO:
+                raise ValueError("Expected HELLO")
+            hello = json.loads(payload)
+            token = str(hello.pop('token', ''))
+            if not hmac.compare_digest(token.encode(), self.token.encode()):
+                raise ValueError("Bad token")
+            agent = str(hello.pop('agent'))
+            if not agent or AGENT_SEPARATOR in agent:
+                raise ValueError(f"Bad agent name: {agent!r}")
+            hello.update(address=writer.get_extra_info('peername')[0], last_seen=time.time())
+            loop = asyncio.get_running_loop()
+            # self.agents لا يلمس إلا من خيط الكتابة، حيث يحفظ أيضاً
+            await loop.run_in_executor(self.executor, self._register, agent, hello)
+            while True:
+                kind, payload = await self._read_frame(reader)
+                if kind != BATCH:
+                    raise ValueError("Expected BATCH")
+                # الكتابة إلى المخزن قد تطول (ختم مقطع)، فلا تحجز حلقة الأحداث
+                session, seq = await loop.run_in_executor(self.executor, self._ingest_and_save, agent, payload)
+                writer.write(frame(ACK, _ACK.pack(session, seq)))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except (ValueError, KeyError, struct.error, zlib.error):
+            self.errors += 1
+        finally:
+            self.connections -= 1
+            writer.close()
+
+    def _register(self, agent, hello):
+        self.agents.setdefault(agent, {'session': None, 'seq': 0}).update(hello)
+
+    def _ingest_and_save(self, agent, payload):
+        result = self.ingest(agent, payload)
+        if time.monotonic() - self._saved_at >= STATE_SAVE_INTERVAL:
+            self.save_state()
+        return result
+
+    def ingest(self, agent, payload):
+        """Write one batch unless it was written before; returns its ``(session, seq)``."""
+        session, seq, targets, metrics, rows = decode_batch(payload)
+        info = self.agents[agent]
+        if info.get('session') == session and seq <= info.get('seq', 0):
+            self.duplicates += 1
+            return session, seq
+        if len(rows):
+            target_ids = np.array([self.store.intern_target(agent_target(agent, name)) for name in targets],
+                                  dtype=np.uint16)
+            metric_ids = np.array([self.store.intern_metric(name) for name in metrics], dtype=np.uint16)
+            rows['target'] = target_ids[rows['target']]
+            rows['metric'] = metric_ids[rows['metric']]
+            # صفوف مكررة داخل الدفعة نفسها (نفس الوقت والهدف والمقياس) تكتب مرة واحدة
+            _, first = np.unique(rows[['ts', 'target', 'metric']], return_index=True)
+            if len(first) < len(rows):
+                rows = rows[np.sort(first)]
+            self.store.append_array(rows)
+        info.update(session=session, seq=seq, last_seen=time.time())
+        self.batches += 1
+        self.rows += len(rows)
+        return session, seq
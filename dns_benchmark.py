@@ -0,0 +1,310 @@
+import asyncio
+import random
+import socket
+import struct
+import time
+
+from latency_histogram import LatencyHistogram
+
+DEFAULT_RESOLVERS = '8.8.8.8, 1.1.1.1'
+DEFAULT_DOMAINS = 'google.com, wikipedia.org, github.com, amazon.com, cloudflare.com'
+DEFAULT_TIMEOUT = 2.0
+DEFAULT_CONCURRENCY = 50
+DNS_PORT = 53
+QTYPE_A = 1
+QCLASS_IN = 1
+RCODE_NXDOMAIN = 3
+PHASES = ('cold', 'warm')
+PHASE_PERCENTILES = (50, 90, 99)
+
+_HEADER = struct.Struct('!HHHHHH')
+_FLAG_RD = 0x0100
+_FLAG_QR = 0x8000
+_FLAG_AA = 0x0400
+_FLAG_TC = 0x0200
+_QUERY_ERRORS = (OSError, ValueError, struct.error, IndexError, asyncio.IncompleteReadError)
+
+
+def build_query(qid, name, qtype=QTYPE_A):
+    """A standard recursive query for ``name``."""
+    labels = b''.join(bytes([len(label)]) + label
+                      for label in (part.encode('idna') for part in name.rstrip('.').split('.')))
+    return _HEADER.pack(qid, _FLAG_RD, 1, 0, 0, 0) + labels + b'\0' + struct.pack('!HH', qtype, QCLASS_IN)
+
+
+def _skip_name(data, offset):
+    while True:
+        length = data[offset]
+        if length == 0:
+            return offset + 1
+        if length & 0xC0 == 0xC0:
+            # مؤشر ضغط: اسم مشترك في موضع سابق من الرسالة
+            return offset + 2
+        offset += 1 + length
+
+
+def parse_response(data):
+    """Header fields and the A-record addresses of a DNS response."""
+    qid, flags, qdcount, ancount, _, _ = _HEADER.unpack_from(data)
+    response = {'id': qid, 'rcode': flags & 0xF, 'truncated': bool(flags & _FLAG_TC), 'addresses': []}
+    if response['truncated']:
+        return response
+    offset = _HEADER.size
+    for _ in range(qdcount):
+        offset = _skip_name(data, offset) + 4
+    for _ in range(ancount):
+        offset = _skip_name(data, offset)
+        rtype, _, _, rdlength = struct.unpack_from('!HHIH', data, offset)
+        offset += 10
+        if rtype == QTYPE_A and rdlength == 4:
+            response['addresses'].append(socket.inet_ntoa(data[offset:offset + 4]))
+        offset += rdlength
+    return response
+
+
+def parse_resolver(item):
+    """``'1.1.1.1'`` or ``'127.0.0.1:5353'`` -> ``(host, port)``."""
+    host, _, port = item.rpartition(':')
+    if host and port.isdigit() and host.count(':') == 0:
+        return host, int(port)
+    return item, DNS_PORT
+
+
+class _ResolverProtocol(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.pending = {}
+
+    def datagram_received(self, data, addr):
+        if len(data) < _HEADER.size:
+            return
+        future = self.pending.pop(struct.unpack_from('!H', data)[0], None)
+        if future is not None and not future.done():
+            future.set_result(data)
+
+    def error_received(self, exc):
+        # ICMP port unreachable وما شابه: يفشل كل استعلام معلق لهذا الخادم
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(exc)
+        self.pending.clear()
+
+
+class ResolverClient:
+    """Queries one resolver over a single UDP socket, retrying truncated answers over TCP."""
+
+    def __init__(self, host, port=DNS_PORT, timeout=DEFAULT_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.transport = None
+        self.protocol = None
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+        self.transport, self.protocol = await loop.create_datagram_endpoint(
+            _ResolverProtocol, remote_addr=(self.host, self.port))
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+    def _next_id(self):
+        while True:
+            qid = random.getrandbits(16)
+            if qid not in self.protocol.pending:
+                return qid
+
+    async def _query_udp(self, qid, query):
+        future = asyncio.get_running_loop().create_future()
+        self.protocol.pending[qid] = future
+        self.transport.sendto(query)
+        try:
+            return await future
+        finally:
+            self.protocol.pending.pop(qid, None)
+
+    async def _query_tcp(self, query):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write(struct.pack('!H', len(query)) + query)
+            length, = struct.unpack('!H', await reader.readexactly(2))
+            return await reader.readexactly(length)
+        finally:
+            writer.close()
+
+    async def query(self, name):
+        """``(rtt_us, response, transport)``; raises ``asyncio.TimeoutError``."""
+        qid = self._next_id()
+        query = build_query(qid, name)
+        start = time.perf_counter()
+        response = parse_response(await asyncio.wait_for(self._query_udp(qid, query), self.timeout))
+        via = 'udp'
+        if response['truncated']:
+            remaining = max(self.timeout - (time.perf_counter() - start), 0.001)
+            response = parse_response(await asyncio.wait_for(self._query_tcp(query), remaining))
+            via = 'tcp'
+        return int((time.perf_counter() - start) * 1_000_000), response, via
+
+
+class DnsBenchmark:
+    """Times direct queries for ``domains`` against every resolver in ``resolvers``.
+
+    The "cold" pass queries a random label under every domain
+    (``<label>.<domain>``), a name no resolver can have cached, so it
+    always times a full lookup. The domains are then queried once untimed
+    to make sure they are cached, and the "warm" pass times them again.
+    Queries for one resolver run concurrently, at most ``concurrency`` in
+    flight; ``queries`` and the other counts cover the timed passes.
+    """
+
+    def __init__(self, resolvers, domains, timeout=DEFAULT_TIMEOUT, concurrency=DEFAULT_CONCURRENCY):
+        self.resolvers = list(resolvers)
+        self.domains = list(domains)
+        self.timeout = timeout
+        self.concurrency = concurrency
+
+    @classmethod
+    def from_config(cls, config):
+        """None when no resolvers are configured in ``[DNS]``."""
+        def split(option, fallback):
+            value = config.get('DNS', option, fallback=fallback)
+            return [item.strip() for item in value.split(',') if item.strip()]
+
+        resolvers = split('resolvers', DEFAULT_RESOLVERS)
+        domains = split('domains', DEFAULT_DOMAINS)
+        if not resolvers or not domains:
+            return None
+        return cls(resolvers, domains,
+                   timeout=config.getfloat('DNS', 'timeout', fallback=DEFAULT_TIMEOUT),
+                   concurrency=config.getint('DNS', 'concurrency', fallback=DEFAULT_CONCURRENCY))
+
+    async def bench_resolver(self, resolver):
+        host, port = parse_resolver(resolver)
+        histograms = {phase: LatencyHistogram() for phase in PHASES}
+        counts = {'queries': 0, 'answered': 0, 'timeouts': 0, 'errors': 0, 'tcp_fallbacks': 0}
+        semaphore = asyncio.Semaphore(self.concurrency)
+        client = ResolverClient(host, port, self.timeout)
+
+        async def prime(domain):
+            async with semaphore:
+                try:
+                    await client.query(domain)
+                except (asyncio.TimeoutError,) + _QUERY_ERRORS:
+                    pass
+
+        async def one(domain, phase):
+            async with semaphore:
+                counts['queries'] += 1
+                try:
+                    rtt, response, via = await client.query(domain)
+                except asyncio.TimeoutError:
+                    counts['timeouts'] += 1
+                    return
+                except _QUERY_ERRORS:
+                    counts['errors'] += 1
+                    return
+            if via == 'tcp':
+                counts['tcp_fallbacks'] += 1
+            # NXDOMAIN إجابة صحيحة زمنياً، أما SERVFAIL وغيرها فتعد أخطاء
+            if response['rcode'] not in (0, RCODE_NXDOMAIN):
+                counts['errors'] += 1
+                return
+            counts['answered'] += 1
+            histograms[phase].record(rtt)
+
+        try:
+            await client.open()
+            # اسم عشوائي جديد في كل تشغيل لا يمكن أن يكون في ذاكرة المحلل المؤقتة
+            label = f'{random.getrandbits(48):012x}'
+            await asyncio.gather(*(one(f'{label}.{domain}', 'cold') for domain in self.domains))
+            if counts['answered']:
+                await asyncio.gather(*(prime(domain) for domain in self.domains))
+            await asyncio.gather(*(one(domain, 'warm') for domain in self.domains))
+        except OSError as e:
+            counts['errors'] += len(self.domains) * len(PHASES) - counts['queries']
+            counts['error'] = str(e)
+        finally:
+            client.close()
+
+        result = {'resolver': resolver, **counts}
+        for phase, histogram in histograms.items():
+            quantiles = histogram.percentiles(PHASE_PERCENTILES)
+            result[phase] = {f'p{q}': quantiles[q] / 1000 if quantiles[q] is not None else None
+                             for q in PHASE_PERCENTILES}
+            mean = histogram.mean()
+            result[phase]['mean'] = mean / 1000 if mean is not None else None
+        return result
+
+    async def run_async(self):
+        return list(await asyncio.gather(*(self.bench_resolver(resolver) for resolver in self.resolvers)))
+
+    def run(self):
+        return asyncio.run(self.run_async())
+
+
+class StubResolverProtocol(asyncio.DatagramProtocol):
+    """Answers every A query with ``address`` (a stand-in resolver for tests).
+
+    The first query for a name waits ``miss_delay`` seconds, later ones
+    ``hit_delay``, imitating a resolver cache. With ``truncate`` every UDP
+    answer has the TC bit set, so clients must retry over TCP.
+    """
+
+    def __init__(self, address='127.0.0.1', hit_delay=0.0, miss_delay=0.0, truncate=False):
+        self.address = address
+        self.hit_delay = hit_delay
+        self.miss_delay = miss_delay
+        self.truncate = truncate
+        self.seen = set()
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def answer(self, query, truncate=False):
+        qid, _, _, _, _, _ = _HEADER.unpack_from(query)
+        question_end = _skip_name(query, _HEADER.size) + 4
+        question = query[_HEADER.size:question_end]
+        flags = _FLAG_QR | _FLAG_AA | _FLAG_RD
+        if truncate:
+            return _HEADER.pack(qid, flags | _FLAG_TC, 1, 0, 0, 0) + question
+        record = struct.pack('!HHHIH', 0xC00C, QTYPE_A, QCLASS_IN, 60, 4) + socket.inet_aton(self.address)
+        return _HEADER.pack(qid, flags, 1, 1, 0, 0) + question + record
+
+    def delay_for(self, query):
+        name = query[_HEADER.size:_skip_name(query, _HEADER.size)].lower()
+        if name in self.seen:
+            return self.hit_delay
+        self.seen.add(name)
+        return self.miss_delay
+
+    def datagram_received(self, data, addr):
+        delay = self.delay_for(data)
+        reply = self.answer(data, self.truncate)
+        if delay:
+            asyncio.get_running_loop().call_later(delay, self.transport.sendto, reply, addr)
+        else:
+            self.transport.sendto(reply, addr)
+
+    async def handle_tcp(self, reader, writer):
+        try:
+            while True:
+                length, = struct.unpack('!H', await reader.readexactly(2))
+                query = await reader.readexactly(length)
+                reply = self.answer(query)
+                writer.write(struct.pack('!H', len(reply)) + reply)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+async def start_stub_resolver(host='127.0.0.1', port=0, **kwargs):
+    """Serve a ``StubResolverProtocol`` on UDP and TCP; returns ``(transport, server, port)``."""
+    loop = asyncio.get_running_loop()
+    transport, protocol = await loop.create_datagram_endpoint(
+        lambda: StubResolverProtocol(**kwargs), local_addr=(host, port))
+    port = transport.get_extra_info('sockname')[1]
+    server = await asyncio.start_server(protocol.handle_tcp, host, port)
+    return transport, server, port
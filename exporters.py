@@ -0,0 +1,339 @@
+import abc
+import csv
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+from result_store import to_micros
+
+EXPORT_COLUMNS = ['Timestamp', 'Ping (ms)', 'DNS Lookup', 'Download Speed (Mbps)',
+                  'Upload Speed (Mbps)', 'Speedtest Ping (ms)']
+PDF_COLUMNS = ['Timestamp', 'Ping (ms)', 'DNS Lookup', 'Download (Mbps)', 'Upload (Mbps)',
+               'Speedtest Ping (ms)']
+PDF_ROWS_PER_PAGE = 28
+# أكثر من هذا العدد من الاختبارات يلخص في الـ PDF بمتوسطات دقيقة/ساعة/يوم
+PDF_MAX_ROWS = 1000
+SUMMARY_COLUMNS = ['Period', 'Tests', 'Ping (ms)', 'DNS Success (%)', 'Download (Mbps)', 'Upload (Mbps)',
+                   'Speedtest Ping (ms)']
+SUMMARY_METRICS = ['ping.avg', 'dns.success', 'speed.download', 'speed.upload', 'speed.ping']
+PERIOD_FORMATS = {'1min': "%Y-%m-%d %H:%M", '1h': "%Y-%m-%d %H:00", '1d': "%Y-%m-%d"}
+PERIOD_NAMES = {'1min': 'per-minute', '1h': 'hourly', '1d': 'daily'}
+PROGRESS_EVERY = 5000
+STATE_FILE = 'exports.json'
+
+
+def table_row(record):
+    """One ``save_results``-style row, or None for records without test results."""
+    values = {}
+    for _, metric, value in record['values']:
+        values.setdefault(metric, value)
+    # نفس قواعد history_entry لكن دون بناء القاموس الكامل لكل سجل
+    if not any(metric in values for metric in ('ping.avg', 'ping.loss', 'dns.success', 'speed.download')):
+        return None
+    if 'dns.success' in values:
+        dns = 'Success' if values['dns.success'] else 'Failure'
+    else:
+        dns = None
+    return [
+        record['timestamp'],
+        values.get('ping.avg'),
+        dns,
+        values.get('speed.download'),
+        values.get('speed.upload'),
+        values.get('speed.ping'),
+    ]
+
+
+def _cell(value):
+    return f"{value:.2f}" if value is not None else 'N/A'
+
+
+def summary_rows(store, buckets, level):
+    """One row per period of rollup ``buckets``, averaged over all targets by sample count."""
+    periods, index = np.unique(buckets['start'], return_inverse=True)
+    tests = np.zeros(len(periods))
+    columns = []
+    for metric in SUMMARY_METRICS:
+        mask = buckets['metric'] == store.metric_id(metric)
+        counts = np.bincount(index[mask], weights=buckets['count'][mask], minlength=len(periods))
+        sums = np.bincount(index[mask], weights=buckets['count'][mask] * buckets['mean'][mask],
+                           minlength=len(periods))
+        tests = np.maximum(tests, counts)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            columns.append(sums / counts)
+    columns[1] = columns[1] * 100
+    for i, start in enumerate(periods.tolist()):
+        period = datetime.fromtimestamp(start / 1_000_000).strftime(PERIOD_FORMATS[level])
+        yield [period, int(tests[i])] + [None if np.isnan(column[i]) else float(column[i]) for column in columns]
+
+
+def json_record(record):
+    metrics = {}
+    for target, metric, value in record['values']:
+        metrics.setdefault(target, {})[metric] = value
+    return {'timestamp': record['timestamp'], 'metrics': metrics}
+
+
+class Exporter(abc.ABC):
+    """Streams store records into a file, one chunk of the store at a time.
+
+    Subclasses implement ``open``/``write_record``/``close``. ``start``/``end``
+    limit the exported time range, and ``since_last`` exports only rows
+    stored after the previous export to the same file, whatever their
+    timestamps, so late imports are not missed. Exports that can append
+    (CSV, JSON lines) append to that file; the others write just the new
+    records. ``progress(done, total)`` is called from the exporting thread.
+    """
+
+    appendable = False
+
+    def __init__(self, store, path, start=None, end=None, since_last=False, progress=None):
+        self.store = store
+        self.path = path
+        self.start = to_micros(start) if isinstance(start, str) else start
+        self.end = to_micros(end) if isinstance(end, str) else end
+        self.since_last = since_last
+        self.progress = progress
+        self.state_path = os.path.join(store.path, STATE_FILE)
+        self.append = False
+
+    def load_state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_state(self, position):
+        state = self.load_state()
+        chunk, row = position
+        state[os.path.abspath(self.path)] = {'chunk': chunk, 'row': row}
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def run(self):
+        # موضع التخزين وليس أحدث طابع زمني: صفوف مستوردة لاحقاً قد تكون أقدم
+        position = self.store.position()
+        since = None
+        if self.since_last:
+            saved = self.load_state().get(os.path.abspath(self.path))
+            if isinstance(saved, dict):
+                since = (saved['chunk'], saved['row'])
+                self.append = self.appendable and os.path.exists(self.path)
+
+        total = max(self.store.count_rows(self.start, self.end), 1)
+        done = 0
+        exported = 0
+        reported = 0
+        self.open()
+        try:
+            for record in self.store.iter_records(self.start, self.end, since, position):
+                if self.write_record(record):
+                    exported += 1
+                done += len(record['values'])
+                if self.progress and done - reported >= PROGRESS_EVERY:
+                    reported = done
+                    self.progress(min(done, total), total)
+        finally:
+            self.close()
+        self.save_state(position)
+        if self.progress:
+            self.progress(total, total)
+        return exported
+
+    @abc.abstractmethod
+    def open(self):
+        """Create the file, or open it for appending when ``self.append`` is set."""
+
+    @abc.abstractmethod
+    def write_record(self, record):
+        """Write one store record; returns whether it produced a row."""
+
+    @abc.abstractmethod
+    def close(self):
+        """Flush and close the file."""
+
+
+class CsvExporter(Exporter):
+    appendable = True
+
+    def open(self):
+        self.file = open(self.path, 'a' if self.append else 'w', newline='')
+        self.writer = csv.writer(self.file)
+        if not self.append:
+            self.writer.writerow(EXPORT_COLUMNS)
+
+    def write_record(self, record):
+        row = table_row(record)
+        if row is not None:
+            self.writer.writerow(row)
+        return row is not None
+
+    def close(self):
+        self.file.close()
+
+
+class JsonLinesExporter(Exporter):
+    appendable = True
+
+    def open(self):
+        self.file = open(self.path, 'a' if self.append else 'w')
+
+    def write_record(self, record):
+        self.file.write(json.dumps(json_record(record)) + '\n')
+        return True
+
+    def close(self):
+        self.file.close()
+
+
+class ExcelExporter(Exporter):
+    def open(self):
+        import openpyxl
+        # وضع الكتابة فقط يكتب الصفوف إلى ملف مؤقت بدل الاحتفاظ بها في الذاكرة
+        self.workbook = openpyxl.Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet('Results')
+        self.sheet.append(EXPORT_COLUMNS)
+
+    def write_record(self, record):
+        row = table_row(record)
+        if row is not None:
+            self.sheet.append(row)
+        return row is not None
+
+    def close(self):
+        self.workbook.save(self.path)
+
+
+class PdfExporter(Exporter):
+    """Draws the history table page by page instead of building one ``Table``.
+
+    ``intro`` is an optional list of flowables (title, latest results)
+    drawn on the first page. With a ``RollupEngine`` in ``rollups``, a range
+    holding more than ``max_rows`` tests is summarised per minute, hour or
+    day instead, whichever is the finest that fits in ``max_rows`` rows.
+    """
+
+    def __init__(self, store, path, intro=None, rollups=None, max_rows=PDF_MAX_ROWS, **kwargs):
+        super().__init__(store, path, **kwargs)
+        self.intro = intro or []
+        self.rollups = rollups
+        self.max_rows = max_rows
+        self.columns = PDF_COLUMNS
+        self.heading = "Test History"
+
+    def summary_level(self):
+        """Rollup level for the history table, or None when every test fits."""
+        if self.rollups is None or self.since_last:
+            return None
+        hourly = self.rollups.level_buckets('1h', self.start, self.end)
+        if not len(hourly):
+            return None
+        tests = max(int(hourly['count'][hourly['metric'] == self.store.metric_id(metric)].sum())
+                    for metric in SUMMARY_METRICS)
+        if tests <= self.max_rows:
+            return None
+        start = self.start if self.start is not None else int(hourly['start'][0])
+        end = self.end if self.end is not None else int(hourly['start'][-1])
+        for name, width in self.rollups.levels:
+            if (end - start) // width + 1 <= self.max_rows:
+                return name
+        return self.rollups.levels[-1][0]
+
+    def run(self):
+        level = self.summary_level()
+        if level is None:
+            return super().run()
+        buckets = self.rollups.level_buckets(level, self.start, self.end)
+        self.columns = SUMMARY_COLUMNS
+        self.heading = f"Test History ({PERIOD_NAMES[level]} averages)"
+        exported = 0
+        self.open()
+        try:
+            for row in summary_rows(self.store, buckets, level):
+                self.add_row([row[0], str(row[1])] + [_cell(value) for value in row[2:]])
+                exported += 1
+        finally:
+            self.close()
+        if self.progress:
+            self.progress(1, 1)
+        return exported
+
+    def open(self):
+        from reportlab.lib.pagesizes import letter
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.pdfgen import canvas
+        from reportlab.platypus import Frame, Paragraph
+
+        self.page_size = letter
+        self.canvas = canvas.Canvas(self.path, pagesize=letter)
+        self.rows = []
+        width, height = letter
+        styles = getSampleStyleSheet()
+        intro = list(self.intro)
+        intro.append(Paragraph(self.heading, styles['Heading2']))
+        Frame(36, 36, width - 72, height - 72).addFromList(intro, self.canvas)
+        self.canvas.showPage()
+
+    def add_row(self, cells):
+        self.rows.append(cells)
+        if len(self.rows) >= PDF_ROWS_PER_PAGE:
+            self.flush_page()
+
+    def write_record(self, record):
+        row = table_row(record)
+        if row is None:
+            return False
+        self.add_row([row[0], _cell(row[1]), row[2] or 'N/A'] + [_cell(value) for value in row[3:]])
+        return True
+
+    def flush_page(self):
+        from reportlab.lib import colors
+        from reportlab.platypus import Table, TableStyle
+
+        table = Table([self.columns] + self.rows)
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 8),
+            ('TOPPADDING', (0, 1), (-1, -1), 6),
+            ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black)
+        ]))
+        width, height = self.page_size
+        table_width, table_height = table.wrapOn(self.canvas, width - 72, height - 72)
+        table.drawOn(self.canvas, (width - table_width) / 2, height - 36 - table_height)
+        self.canvas.showPage()
+        self.rows = []
+
+    def close(self):
+        if self.rows:
+            self.flush_page()
+        self.canvas.save()
+
+
+EXPORTERS = {
+    '.csv': CsvExporter,
+    '.json': JsonLinesExporter,
+    '.jsonl': JsonLinesExporter,
+    '.xlsx': ExcelExporter,
+    '.pdf': PdfExporter,
+}
+
+
+def exporter_for(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in EXPORTERS:
+        raise ValueError(f"Unsupported export format: {extension}")
+    return EXPORTERS[extension]
@@ -0,0 +1,382 @@
+"""HTTP(S) request timing split into DNS, TCP connect, TLS handshake, TTFB and transfer.
+
+``HttpProber.request(url)`` sends a GET over a new connection (cold) and
+then ``warm_requests`` more over an idle keep-alive connection: one pooled
+by an earlier request to the same origin, or the cold one when none is
+left. TLS runs through ``ssl.SSLObject`` over memory BIOs instead
+of an asyncio transport, so the handshake is timed on its own and resumes
+the session cached from the last connection to that host. Only the
+standard library is used; ``LocalHttpServer`` serves HTTP or HTTPS on
+loopback for testing.
+"""
+import asyncio
+import socket
+import ssl
+import statistics
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_WARM_REQUESTS = 1
+DEFAULT_BODY_SIZE = 16 * 1024
+RECV_SIZE = 64 * 1024
+MAX_HEADER = 64 * 1024
+USER_AGENT = 'network-performance-tool'
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+PHASES = ('dns', 'connect', 'tls', 'ttfb', 'transfer')
+
+
+class _Connection:
+    """A non-blocking socket, optionally wrapped in TLS, with a read buffer.
+
+    The socket is driven through ``loop.sock_*`` of whichever loop is
+    running, so a pooled connection can serve a later cycle's loop.
+    """
+
+    def __init__(self, sock, origin):
+        self.sock = sock
+        self.origin = origin
+        self.tls = None
+        self.buffer = b''
+
+    async def start_tls(self, context, hostname, session=None):
+        self.incoming, self.outgoing = ssl.MemoryBIO(), ssl.MemoryBIO()
+        self.tls = context.wrap_bio(self.incoming, self.outgoing, server_hostname=hostname, session=session)
+        while True:
+            try:
+                self.tls.do_handshake()
+                break
+            except ssl.SSLWantReadError:
+                await self._flush()
+                await self._fill()
+        await self._flush()
+
+    async def _flush(self):
+        data = self.outgoing.read()
+        if data:
+            await asyncio.get_running_loop().sock_sendall(self.sock, data)
+
+    async def _fill(self):
+        data = await asyncio.get_running_loop().sock_recv(self.sock, RECV_SIZE)
+        if data:
+            self.incoming.write(data)
+        else:
+            self.incoming.write_eof()
+
+    async def send(self, data):
+        if self.tls is None:
+            await asyncio.get_running_loop().sock_sendall(self.sock, data)
+            return
+        self.tls.write(data)
+        await self._flush()
+
+    async def recv(self):
+        """Next bytes from the peer, b'' once it has closed the connection."""
+        if self.tls is None:
+            return await asyncio.get_running_loop().sock_recv(self.sock, RECV_SIZE)
+        while True:
+            try:
+                return self.tls.read(RECV_SIZE)
+            except ssl.SSLWantReadError:
+                # قد يحتاج TLS إلى إرسال رد (مثل KeyUpdate) قبل القراءة
+                await self._flush()
+                await self._fill()
+            except (ssl.SSLZeroReturnError, ssl.SSLEOFError):
+                return b''
+
+    async def more(self):
+        data = await self.recv()
+        if not data:
+            raise ConnectionError("Connection closed by the server")
+        self.buffer += data
+
+    async def read_until(self, marker, limit=MAX_HEADER):
+        while marker not in self.buffer:
+            if len(self.buffer) > limit:
+                raise ValueError("Response header too long")
+            await self.more()
+        head, _, self.buffer = self.buffer.partition(marker)
+        return head
+
+    async def skip(self, size):
+        """Discard ``size`` bytes of body without keeping them."""
+        while len(self.buffer) < size:
+            size -= len(self.buffer)
+            self.buffer = b''
+            await self.more()
+        self.buffer = self.buffer[size:]
+
+    async def skip_to_eof(self):
+        size = len(self.buffer)
+        self.buffer = b''
+        while data := await self.recv():
+            size += len(data)
+        return size
+
+    def close(self):
+        self.sock.close()
+
+
+class HttpProber:
+    """Times HTTP(S) GET requests, cold and over a reused keep-alive connection.
+
+    ``sessions`` keeps the last TLS session per host and port so cold
+    connections after the first resume it (``resumed`` in the result);
+    ``pool`` keeps the idle connections of each origin for the warm phase
+    of later requests, most recently used first, so it holds at most as
+    many as were in flight at once. Both are shared by every loop and
+    thread using the prober.
+    """
+
+    def __init__(self, warm_requests=DEFAULT_WARM_REQUESTS, keep_alive=True, session_cache=True,
+                 verify=True, ca_file=None):
+        self.warm_requests = warm_requests
+        self.keep_alive = keep_alive
+        self.session_cache = session_cache
+        self.context = ssl.create_default_context(cafile=ca_file or None)
+        if not verify:
+            self.context.check_hostname = False
+            self.context.verify_mode = ssl.CERT_NONE
+        self.sessions = {}
+        self.pool = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(warm_requests=config.getint('HTTP', 'warm_requests', fallback=DEFAULT_WARM_REQUESTS),
+                   keep_alive=config.getboolean('HTTP', 'keep_alive', fallback=True),
+                   session_cache=config.getboolean('HTTP', 'session_cache', fallback=True),
+                   verify=config.getboolean('HTTP', 'verify', fallback=True),
+                   ca_file=config.get('HTTP', 'ca_file', fallback='').strip() or None)
+
+    async def _connect(self, scheme, host, port):
+        """Open a connection; returns it with the DNS, connect and TLS times in ms."""
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        infos = await loop.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        resolved = time.perf_counter()
+        family, kind, proto, _, address = infos[0]
+        sock = socket.socket(family, kind, proto)
+        sock.setblocking(False)
+        connection = _Connection(sock, (scheme, host, port))
+        try:
+            await loop.sock_connect(sock, address)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connected = time.perf_counter()
+            tls = None
+            if scheme == 'https':
+                session = None
+                if self.session_cache:
+                    with self.lock:
+                        session = self.sessions.get((host, port))
+                await connection.start_tls(self.context, host, session)
+                tls = (time.perf_counter() - connected) * 1000
+        except BaseException:
+            connection.close()
+            raise
+        connection.address = address[0]
+        return connection, (resolved - start) * 1000, (connected - resolved) * 1000, tls
+
+    async def _exchange(self, connection, request):
+        """One request/response; returns its timing and whether the connection stays open."""
+        sent = time.perf_counter()
+        await connection.send(request)
+        if not connection.buffer:
+            await connection.more()
+        first = time.perf_counter()
+        head = (await connection.read_until(b'\r\n\r\n')).decode('iso-8859-1').split('\r\n')
+        version, status = head[0].split(' ', 2)[:2]
+        status = int(status)
+        headers = {}
+        for line in head[1:]:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip().lower()
+
+        keep_alive = version == 'HTTP/1.1' and headers.get('connection') != 'close'
+        if status < 200 or status in (204, 304):
+            size = 0
+        elif 'chunked' in headers.get('transfer-encoding', ''):
+            size = 0
+            while chunk := int((await connection.read_until(b'\r\n')).split(b';')[0], 16):
+                await connection.skip(chunk + 2)
+                size += chunk
+            # الترويسات الختامية تنتهي بسطر فارغ
+            while await connection.read_until(b'\r\n'):
+                pass
+        elif 'content-length' in headers:
+            size = int(headers['content-length'])
+            await connection.skip(size)
+        else:
+            size = await connection.skip_to_eof()
+            keep_alive = False
+        done = time.perf_counter()
+        return {'status': status, 'bytes': size, 'ttfb': (first - sent) * 1000,
+                'transfer': (done - first) * 1000}, keep_alive
+
+    async def _warm(self, fresh, request):
+        """Warm exchanges over the pooled connection, or over ``fresh`` when there is none.
+
+        Returns the timings, the connection left open afterwards (or None)
+        and whether the pooled connection served them.
+        """
+        with self.lock:
+            idle = self.pool.get(fresh.origin)
+            pooled = idle.pop() if idle else None
+        if pooled is not None:
+            timings, keep_alive = await self._repeat(pooled, request)
+            if timings:
+                fresh.close()
+                return timings, pooled if keep_alive else None, True
+            # الخادم أغلق الاتصال الخامل؛ نعود إلى الاتصال الجديد
+        timings, keep_alive = await self._repeat(fresh, request)
+        return timings, fresh if keep_alive else None, False
+
+    async def _repeat(self, connection, request):
+        """Up to ``warm_requests`` exchanges; stops early once the server closes the connection."""
+        timings, keep_alive = [], True
+        try:
+            while keep_alive and len(timings) < self.warm_requests:
+                timing, keep_alive = await self._exchange(connection, request)
+                timings.append(timing)
+        except (OSError, ValueError):
+            keep_alive = False
+        except BaseException:
+            connection.close()
+            raise
+        if not keep_alive:
+            connection.close()
+        return timings, keep_alive
+
+    async def request(self, url):
+        parts = urllib.parse.urlsplit(url)
+        scheme = parts.scheme.lower()
+        if scheme not in DEFAULT_PORTS or not parts.hostname:
+            raise ValueError(f"Unsupported URL: {url}")
+        host, port = parts.hostname, parts.port or DEFAULT_PORTS[scheme]
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        authority = host if port == DEFAULT_PORTS[scheme] else f'{host}:{port}'
+        if ':' in host:
+            authority = f'[{host}]' if port == DEFAULT_PORTS[scheme] else f'[{host}]:{port}'
+        request = (f"GET {path} HTTP/1.1\r\nHost: {authority}\r\nUser-Agent: {USER_AGENT}\r\n"
+                   f"Accept: */*\r\nConnection: keep-alive\r\n\r\n").encode()
+
+        connection, dns, connect, tls = await self._connect(scheme, host, port)
+        left = None
+        try:
+            cold, keep_alive = await self._exchange(connection, request)
+            resumed = connection.tls is not None and connection.tls.session_reused
+            # جلسات TLS 1.3 تصل بعد المصافحة، لذا نحفظها بعد قراءة الرد الأول
+            if connection.tls is not None and self.session_cache and connection.tls.session is not None:
+                with self.lock:
+                    self.sessions[(host, port)] = connection.tls.session
+            warm, pooled = [], False
+            if keep_alive and self.warm_requests > 0:
+                warm, left, pooled = await self._warm(connection, request)
+            elif keep_alive:
+                left = connection
+            else:
+                connection.close()
+        except BaseException:
+            connection.close()
+            raise
+        if left is not None:
+            if self.keep_alive:
+                with self.lock:
+                    self.pool.setdefault(left.origin, []).append(left)
+            else:
+                left.close()
+
+        total = dns + connect + (tls or 0) + cold['ttfb'] + cold['transfer']
+        result = {'latency': total, 'success': cold['status'] < 400, 'status': cold['status'],
+                  'bytes': cold['bytes'], 'address': connection.address, 'resumed': resumed,
+                  'dns': dns, 'connect': connect, 'tls': tls, 'ttfb': cold['ttfb'],
+                  'transfer': cold['transfer'], 'pooled': pooled, 'warm_ttfb': None, 'warm_total': None}
+        if warm:
+            result['warm_ttfb'] = statistics.median(timing['ttfb'] for timing in warm)
+            result['warm_total'] = statistics.median(timing['ttfb'] + timing['transfer'] for timing in warm)
+        result['output'] = format_request(url, result)
+        return result
+
+    def close(self):
+        """Close every pooled connection."""
+        with self.lock:
+            pool, self.pool = self.pool, {}
+        for idle in pool.values():
+            for connection in idle:
+                connection.close()
+
+
+def format_request(url, result):
+    tls = '' if result['tls'] is None else (
+        f", TLS {result['tls']:.2f}" + (' resumed' if result['resumed'] else ''))
+    text = (f"{url}: HTTP {result['status']}, {result['bytes']} bytes in {result['latency']:.2f} ms "
+            f"(DNS {result['dns']:.2f}, connect {result['connect']:.2f}{tls}, "
+            f"TTFB {result['ttfb']:.2f}, transfer {result['transfer']:.2f})")
+    if result['warm_total'] is not None:
+        reuse = 'pooled connection' if result['pooled'] else 'same connection'
+        text += f"; {result['warm_total']:.2f} ms over the {reuse}"
+    return text
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # الترويسات والجسم يُرسلان منفصلين؛ Nagle كان سيؤخر الجسم حتى ACK المؤجل
+    disable_nagle_algorithm = True
+    # يغلق الاتصالات الخاملة كما تفعل الخوادم الحقيقية
+    timeout = 30
+
+    def do_GET(self):
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        body = self.server.body
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LocalHttpServer(ThreadingHTTPServer):
+    """Keep-alive HTTP/1.1 server on a background thread; HTTPS when given a certificate.
+
+    Every GET answers ``body_size`` bytes after ``delay`` seconds. TLS
+    handshakes run in the connection's own thread, not the accept loop.
+    """
+
+    daemon_threads = True
+    # الطابور الافتراضي (5) يسقط الاتصالات المتزامنة فيعيد العميل SYN بعد ثانية
+    request_queue_size = 128
+
+    def __init__(self, host='127.0.0.1', port=0, body_size=DEFAULT_BODY_SIZE, delay=0.0,
+                 certfile=None, keyfile=None):
+        super().__init__((host, port), _Handler)
+        self.body = b'x' * body_size
+        self.delay = delay
+        self.scheme = 'http'
+        if certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            self.socket = context.wrap_socket(self.socket, server_side=True, do_handshake_on_connect=False)
+            self.scheme = 'https'
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"{self.scheme}://{host}:{port}/"
+
+    def start(self):
+        """Serve from a background thread; returns the server's URL."""
+        self.thread = threading.Thread(target=self.serve_forever, name='http-server', daemon=True)
+        self.thread.start()
+        return self.url
+
+    def close(self):
+        if self.thread is not None:
+            self.shutdown()
+            self.thread = None
+        self.server_close()
@@ -0,0 +1,431 @@
+"""Bulk import of results saved by this tool or by its older versions.
+
+Reads CSV (``save_results`` and the legacy multi-line text layout),
+JSON lines written by ``JsonLinesExporter``, the JSON arrays of history
+entries written by early versions, and Excel files. Files are parsed a
+batch of lines at a time into ``ROW_DTYPE`` arrays, a column at a time
+with numpy rather than one dict per record. Several files are parsed in
+parallel worker processes. The store keeps a single writer, so the
+batches come back through a bounded queue and only this process appends
+them. Memory therefore stays at a few batches whatever the size of the
+files.
+"""
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from exporters import EXPORT_COLUMNS
+from result_store import MAX_NAMES, ROW_DTYPE, TIMESTAMP_FORMAT, flatten_result, parse_legacy_csv_row
+
+DEFAULT_BATCH_ROWS = 8192
+# عامل لكل نواة، فالتحليل محدود بالمعالج
+DEFAULT_WORKERS = min(os.cpu_count() or 1, 4)
+MISSING = frozenset(('', 'None', 'N/A', 'nan'))
+NO_TIME = np.iinfo(np.int64).min
+# عدد الدفعات المنتظرة لكل عامل قبل أن يتوقف عن القراءة
+QUEUE_BATCHES = 2
+
+
+def parse_times(stamps):
+    """Local ``YYYY-MM-DD HH:MM:SS`` strings to microseconds, ``NO_TIME`` where unparsable.
+
+    numpy parses the strings as UTC; the local offset is then looked up
+    once per distinct hour, so the result matches ``to_micros`` across
+    daylight saving changes.
+    """
+    try:
+        naive = np.array(stamps, dtype='datetime64[s]')
+    except ValueError:
+        naive = np.array([_datetime64(stamp) for stamp in stamps], dtype='datetime64[s]')
+    valid = ~np.isnat(naive)
+    seconds = naive.astype(np.int64)
+    ts = np.full(len(seconds), NO_TIME, dtype=np.int64)
+    if valid.any():
+        hours, inverse = np.unique(seconds[valid] // 3600, return_inverse=True)
+        offsets = np.array([(datetime(1970, 1, 1) + timedelta(hours=int(hour))).timestamp() - hour * 3600
+                            for hour in hours.tolist()], dtype=np.int64)
+        ts[valid] = (seconds[valid] + offsets[inverse]) * 1_000_000
+    return ts
+
+
+def _datetime64(stamp):
+    try:
+        return np.datetime64(stamp, 's')
+    except ValueError:
+        return np.datetime64('NaT')
+
+
+def _floats(column):
+    """Strings to float64, NaN for empty or unparsable cells."""
+    column = ['nan' if cell in MISSING else cell for cell in column]
+    try:
+        return np.array(column, dtype=np.float64)
+    except ValueError:
+        return np.array([_float(cell) for cell in column], dtype=np.float64)
+
+
+def _float(cell):
+    try:
+        return float(cell)
+    except ValueError:
+        return np.nan
+
+
+class _Batch:
+    """Rows of one batch, with target and metric ids local to the batch."""
+
+    def __init__(self):
+        self.targets = {}
+        self.metrics = {}
+        self.parts = []
+
+    @staticmethod
+    def _ids(ids, names):
+        if isinstance(names, str):
+            column = ids.setdefault(names, len(ids))
+        else:
+            column = np.array([ids.setdefault(name, len(ids)) for name in names], dtype=np.int64)
+        # معرفات u2 تلتف بصمت بعد 65535
+        if len(ids) > MAX_NAMES:
+            raise ValueError(f"More than {MAX_NAMES} distinct target or metric names in one batch.")
+        return column
+
+    def add(self, ts, targets, metrics, values):
+        """``targets``/``metrics`` are one name for every row or one name per row."""
+        values = np.asarray(values, dtype=np.float64)
+        keep = (ts != NO_TIME) & ~np.isnan(values)
+        part = np.empty(int(keep.sum()), dtype=ROW_DTYPE)
+        part['ts'] = ts[keep]
+        for field, ids, names in (('target', self.targets, targets), ('metric', self.metrics, metrics)):
+            column = self._ids(ids, names)
+            part[field] = column if isinstance(names, str) else column[keep]
+        part['value'] = values[keep]
+        self.parts.append(part)
+
+    def add_rows(self, rows):
+        """``(ts, target, metric, value)`` tuples from the per-row parsers."""
+        if rows:
+            ts, targets, metrics, values = zip(*rows)
+            self.add(np.array(ts, dtype=np.int64), targets, metrics, values)
+
+    def result(self):
+        rows = np.concatenate(self.parts) if self.parts else np.empty(0, dtype=ROW_DTYPE)
+        return rows, list(self.targets), list(self.metrics)
+
+
+def _add_table(batch, rows):
+    """The six ``save_results`` columns, converted a column at a time."""
+    stamps, ping, dns, download, upload, speed_ping = zip(*rows)
+    ts = parse_times(stamps)
+    batch.add(ts, '', 'ping.avg', _floats(ping))
+    dns = np.array(dns)
+    batch.add(ts, '', 'dns.success', np.where(dns == 'Success', 1.0, np.where(dns == 'Failure', 0.0, np.nan)))
+    batch.add(ts, 'speedtest', 'speed.download', _floats(download))
+    batch.add(ts, 'speedtest', 'speed.upload', _floats(upload))
+    batch.add(ts, 'speedtest', 'speed.ping', _floats(speed_ping))
+
+
+def _add_csv_rows(batch, rows):
+    table, legacy = [], []
+    for row in rows:
+        if not row or row[0] == EXPORT_COLUMNS[0]:
+            continue
+        (table if len(row) == len(EXPORT_COLUMNS) else legacy).append(row)
+    if table:
+        _add_table(batch, table)
+    # التخطيط النصي القديم متعدد الأسطر لا يقبل التحويل بالأعمدة
+    parsed = []
+    for row in legacy:
+        try:
+            parsed.extend(parse_legacy_csv_row(row))
+        except (ValueError, SyntaxError):
+            continue
+    batch.add_rows(parsed)
+
+
+def read_csv(path, batch_rows=DEFAULT_BATCH_ROWS):
+    """Yield ``(rows, targets, metrics, position)`` for every ``batch_rows`` lines of a CSV."""
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        while True:
+            rows = list(itertools.islice(reader, batch_rows))
+            if not rows:
+                break
+            batch = _Batch()
+            _add_csv_rows(batch, rows)
+            yield batch.result() + (f.buffer.tell(),)
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime(TIMESTAMP_FORMAT)
+    return str(value)
+
+
+def read_excel(path, batch_rows=DEFAULT_BATCH_ROWS):
+    """Same as ``read_csv`` for workbooks written by ``ExcelExporter``."""
+    import openpyxl
+    workbook = openpyxl.load_workbook(path, read_only=True)
+    try:
+        sheet = workbook.active
+        total = max(sheet.max_row or 1, 1)
+        size = os.path.getsize(path)
+        done = 0
+        rows = sheet.iter_rows(values_only=True)
+        width = len(EXPORT_COLUMNS)
+        while True:
+            # الكتب المصدّرة كلها بالأعمدة الستة نفسها؛ نقص الخلايا الفارغة في الذيل لا يغير التخطيط
+            chunk = [[_cell(value) for value in (tuple(row) + (None,) * width)[:width]]
+                     for row in itertools.islice(rows, batch_rows)]
+            if not chunk:
+                break
+            done += len(chunk)
+            batch = _Batch()
+            _add_csv_rows(batch, chunk)
+            yield batch.result() + (min(done, total) * size // total,)
+    finally:
+        workbook.close()
+
+
+def _add_objects(batch, objects):
+    stamps, index, targets, metrics, values = [], [], [], [], []
+    legacy = []
+    for obj in objects:
+        if not isinstance(obj, dict) or 'timestamp' not in obj:
+            continue
+        if 'metrics' not in obj:
+            # مدخلات السجل الكاملة كما كتبتها النسخ الأولى
+            try:
+                legacy.extend(flatten_result(obj))
+            except (KeyError, TypeError, ValueError, AttributeError):
+                pass
+            continue
+        record = len(stamps)
+        stamps.append(obj['timestamp'])
+        for target, values_by_metric in obj['metrics'].items():
+            for metric, value in values_by_metric.items():
+                index.append(record)
+                targets.append(target)
+                metrics.append(metric)
+                values.append(value if isinstance(value, (int, float)) else np.nan)
+    if index:
+        batch.add(parse_times(stamps)[np.array(index)], targets, metrics, values)
+    batch.add_rows(legacy)
+
+
+def read_json(path, batch_rows=DEFAULT_BATCH_ROWS):
+    """Same as ``read_csv`` for JSON lines, or for a JSON array of records or history entries."""
+    with open(path, encoding='utf-8') as f:
+        first = f.read(1)
+        while first.isspace():
+            first = f.read(1)
+        f.seek(0)
+        if first == '[':
+            # التصدير القديم مصفوفة واحدة بحجم السجل في الذاكرة، فنقرؤها كاملة
+            objects = json.load(f)
+            size = f.tell()
+            for start in range(0, len(objects), batch_rows):
+                batch = _Batch()
+                _add_objects(batch, objects[start:start + batch_rows])
+                yield batch.result() + (min(start + batch_rows, len(objects)) * size // len(objects),)
+            return
+        while True:
+            lines = list(itertools.islice(f, batch_rows))
+            if not lines:
+                break
+            objects = []
+            for line in lines:
+                line = line.strip()
+                if line:
+                    try:
+                        objects.append(json.loads(line))
+                    except ValueError:
+                        continue
+            batch = _Batch()
+            _add_objects(batch, objects)
+            yield batch.result() + (f.buffer.tell(),)
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+    '.jsonl': read_json,
+    '.xlsx': read_excel,
+}
+
+
+def reader_for(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in READERS:
+        raise ValueError(f"Unsupported import format: {extension}")
+    return READERS[extension]
+
+
+def _produce(path, batch_rows, batches):
+    """Worker process: parse one file and put its batches on the queue."""
+    try:
+        for batch in reader_for(path)(path, batch_rows):
+            batches.put(('rows', path) + batch)
+    except Exception as e:
+        batches.put(('error', path, f"{type(e).__name__}: {e}"))
+    batches.put(('done', path))
+
+
+def _member(keys, existing):
+    """``np.isin`` for int64 keys by binary search in the sorted ``existing``."""
+    if not len(existing):
+        return np.zeros(len(keys), dtype=bool)
+    existing = np.sort(existing)
+    return existing[np.minimum(np.searchsorted(existing, keys), len(existing) - 1)] == keys
+
+
+class Importer:
+    """Imports result files into a ``ResultStore``, skipping results it already holds.
+
+    A row is a duplicate when the store, or an earlier row of the import,
+    has a result for the same timestamp and target. The table layouts (CSV
+    and Excel) do not record the ping and DNS targets, so their target-less
+    rows also match a row of any target with the same timestamp and metric.
+    A file listed more than once is read once.
+    ``run()`` returns counts and the time range of the imported rows, which
+    ``RollupEngine.backfill`` takes. ``progress(done, total)`` gets bytes
+    read and is called from the importing thread.
+    """
+
+    def __init__(self, store, paths, workers=DEFAULT_WORKERS, batch_rows=DEFAULT_BATCH_ROWS, progress=None):
+        self.store = store
+        # الملف المكرر يُقرأ مرة واحدة: العمال ورسائلهم مفهرسة بالمسار
+        unique = {}
+        for path in paths:
+            unique.setdefault(os.path.realpath(path), path)
+        self.paths = list(unique.values())
+        self.workers = max(1, min(workers, len(self.paths)))
+        self.batch_rows = batch_rows
+        self.progress = progress
+        for path in self.paths:
+            reader_for(path)
+
+    @classmethod
+    def from_config(cls, config, store, paths, workers=None, progress=None):
+        """``workers`` overrides ``[Storage] import_workers`` (empty: one per core, at most four)."""
+        if workers is None:
+            workers = config.get('Storage', 'import_workers', fallback='').strip()
+            workers = int(workers) if workers else DEFAULT_WORKERS
+        return cls(store, paths, workers=workers, progress=progress)
+
+    def _inline(self):
+        for path in self.paths:
+            try:
+                for batch in reader_for(path)(path, self.batch_rows):
+                    yield ('rows', path) + batch
+            except Exception as e:
+                yield ('error', path, f"{type(e).__name__}: {e}")
+            yield ('done', path)
+
+    def _parallel(self):
+        # spawn بدل fork: الواجهة تعمل بعدة خيوط ولا يُنسخ Tk إلى العمال
+        context = multiprocessing.get_context('spawn')
+        batches = context.Queue(maxsize=self.workers * QUEUE_BATCHES)
+        pending = list(reversed(self.paths))
+        running = {}
+        try:
+            while pending or running:
+                while pending and len(running) < self.workers:
+                    path = pending.pop()
+                    running[path] = context.Process(target=_produce, args=(path, self.batch_rows, batches),
+                                                    daemon=True)
+                    running[path].start()
+                try:
+                    message = batches.get(timeout=1)
+                except queue.Empty:
+                    # عامل انتهى دون رسالة "done" (انهيار أو قتل)
+                    for path, process in list(running.items()):
+                        if not process.is_alive() and batches.empty():
+                            process.join()
+                            del running[path]
+                            yield ('error', path, f"Worker exited with code {process.exitcode}")
+                            yield ('done', path)
+                    continue
+                if message[0] == 'done':
+                    running.pop(message[1]).join()
+                yield message
+        finally:
+            for process in running.values():
+                process.terminate()
+                process.join()
+            batches.close()
+
+    def _fresh(self, rows):
+        """Sort a batch by time and drop rows the store already has."""
+        rows = rows[np.lexsort((rows['metric'], rows['target'], rows['ts']))]
+        repeat = np.zeros(len(rows), dtype=bool)
+        repeat[1:] = ((np.diff(rows['ts']) == 0) & (np.diff(rows['target']) == 0)
+                      & (np.diff(rows['metric']) == 0))
+        rows = rows[~repeat]
+        existing = self.store.query(int(rows['ts'][0]), int(rows['ts'][-1]))
+        if not len(existing):
+            return rows
+        # رتبة الطابع الزمني بدل قيمته حتى يتسع المفتاح المركب في int64
+        _, rank = np.unique(np.concatenate((existing['ts'], rows['ts'])), return_inverse=True)
+        rank = rank.astype(np.int64) << 16
+        old, new = rank[:len(existing)], rank[len(existing):]
+        seen = _member(new | rows['target'], old | existing['target'])
+        blank = self.store.target_id('')
+        if blank is not None:
+            new_metric, old_metric = new | rows['metric'], old | existing['metric']
+            seen |= (rows['target'] == blank) & _member(new_metric, old_metric)
+            seen |= _member(new_metric, old_metric[existing['target'] == blank])
+        return rows[~seen]
+
+    def _append(self, rows, targets, metrics):
+        # intern_target/intern_metric ترفض الاسم رقم 65537 بـ ValueError بدل أن يلتف المعرف
+        target_ids = np.array([self.store.intern_target(name) for name in targets], dtype='<u2')
+        metric_ids = np.array([self.store.intern_metric(name) for name in metrics], dtype='<u2')
+        rows['target'] = target_ids[rows['target']]
+        rows['metric'] = metric_ids[rows['metric']]
+        rows = self._fresh(rows)
+        if len(rows):
+            self.store.append_array(rows)
+        return rows
+
+    def run(self):
+        total = max(sum(os.path.getsize(path) for path in self.paths), 1)
+        read = dict.fromkeys(self.paths, 0)
+        stats = {'files': len(self.paths), 'rows': 0, 'imported': 0, 'duplicates': 0,
+                 'start': None, 'end': None, 'errors': []}
+        messages = self._parallel() if self.workers > 1 else self._inline()
+        try:
+            for message in messages:
+                kind, path = message[:2]
+                if kind == 'error':
+                    stats['errors'].append((path, message[2]))
+                    continue
+                if kind == 'done':
+                    read[path] = os.path.getsize(path)
+                else:
+                    rows, targets, metrics, position = message[2:]
+                    read[path] = position
+                    stats['rows'] += len(rows)
+                    if len(rows):
+                        rows = self._append(rows, targets, metrics)
+                        stats['imported'] += len(rows)
+                    if len(rows):
+                        first, last = int(rows['ts'][0]), int(rows['ts'][-1])
+                        stats['start'] = first if stats['start'] is None else min(stats['start'], first)
+                        stats['end'] = last if stats['end'] is None else max(stats['end'], last)
+                if self.progress:
+                    self.progress(min(sum(read.values()), total), total)
+        finally:
+            # يوقف العمال إن توقف الاستيراد بخطأ
+            messages.close()
+            self.store.flush()
+        stats['duplicates'] = stats['rows'] - stats['imported']
+        return stats
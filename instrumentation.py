@@ -0,0 +1,327 @@
+"""Per-stage timings, a Prometheus metrics endpoint and a sampling profiler.
+
+Only standard-library modules are imported, so the headless CLI can use
+it without pulling in numpy or Tkinter.
+"""
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_METRICS_BIND = '127.0.0.1'
+DEFAULT_PROFILE_INTERVAL = 0.005
+METRIC_PREFIX = 'netperf'
+# حدود المدرج التكراري بالثواني كما يعرضها Prometheus
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# آخر القيم لكل مرحلة، لحساب الوسيط وp99 في تبويب التشخيص
+RECENT = 256
+
+
+class _Stats:
+    __slots__ = ('count', 'total', 'max', 'last', 'buckets', 'recent')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = None
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.recent = deque(maxlen=RECENT)
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    __slots__ = ('instruments', 'name', 'timings', 'started')
+
+    def __init__(self, instruments, name, timings=None):
+        self.instruments = instruments
+        self.name = name
+        self.timings = timings
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.started
+        self.instruments.record(self.name, seconds)
+        if self.timings is not None:
+            self.timings[self.name] = seconds * 1000
+        return False
+
+
+class Cycle:
+    """Stage timings of one test cycle, in milliseconds, for ``results['timings']``."""
+
+    def __init__(self, instruments):
+        self.instruments = instruments
+        self.timings = {}
+
+    def stage(self, name):
+        return _Timer(self.instruments, name, self.timings)
+
+    def add(self, name, seconds):
+        self.instruments.record(name, seconds)
+        self.timings[name] = seconds * 1000
+
+
+class _NullCycle:
+    timings = {}
+
+    def stage(self, name):
+        return _NULL_TIMER
+
+    def add(self, name, seconds):
+        pass
+
+
+_NULL_CYCLE = _NullCycle()
+
+
+class Instruments:
+    """Monotonic per-stage timers with running totals and a latency histogram.
+
+    ``with instruments.stage('graph.redraw'):`` times a block with
+    ``time.perf_counter``. While ``enabled`` is false, ``stage`` and
+    ``cycle`` return shared no-op objects, so a disabled timer costs one
+    attribute check and an empty ``with`` block.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.stages = {}
+
+    def configure(self, config):
+        self.enabled = config.getboolean('Diagnostics', 'timing', fallback=self.enabled)
+
+    def stage(self, name):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def cycle(self):
+        if not self.enabled:
+            return _NULL_CYCLE
+        return Cycle(self)
+
+    def record(self, name, seconds):
+        with self.lock:
+            stats = self.stages.get(name)
+            if stats is None:
+                stats = self.stages[name] = _Stats()
+            stats.count += 1
+            stats.total += seconds
+            stats.max = max(stats.max, seconds)
+            stats.last = seconds
+            stats.buckets[bisect_left(BUCKETS, seconds)] += 1
+            stats.recent.append(seconds)
+
+    def expected(self, name, default):
+        """Mean seconds of a stage so far, or ``default`` before it has run."""
+        stats = self.stages.get(name)
+        return stats.total / stats.count if stats is not None and stats.count else default
+
+    def reset(self):
+        with self.lock:
+            self.stages.clear()
+
+    def snapshot(self):
+        """One dict per stage (times in milliseconds), sorted by stage name."""
+        with self.lock:
+            stages = [(name, stats.count, stats.total, stats.max, stats.last, sorted(stats.recent))
+                      for name, stats in self.stages.items()]
+        rows = []
+        for name, count, total, longest, last, recent in sorted(stages):
+            rows.append({
+                'stage': name,
+                'count': count,
+                'last': last * 1000,
+                'mean': total / count * 1000,
+                'p50': recent[int(0.5 * (len(recent) - 1))] * 1000,
+                'p99': recent[int(0.99 * (len(recent) - 1))] * 1000,
+                'max': longest * 1000,
+            })
+        return rows
+
+    def prometheus(self, gauges=None):
+        """Stage histograms plus ``gauges`` (name -> value) in the Prometheus text format."""
+        name = f'{METRIC_PREFIX}_stage_duration_seconds'
+        lines = [f"# HELP {name} Time spent in each stage of the tool.",
+                 f"# TYPE {name} histogram"]
+        with self.lock:
+            stages = [(stage, list(stats.buckets), stats.total, stats.count)
+                      for stage, stats in sorted(self.stages.items())]
+        for stage, buckets, total, count in stages:
+            label = _label(stage)
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS, buckets):
+                cumulative += bucket
+                lines.append(f'{name}_bucket{{stage="{label}",le="{bound:g}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{stage="{label}",le="+Inf"}} {count}')
+            lines.append(f'{name}_sum{{stage="{label}"}} {total:.9g}')
+            lines.append(f'{name}_count{{stage="{label}"}} {count}')
+        lines += [f"# HELP {METRIC_PREFIX}_timing_enabled Whether stage timing is recorded.",
+                  f"# TYPE {METRIC_PREFIX}_timing_enabled gauge",
+                  f"{METRIC_PREFIX}_timing_enabled {int(self.enabled)}"]
+        for gauge, value in sorted((gauges or {}).items()):
+            if value is None:
+                continue
+            lines += [f"# TYPE {METRIC_PREFIX}_{gauge} gauge", f"{METRIC_PREFIX}_{gauge} {float(value):.9g}"]
+        return "\n".join(lines) + "\n"
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# نسخة مشتركة لكل البرنامج، كما يفعل logging
+INSTRUMENTS = Instruments()
+
+
+class MetricsServer:
+    """Serves ``/metrics`` in the Prometheus text format from a daemon thread.
+
+    ``gauges()`` is called on every scrape and returns extra
+    ``{name: value}`` gauges, such as the number of stored rows.
+    """
+
+    def __init__(self, instruments=INSTRUMENTS, host=DEFAULT_METRICS_BIND, port=0, gauges=None):
+        self.instruments = instruments
+        self.host = host
+        self.port = port
+        self.gauges = gauges
+        self.server = None
+
+    @classmethod
+    def from_config(cls, config, instruments=INSTRUMENTS, gauges=None):
+        """None when no ``[Diagnostics] metrics_port`` is configured."""
+        port = config.get('Diagnostics', 'metrics_port', fallback='').strip()
+        if not port:
+            return None
+        return cls(instruments, host=config.get('Diagnostics', 'metrics_bind', fallback=DEFAULT_METRICS_BIND),
+                   port=int(port), gauges=gauges)
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/metrics"
+
+    def render(self):
+        return self.instruments.prometheus(self.gauges() if self.gauges else None)
+
+    def start(self):
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                try:
+                    body = metrics.render().encode()
+                except Exception as e:
+                    self.send_error(500, str(e))
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, name='metrics', daemon=True).start()
+        return self.port
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ':')
+
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler for every thread of the process.
+
+    A background thread reads ``sys._current_frames()`` every ``interval``
+    seconds and counts each thread's stack, so the profiled code runs
+    uninstrumented. ``dump(path)`` writes folded stacks, one
+    ``thread;outer;...;inner count`` line per distinct stack, the format
+    read by flamegraph.pl, speedscope and inferno.
+    """
+
+    def __init__(self, interval=DEFAULT_PROFILE_INTERVAL):
+        self.interval = interval
+        self.samples = Counter()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(interval=config.getfloat('Diagnostics', 'profile_interval', fallback=DEFAULT_PROFILE_INTERVAL))
+
+    @property
+    def running(self):
+        return self.thread is not None
+
+    def start(self):
+        if self.thread is None:
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        if self.thread is not None:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+
+    def _run(self):
+        own = threading.get_ident()
+        labels = {}
+        while not self.stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = _frame_label(code)
+                    stack.append(label)
+                    frame = frame.f_back
+                stack.append(names.get(ident, f'thread-{ident}').replace(';', ':'))
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def folded(self):
+        return [f"{stack} {count}" for stack, count in sorted(self.samples.items())]
+
+    def dump(self, path):
+        """Write the folded stacks to ``path``; returns the number of samples."""
+        lines = self.folded()
+        with open(path, 'w') as f:
+            f.write("\n".join(lines) + ("\n" if lines else ""))
+        return sum(self.samples.values())
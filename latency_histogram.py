@@ -0,0 +1,174 @@
+from array import array
+
+DEFAULT_SUB_BUCKET_BITS = 8
+DEFAULT_HIGHEST_US = 60_000_000
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+class LatencyHistogram:
+    """Fixed-memory, log-bucketed latency histogram in the style of HdrHistogram.
+
+    Values are integer microseconds. Values below ``2 ** sub_bucket_bits`` are
+    counted exactly; above that every power-of-two range is split into
+    ``2 ** (sub_bucket_bits - 1)`` linear sub-buckets, so the relative error
+    stays below ``2 ** -(sub_bucket_bits - 1)`` (< 1% with the default 8 bits)
+    and memory is fixed by ``highest``, not by the number of samples.
+    """
+
+    def __init__(self, sub_bucket_bits=DEFAULT_SUB_BUCKET_BITS, highest=DEFAULT_HIGHEST_US):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.highest = highest
+        self.sub_bucket_count = 1 << sub_bucket_bits
+        self.sub_bucket_half = self.sub_bucket_count >> 1
+        max_shift = max(highest.bit_length() - sub_bucket_bits, 0)
+        self.counts = array('Q', bytes(8 * (self.sub_bucket_count + max_shift * self.sub_bucket_half)))
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.sum = 0
+
+    def _index(self, value):
+        if value < self.sub_bucket_count:
+            return value
+        shift = value.bit_length() - self.sub_bucket_bits
+        return self.sub_bucket_count + (shift - 1) * self.sub_bucket_half + (value >> shift) - self.sub_bucket_half
+
+    def _value_at(self, index):
+        if index < self.sub_bucket_count:
+            return index
+        shift, sub = divmod(index - self.sub_bucket_count, self.sub_bucket_half)
+        shift += 1
+        sub += self.sub_bucket_half
+        # نعيد منتصف الحاوية كقيمة تمثيلية
+        return (sub << shift) + ((1 << shift) >> 1)
+
+    def record(self, value, count=1):
+        value = min(max(int(value), 0), self.highest)
+        self.counts[self._index(value)] += count
+        self.total += count
+        self.sum += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, q):
+        return self.percentiles((q,))[q]
+
+    def percentiles(self, qs=PERCENTILES):
+        """Return ``{q: value_us}`` for all ``qs`` in one pass over the buckets."""
+        result = dict.fromkeys(qs)
+        if not self.total:
+            return result
+        ranks = sorted((max(int(self.total * q / 100 + 0.5), 1), q) for q in qs)
+        seen = 0
+        position = 0
+        for index, count in enumerate(self.counts):
+            if not count:
+                continue
+            seen += count
+            while position < len(ranks) and seen >= ranks[position][0]:
+                result[ranks[position][1]] = min(max(self._value_at(index), self.min), self.max)
+                position += 1
+            if position == len(ranks):
+                break
+        return result
+
+    def mean(self):
+        return self.sum / self.total if self.total else None
+
+    def merge(self, other):
+        if (other.sub_bucket_bits, other.highest) != (self.sub_bucket_bits, self.highest):
+            raise ValueError("Cannot merge histograms with different layouts")
+        for index, count in enumerate(other.counts):
+            if count:
+                self.counts[index] += count
+        self.total += other.total
+        self.sum += other.sum
+        if other.total:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def reset(self):
+        for index in range(len(self.counts)):
+            self.counts[index] = 0
+        self.total = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    def to_dict(self):
+        # تمثيل متفرق صالح لـ JSON: الحاويات غير الفارغة فقط
+        return {
+            'sub_bucket_bits': self.sub_bucket_bits,
+            'highest': self.highest,
+            'min': self.min,
+            'max': self.max,
+            'sum': self.sum,
+            'counts': [[index, count] for index, count in enumerate(self.counts) if count],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data['sub_bucket_bits'], data['highest'])
+        for index, count in data['counts']:
+            histogram.counts[index] = count
+            histogram.total += count
+        histogram.min = data['min']
+        histogram.max = data['max']
+        histogram.sum = data['sum']
+        return histogram
+
+
+class LatencyWindow:
+    """Accumulates one window of samples: histogram, loss and jitter."""
+
+    def __init__(self, start):
+        self.start = start
+        self.histogram = LatencyHistogram()
+        self.sent = 0
+        self.received = 0
+        self.jitter_sum = 0
+        self.jitter_count = 0
+        self.last_rtt = None
+
+    def add(self, rtt_us):
+        self.sent += 1
+        if rtt_us is not None:
+            self.record(rtt_us)
+
+    def record(self, rtt_us):
+        self.received += 1
+        self.histogram.record(rtt_us)
+        # الارتعاش: متوسط الفرق المطلق بين عينتين متتاليتين
+        if self.last_rtt is not None:
+            self.jitter_sum += abs(rtt_us - self.last_rtt)
+            self.jitter_count += 1
+        self.last_rtt = rtt_us
+
+    def summary(self):
+        def ms(value):
+            return value / 1000 if value is not None else None
+
+        histogram = self.histogram
+        quantiles = histogram.percentiles()
+        return {
+            'sent': self.sent,
+            'received': self.received,
+            'loss': (self.sent - self.received) * 100 / self.sent if self.sent else None,
+            'min': ms(histogram.min),
+            'max': ms(histogram.max),
+            'mean': ms(histogram.mean()),
+            'p50': ms(quantiles[50]),
+            'p90': ms(quantiles[90]),
+            'p99': ms(quantiles[99]),
+            'p999': ms(quantiles[99.9]),
+            'jitter': ms(self.jitter_sum / self.jitter_count) if self.jitter_count else None,
+            'histogram': histogram.to_dict(),
+        }
+
+
+def summarize_samples(samples):
+    """Window summary for a list of ``(timestamp_us, rtt_us)`` samples."""
+    window = LatencyWindow(samples[0][0] if samples else None)
+    for _, rtt in samples:
+        window.add(rtt)
+    return window.summary()
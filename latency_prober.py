@@ -0,0 +1,392 @@
+import asyncio
+import itertools
+import math
+import os
+import socket
+import struct
+import time
+from datetime import datetime
+
+from latency_histogram import LatencyWindow
+
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+
+DEFAULT_COUNT = 4
+DEFAULT_INTERVAL = 0.2
+DEFAULT_TIMEOUT = 1.0
+DEFAULT_UDP_PORT = 33434
+DEFAULT_TCP_PORT = 443
+DEFAULT_PAYLOAD_SIZE = 56
+
+MIN_SAMPLE_RATE = 10
+MAX_SAMPLE_RATE = 1000
+DEFAULT_SAMPLE_RATE = 100
+DEFAULT_WINDOW = 1.0
+
+METHODS = ('auto', 'icmp', 'udp', 'tcp')
+
+_idents = itertools.count((os.getpid() * 7919) & 0xFFFF)
+_PROBE_HEADER = struct.Struct('!HHQ')  # ident, seq, send time (ns)
+
+
+def checksum(data):
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def build_echo_request(ident, seq, payload):
+    header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    csum = checksum(header + payload)
+    return struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, csum, ident, seq) + payload
+
+
+def parse_echo_reply(packet):
+    # السوكيت الخام (وسوكيت DGRAM على macOS) يعيد ترويسة IP قبل رسالة ICMP
+    if packet and packet[0] >> 4 == 4:
+        packet = packet[(packet[0] & 0x0F) * 4:]
+    if len(packet) < 8:
+        return None
+    icmp_type, _, _, ident, seq = struct.unpack('!BBHHH', packet[:8])
+    if icmp_type != ICMP_ECHO_REPLY:
+        return None
+    return ident, seq
+
+
+def summarize(samples):
+    """Loss and min/avg/max/mdev (ms) over ``(timestamp_us, rtt_us)`` samples."""
+    rtts = [rtt / 1000 for _, rtt in samples if rtt is not None]
+    sent = len(samples)
+    received = len(rtts)
+    stats = {
+        'sent': sent,
+        'received': received,
+        'loss': (sent - received) * 100 / sent if sent else None,
+        'min': None, 'max': None, 'avg': None, 'mdev': None,
+    }
+    if rtts:
+        avg = sum(rtts) / received
+        stats.update({
+            'min': min(rtts),
+            'max': max(rtts),
+            'avg': avg,
+            'mdev': math.sqrt(max(sum(r * r for r in rtts) / received - avg * avg, 0.0)),
+        })
+    return stats
+
+
+def _decode_reply(packet, method, ident):
+    if method == 'udp':
+        if len(packet) < _PROBE_HEADER.size:
+            return None
+        reply_ident, seq, _ = _PROBE_HEADER.unpack_from(packet)
+    else:
+        parsed = parse_echo_reply(packet)
+        if parsed is None:
+            return None
+        reply_ident, seq = parsed
+        # الكيرنل يعيد كتابة المعرّف في سوكيت ICMP غير المميز
+        if method == 'icmp':
+            return seq
+    return seq if reply_ident == ident else None
+
+
+def _build_probe(method, ident, seq, send_ns, padding):
+    payload = _PROBE_HEADER.pack(ident, seq, send_ns) + padding
+    return payload if method == 'udp' else build_echo_request(ident, seq, payload)
+
+
+class UdpEchoProtocol(asyncio.DatagramProtocol):
+    """Loopback responder that echoes every datagram back to its sender."""
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.transport.sendto(data, addr)
+
+
+async def start_udp_echo_responder(host='127.0.0.1', port=0):
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(UdpEchoProtocol, local_addr=(host, port))
+    return transport, transport.get_extra_info('sockname')[1]
+
+
+class LatencyProber:
+    """In-process latency prober.
+
+    ``method='auto'`` tries an unprivileged ICMP socket, then a raw ICMP
+    socket, and finally falls back to UDP probes, where either an echoed
+    datagram or an ICMP port-unreachable counts as a reply. ``method='tcp'``
+    times TCP handshakes instead. Samples keep microsecond send timestamps.
+    """
+
+    def __init__(self, count=DEFAULT_COUNT, interval=DEFAULT_INTERVAL, timeout=DEFAULT_TIMEOUT,
+                 method='auto', udp_port=DEFAULT_UDP_PORT, tcp_port=DEFAULT_TCP_PORT,
+                 payload_size=DEFAULT_PAYLOAD_SIZE):
+        if method not in METHODS:
+            raise ValueError(f"Unknown probe method: {method}")
+        if count < 1:
+            raise ValueError("Probe count must be at least 1.")
+        self.count = count
+        self.interval = interval
+        self.timeout = timeout
+        self.method = method
+        self.udp_port = udp_port
+        self.tcp_port = tcp_port
+        self.payload_size = max(payload_size, _PROBE_HEADER.size)
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(count=config.getint('Probes', 'ping_count', fallback=DEFAULT_COUNT),
+                   interval=config.getfloat('Probes', 'ping_interval', fallback=DEFAULT_INTERVAL),
+                   timeout=config.getfloat('Probes', 'ping_timeout', fallback=DEFAULT_TIMEOUT),
+                   method=config.get('Probes', 'ping_method', fallback='auto'))
+
+    def max_duration(self):
+        return max(self.count - 1, 0) * self.interval + self.timeout
+
+    def open_socket(self, family):
+        if self.method == 'tcp':
+            return None, 'tcp'
+        if self.method in ('auto', 'icmp') and family == socket.AF_INET:
+            for sock_type, name in ((socket.SOCK_DGRAM, 'icmp'), (socket.SOCK_RAW, 'icmp-raw')):
+                try:
+                    sock = socket.socket(socket.AF_INET, sock_type, socket.IPPROTO_ICMP)
+                    sock.setblocking(False)
+                    return sock, name
+                except OSError:
+                    continue
+            if self.method == 'icmp':
+                raise PermissionError("ICMP sockets are not permitted for this user")
+        sock = socket.socket(family, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        return sock, 'udp'
+
+    async def probe(self, host):
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(host, None, type=socket.SOCK_DGRAM)
+        family, _, _, _, sockaddr = infos[0]
+        address = sockaddr[0]
+        sock, method = self.open_socket(family)
+        try:
+            if method == 'tcp':
+                samples = await self._probe_tcp(address)
+            else:
+                samples = await self._probe_datagram(sock, method, address)
+        finally:
+            if sock is not None:
+                sock.close()
+
+        stats = summarize(samples)
+        output = (f"PING {host} ({address}) via {method}: {stats['sent']} packets transmitted, "
+                  f"{stats['received']} received, {stats['loss']:g}% packet loss")
+        if stats['avg'] is not None:
+            output += (f"\nrtt min/avg/max/mdev = {stats['min']:.3f}/{stats['avg']:.3f}/"
+                       f"{stats['max']:.3f}/{stats['mdev']:.3f} ms")
+        stats.update({'output': output, 'avg_time': stats['avg'], 'method': method,
+                      'address': address, 'samples': samples})
+        return stats
+
+    def ping(self, host):
+        return asyncio.run(self.probe(host))
+
+    async def _probe_datagram(self, sock, method, address):
+        loop = asyncio.get_running_loop()
+        ident = next(_idents) & 0xFFFF
+        pending = {}
+        rtts = {}
+        padding = b'\0' * (self.payload_size - _PROBE_HEADER.size)
+
+        # connect() على سوكيت datagram لا يحجب، ويقصر الردود على هذا العنوان
+        sock.connect((address, self.udp_port if method == 'udp' else 0))
+
+        async def receive():
+            while len(rtts) < self.count:
+                try:
+                    packet = await loop.sock_recv(sock, 2048)
+                except (ConnectionRefusedError, ConnectionResetError):
+                    # ICMP port-unreachable لأقدم مسبار ما زال ينتظر الرد
+                    recv_ns = time.perf_counter_ns()
+                    if pending:
+                        seq = next(iter(pending))
+                        rtts[seq] = (recv_ns - pending.pop(seq)) // 1000
+                    continue
+                recv_ns = time.perf_counter_ns()
+                seq = _decode_reply(packet, method, ident)
+                if seq in pending:
+                    rtts[seq] = (recv_ns - pending.pop(seq)) // 1000
+
+        receiver = asyncio.ensure_future(receive())
+        send_times = []
+        start = time.perf_counter()
+        try:
+            for seq in range(self.count):
+                delay = start + seq * self.interval - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                send_ns = time.perf_counter_ns()
+                packet = _build_probe(method, ident, seq, send_ns, padding)
+                send_times.append(time.time_ns() // 1000)
+                pending[seq] = send_ns
+                try:
+                    await loop.sock_sendall(sock, packet)
+                except (ConnectionRefusedError, ConnectionResetError):
+                    pending.pop(seq, None)
+                    rtts[seq] = (time.perf_counter_ns() - send_ns) // 1000
+            try:
+                await asyncio.wait_for(asyncio.shield(receiver), self.timeout)
+            except asyncio.TimeoutError:
+                pass
+        finally:
+            receiver.cancel()
+            try:
+                await receiver
+            except asyncio.CancelledError:
+                pass
+        return [(send_times[seq], rtts.get(seq)) for seq in range(len(send_times))]
+
+    async def _probe_tcp(self, address):
+        samples = []
+        start = time.perf_counter()
+        for seq in range(self.count):
+            delay = start + seq * self.interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            timestamp = time.time_ns() // 1000
+            send_ns = time.perf_counter_ns()
+            rtt = None
+            try:
+                _, writer = await asyncio.wait_for(
+                    asyncio.open_connection(address, self.tcp_port), self.timeout)
+                rtt = (time.perf_counter_ns() - send_ns) // 1000
+                writer.close()
+            except ConnectionRefusedError:
+                # RST يعني أن المضيف متاح حتى لو كان المنفذ مغلقاً
+                rtt = (time.perf_counter_ns() - send_ns) // 1000
+            except (asyncio.TimeoutError, OSError):
+                pass
+            samples.append((timestamp, rtt))
+        return samples
+
+
+class LatencySampler:
+    """Continuous latency sampling for one host.
+
+    Sends ``rate`` probes per second without pausing between windows and
+    calls ``on_window`` with a percentile/jitter summary for every
+    ``window`` seconds of samples. A window is closed once its last probe
+    has had ``prober.timeout`` seconds to answer; unanswered probes count
+    as loss.
+
+    UDP probes to a closed port rely on ICMP port-unreachable replies, which
+    most kernels rate-limit; at high rates use ICMP or a UDP echo responder.
+    """
+
+    def __init__(self, host, rate=DEFAULT_SAMPLE_RATE, window=DEFAULT_WINDOW, prober=None):
+        if not MIN_SAMPLE_RATE <= rate <= MAX_SAMPLE_RATE:
+            raise ValueError(f"Sampling rate must be between {MIN_SAMPLE_RATE} and {MAX_SAMPLE_RATE} probes/s.")
+        self.prober = prober or LatencyProber()
+        if self.prober.method == 'tcp':
+            raise ValueError("Sampling mode needs ICMP or UDP probes.")
+        self.host = host
+        self.rate = rate
+        self.window = window
+        self.per_window = max(int(round(rate * window)), 1)
+
+    async def run(self, on_window, stop=None):
+        stop = stop or asyncio.Event()
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(self.host, None, type=socket.SOCK_DGRAM)
+        family, _, _, _, sockaddr = infos[0]
+        address = sockaddr[0]
+        sock, method = self.prober.open_socket(family)
+        ident = next(_idents) & 0xFFFF
+        padding = b'\0' * (self.prober.payload_size - _PROBE_HEADER.size)
+        pending = {}
+        windows = {}
+
+        def close_window(index):
+            window = windows.pop(index)
+            for seq in [seq for seq, (_, owner) in pending.items() if owner == index]:
+                del pending[seq]
+            summary = window.summary()
+            summary.update({
+                'timestamp': datetime.fromtimestamp(window.start).strftime("%Y-%m-%d %H:%M:%S"),
+                'target': self.host,
+                'address': address,
+                'method': method,
+                'rate': self.rate,
+                'window': self.window,
+            })
+            on_window(summary)
+
+        def record(seq, recv_ns):
+            send_ns, index = pending.pop(seq)
+            if index in windows:
+                windows[index].record((recv_ns - send_ns) // 1000)
+
+        async def receive():
+            while True:
+                try:
+                    packet = await loop.sock_recv(sock, 2048)
+                except (ConnectionRefusedError, ConnectionResetError):
+                    if pending:
+                        record(next(iter(pending)), time.perf_counter_ns())
+                    continue
+                recv_ns = time.perf_counter_ns()
+                seq = _decode_reply(packet, method, ident)
+                if seq in pending:
+                    record(seq, recv_ns)
+
+        try:
+            sock.connect((address, self.prober.udp_port if method == 'udp' else 0))
+            receiver = asyncio.ensure_future(receive())
+            start = time.perf_counter()
+            wall_start = time.time()
+            sent = 0
+            try:
+                while not stop.is_set():
+                    delay = start + sent / self.rate - time.perf_counter()
+                    if delay > 0:
+                        try:
+                            await asyncio.wait_for(stop.wait(), delay)
+                            break
+                        except asyncio.TimeoutError:
+                            pass
+                    index = sent // self.per_window
+                    if index not in windows:
+                        windows[index] = LatencyWindow(wall_start + index * self.window)
+                    seq = sent & 0xFFFF
+                    send_ns = time.perf_counter_ns()
+                    pending.pop(seq, None)
+                    pending[seq] = (send_ns, index)
+                    windows[index].sent += 1
+                    sent += 1
+                    try:
+                        await loop.sock_sendall(sock, _build_probe(method, ident, seq, send_ns, padding))
+                    except (ConnectionRefusedError, ConnectionResetError):
+                        record(seq, time.perf_counter_ns())
+
+                    # نغلق النوافذ التي انقضت مهلة آخر مسبار فيها
+                    elapsed = time.perf_counter() - start
+                    for done in sorted(windows):
+                        if (done + 1) * self.window + self.prober.timeout > elapsed:
+                            break
+                        close_window(done)
+
+                await asyncio.sleep(self.prober.timeout)
+                for done in sorted(windows):
+                    close_window(done)
+            finally:
+                receiver.cancel()
+                try:
+                    await receiver
+                except asyncio.CancelledError:
+                    pass
+        finally:
+            sock.close()
@@ -0,0 +1,305 @@
+import numpy as np
+
+DEFAULT_MAX_POINTS = 2000
+ROLLUP_FACTOR = 16
+ROLLUP_LEVELS = 5
+HEADROOM = 0.1
+
+
+def minmax_decimate(x, y, max_points):
+    """Keep the minimum and maximum of every bucket, in time order.
+
+    Spikes survive decimation, unlike plain striding, and the whole
+    operation is a handful of vectorized NumPy calls.
+    """
+    n = len(x)
+    if n <= max_points:
+        return x, y
+    buckets = max(max_points // 2 - 1, 1)
+    size = -(-n // buckets)
+    m = n // size * size
+    xb = x[:m].reshape(-1, size)
+    yb = y[:m].reshape(-1, size)
+    imin = yb.argmin(axis=1)
+    imax = yb.argmax(axis=1)
+    rows = np.arange(len(yb))
+    first = np.minimum(imin, imax)
+    second = np.maximum(imin, imax)
+    xs = np.column_stack((xb[rows, first], xb[rows, second])).ravel()
+    ys = np.column_stack((yb[rows, first], yb[rows, second])).ravel()
+    if m < n:
+        tail_x, tail_y = x[m:], y[m:]
+        picks = sorted({int(tail_y.argmin()), int(tail_y.argmax())})
+        xs = np.concatenate((xs, tail_x[picks]))
+        ys = np.concatenate((ys, tail_y[picks]))
+    return xs, ys
+
+
+class _Buffer:
+    """Growable float64 array with amortized O(1) appends."""
+
+    def __init__(self, capacity=1024):
+        self.data = np.empty(capacity)
+        self.size = 0
+
+    def _reserve(self, size):
+        if size > len(self.data):
+            data = np.empty(max(size, 2 * len(self.data)))
+            data[:self.size] = self.data[:self.size]
+            self.data = data
+
+    def append(self, value):
+        self._reserve(self.size + 1)
+        self.data[self.size] = value
+        self.size += 1
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=float)
+        self._reserve(self.size + len(values))
+        self.data[self.size:self.size + len(values)] = values
+        self.size += len(values)
+
+    def clear(self):
+        self.size = 0
+
+    @property
+    def values(self):
+        return self.data[:self.size]
+
+
+class RollupSeries:
+    """Raw points plus a pyramid of min/max rollups.
+
+    Level ``k`` summarises blocks of ``factor ** (k + 1)`` raw points and is
+    updated incrementally as points arrive, so ``view`` can answer any zoom
+    range with at most ``max_points`` points without touching the raw data
+    of the whole range. Points are expected in time order; a late point is
+    drawn at the time of the latest one.
+    """
+
+    def __init__(self, factor=ROLLUP_FACTOR, levels=ROLLUP_LEVELS):
+        self.factor = factor
+        self.x = _Buffer()
+        self.y = _Buffer()
+        self.rollups = [(_Buffer(), _Buffer(), _Buffer()) for _ in range(levels)]
+
+    def __len__(self):
+        return self.x.size
+
+    def append(self, x, y):
+        if self.x.size and x < self.x.data[self.x.size - 1]:
+            # نقطة متأخرة قليلاً (مثل نافذة عينات أُغلقت بعد اختبار لاحق)
+            x = self.x.data[self.x.size - 1]
+        self.x.append(x)
+        self.y.append(y)
+        n = self.x.size
+        block = self.factor
+        source = (self.x, self.y, self.y)
+        for rollup in self.rollups:
+            if n % block:
+                break
+            sx, smin, smax = (buffer.values[-self.factor:] for buffer in source)
+            rollup[0].append(sx[0])
+            rollup[1].append(smin.min())
+            rollup[2].append(smax.max())
+            source = rollup
+            block *= self.factor
+
+    def extend(self, xs, ys):
+        self.x.extend(xs)
+        self.y.extend(ys)
+        # إعادة بناء الهرم دفعة واحدة بعمليات NumPy
+        sx, smin, smax = self.x.values, self.y.values, self.y.values
+        for rollup in self.rollups:
+            m = len(sx) // self.factor * self.factor
+            sx = sx[:m:self.factor]
+            smin = smin[:m].reshape(-1, self.factor).min(axis=1)
+            smax = smax[:m].reshape(-1, self.factor).max(axis=1)
+            for buffer, values in zip(rollup, (sx, smin, smax)):
+                buffer.clear()
+                buffer.extend(values)
+
+    def clear(self):
+        self.x.clear()
+        self.y.clear()
+        for rollup in self.rollups:
+            for buffer in rollup:
+                buffer.clear()
+
+    def bounds(self):
+        if not self.x.size:
+            return None
+        return self.x.values[0], self.x.values[-1]
+
+    def view(self, x0, x1, max_points=DEFAULT_MAX_POINTS):
+        x, y = self.x.values, self.y.values
+        i0 = max(int(np.searchsorted(x, x0, 'left')) - 1, 0)
+        i1 = min(int(np.searchsorted(x, x1, 'right')) + 1, len(x))
+        if i1 - i0 <= max_points:
+            return x[i0:i1], y[i0:i1]
+
+        block = 1
+        for rx, rmin, rmax in self.rollups:
+            block *= self.factor
+            j0 = -(-i0 // block)
+            j1 = min(i1 // block, rx.size)
+            if j1 <= j0 or 2 * (j1 - j0) > max_points * 3 // 4:
+                continue
+            # الأطراف الجزئية خارج الكتل الكاملة تُختصر بنفس طريقة min/max
+            edge = max((max_points - 2 * (j1 - j0)) // 2, 4)
+            head = minmax_decimate(x[i0:j0 * block], y[i0:j0 * block], edge)
+            tail = minmax_decimate(x[j1 * block:i1], y[j1 * block:i1], edge)
+            xs = np.repeat(rx.values[j0:j1], 2)
+            ys = np.column_stack((rmin.values[j0:j1], rmax.values[j0:j1])).ravel()
+            return np.concatenate((head[0], xs, tail[0])), np.concatenate((head[1], ys, tail[1]))
+        return minmax_decimate(x[i0:i1], y[i0:i1], max_points)
+
+
+class LivePlot:
+    """Incrementally updated, blitted line plot on one matplotlib ``Axes``.
+
+    Every series owns one reused ``Line2D``. ``refresh`` re-decimates only
+    the visible range, to two points (min and max) per pixel column of the
+    axes and at most ``max_points``, and blits the lines onto a cached
+    background. The axes are fully redrawn only when their limits change:
+    the data leaves the current limits (which include some headroom), the
+    window changes, or the user zooms or pans. That full redraw is
+    matplotlib laying out ticks and labels and costs the same whatever the
+    number of points.
+    """
+
+    def __init__(self, canvas, ax, max_points=DEFAULT_MAX_POINTS):
+        self.canvas = canvas
+        self.ax = ax
+        self.max_points = max_points
+        self.series = {}
+        self.window = None
+        self.follow = True
+        self.background = None
+        self._setting_limits = False
+        ax.xaxis_date()
+        ax.set_autoscale_on(False)
+        canvas.mpl_connect('draw_event', self._on_draw)
+        ax.callbacks.connect('xlim_changed', self._on_xlim_changed)
+
+    def add_series(self, name, fmt, label):
+        line, = self.ax.plot([], [], fmt, label=label, animated=True)
+        self.series[name] = (RollupSeries(), line)
+
+    def ensure_series(self, name, fmt, label):
+        """Add a series the first time it is seen, e.g. one per DNS resolver."""
+        if name in self.series:
+            return
+        self.add_series(name, fmt, label)
+        self.ax.legend(loc='upper left', fontsize='small')
+        # الخلفية المحفوظة لا تحتوي على وسيلة الإيضاح الجديدة
+        self.background = None
+
+    def append(self, name, x, y):
+        if y is not None:
+            self.series[name][0].append(x, y)
+
+    def extend(self, name, xs, ys):
+        self.series[name][0].extend(xs, ys)
+
+    def clear(self):
+        for series, line in self.series.values():
+            series.clear()
+            line.set_data([], [])
+
+    def set_window(self, window):
+        """Show the last ``window`` days, or everything when None."""
+        self.window = window
+        self.follow = True
+        self.refresh(force=True)
+
+    def data_range(self):
+        bounds = [series.bounds() for series, _ in self.series.values() if len(series)]
+        if not bounds:
+            return None
+        x0 = min(b[0] for b in bounds)
+        x1 = max(b[1] for b in bounds)
+        if self.window is not None:
+            x0 = max(x0, x1 - self.window)
+        return x0, x1
+
+    def _update_lines(self, x0, x1):
+        # نقطتان (أدنى وأعلى) لكل عمود من البكسلات تكفيان لرسم مطابق
+        max_points = min(self.max_points, 2 * int(self.ax.bbox.width) + 4)
+        for series, line in self.series.values():
+            line.set_data(*series.view(x0, x1, max_points))
+
+    def _visible_y(self):
+        lows, highs = [], []
+        for _, line in self.series.values():
+            ys = line.get_ydata()
+            if len(ys):
+                lows.append(np.min(ys))
+                highs.append(np.max(ys))
+        return (min(lows), max(highs)) if lows else None
+
+    def refresh(self, force=False):
+        if self.follow:
+            span = self.data_range()
+            if span is None:
+                return
+            x0, x1 = span
+        else:
+            x0, x1 = self.ax.get_xlim()
+        self._update_lines(x0, x1)
+
+        xlim = self.ax.get_xlim()
+        ylim = self.ax.get_ylim()
+        y_range = self._visible_y()
+        headroom = (xlim[1] - xlim[0]) * HEADROOM
+        relayout = force or self.background is None
+        if self.follow:
+            # نافذة منزلقة: نعيد التخطيط بعد أن تنزلق بمقدار الهامش
+            relayout = relayout or x1 > xlim[1] or x0 < xlim[0] or x0 > xlim[0] + headroom
+        if y_range is not None:
+            relayout = relayout or y_range[0] < ylim[0] or y_range[1] > ylim[1] or y_range[1] < ylim[1] / 2
+
+        if relayout:
+            new_xlim, new_ylim = xlim, ylim
+            if self.follow:
+                width = max(x1 - x0, 1 / 86400)
+                new_xlim = (x0, x1 + width * HEADROOM)
+            if y_range is not None:
+                low, high = y_range
+                pad = max(high - low, abs(high), 1e-9) * HEADROOM
+                new_ylim = (0 if low >= 0 else low - pad, high + pad)
+            # حدود لم تتغير لا تحتاج إعادة رسم المحاور؛ الخلفية المحفوظة ما زالت صالحة
+            relayout = (self.background is None or tuple(new_xlim) != tuple(xlim)
+                        or tuple(new_ylim) != tuple(ylim))
+        if relayout:
+            self._setting_limits = True
+            try:
+                self.ax.set_xlim(*new_xlim)
+                self.ax.set_ylim(*new_ylim)
+            finally:
+                self._setting_limits = False
+            self.canvas.draw_idle()
+        else:
+            self.blit()
+
+    def blit(self):
+        if self.background is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self.background)
+        for _, line in self.series.values():
+            self.ax.draw_artist(line)
+        self.canvas.blit(self.ax.bbox)
+
+    def _on_draw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        for _, line in self.series.values():
+            self.ax.draw_artist(line)
+
+    def _on_xlim_changed(self, ax):
+        if self._setting_limits:
+            return
+        # تكبير أو تحريك من شريط الأدوات: نعيد الاختصار للنطاق الظاهر فقط
+        if ax.get_navigate_mode() is not None:
+            self.follow = False
+        self._update_lines(*ax.get_xlim())
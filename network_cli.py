@@ -0,0 +1,400 @@
+"""Headless command line front end.
+
+    python -m network_cli [--no-speedtest] [--json] run
+    python -m network_cli daemon --interval 60
+    python -m network_cli serve --port 5201
+    python -m network_cli collect --port 5301
+    python -m network_cli path 8.8.8.8 --count 30
+    python -m network_cli import old-results.csv export.jsonl
+    python -m network_cli --collector HOST --agent-name site-a daemon
+    python -m network_cli --timing --metrics-port 9464 --profile run.folded daemon
+
+Neither Tkinter nor matplotlib is imported, so the tool starts quickly on
+servers and in cron jobs. Results go to the same result store as the GUI
+unless ``--no-store`` is given, and with ``--collector`` they are also
+pushed to a central collector. ``--timing`` adds per-stage timings to the
+results, ``--metrics-port`` serves them for Prometheus and ``--profile``
+writes a flame graph profile of the run.
+"""
+import argparse
+import asyncio
+import json
+import queue
+import signal
+import sys
+import threading
+
+import network_core
+from instrumentation import INSTRUMENTS, MetricsServer, SamplingProfiler
+from scheduler import Scheduler
+from dns_benchmark import DnsBenchmark
+from throughput import DEFAULT_PORT, ThroughputClient, ThroughputServer
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='network_cli', description="Headless network performance tests.")
+    parser.add_argument('--config', default=network_core.SETTINGS_FILE, help="settings file (default: settings.ini)")
+    parser.add_argument('--ping', action='append', metavar='HOST', help="ping target (repeatable)")
+    parser.add_argument('--dns', action='append', metavar='DOMAIN', help="DNS lookup target (repeatable)")
+    parser.add_argument('--tcp', action='append', metavar='HOST:PORT', help="TCP connect target (repeatable)")
+    parser.add_argument('--http', action='append', metavar='URL', help="HTTP(S) request target (repeatable)")
+    parser.add_argument('--resolver', action='append', metavar='IP[:PORT]',
+                        help="resolver for the DNS benchmark (repeatable)")
+    parser.add_argument('--no-dns-benchmark', action='store_true', help="skip the DNS resolver benchmark")
+    parser.add_argument('--no-speedtest', action='store_true', help="skip the speedtest.net test")
+    parser.add_argument('--server', choices=network_core.SPEED_TEST_CHOICES,
+                        help="speed test server (default: Local with --throughput, else Default)")
+    parser.add_argument('--throughput', metavar='HOST[:PORT]',
+                        help="local throughput server to test against instead of speedtest.net")
+    parser.add_argument('--store', metavar='PATH', help="result store directory (default: from settings)")
+    parser.add_argument('--no-store', action='store_true', help="do not save results")
+    parser.add_argument('--json', action='store_true', help="print one JSON object per test")
+    parser.add_argument('--collector', metavar='HOST[:PORT]', help="push results to this collector (agent mode)")
+    parser.add_argument('--agent-name', metavar='NAME', help="name of this agent (default: host name)")
+    parser.add_argument('--timing', action='store_true', help="record per-stage timings with the results")
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help="serve Prometheus metrics on this port (implies --timing)")
+    parser.add_argument('--profile', metavar='FILE', help="write a folded-stack (flame graph) profile to FILE")
+
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('run', help="run the tests once (default)")
+    daemon = commands.add_parser('daemon', help="run the tests on a schedule until interrupted")
+    daemon.add_argument('--interval', type=float,
+                        help="seconds between tests without their own [Schedule] interval (default: from settings)")
+    daemon.add_argument('--count', type=int, help="stop after this many results")
+    serve = commands.add_parser('serve', help="run a throughput server for other machines to test against")
+    serve.add_argument('--bind', default='0.0.0.0', help="address to listen on (default: all)")
+    serve.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"port (default: {DEFAULT_PORT})")
+    path = commands.add_parser('path', help="MTR-style loss, latency and jitter per hop")
+    path.add_argument('host', nargs='?', help="destination (default: [Path] host, else the first ping target)")
+    path.add_argument('--count', type=int, default=10, help="rounds to run (default: 10)")
+    path.add_argument('--interval', type=float, help="seconds between rounds (default: from settings)")
+    path.add_argument('--max-hops', type=int, help="highest TTL to probe (default: from settings)")
+    imports = commands.add_parser('import', help="import saved results (CSV, JSON, JSON lines, Excel) into the store")
+    imports.add_argument('files', nargs='+', metavar='FILE')
+    imports.add_argument('--workers', type=int, help="files parsed in parallel (default: from settings)")
+    collect = commands.add_parser('collect', help="collect results pushed by agents into the result store")
+    collect.add_argument('--bind', help="address to listen on (default: from settings, else 127.0.0.1)")
+    collect.add_argument('--port', type=int, help=f"port (default: from settings, else {network_core.COLLECTOR_PORT})")
+    return parser
+
+
+def override_targets(config, args):
+    # الأهداف المحددة في سطر الأوامر تحل محل قسم Targets بالكامل
+    if not (args.ping or args.dns or args.tcp or args.http):
+        return
+    config['Targets'] = {
+        'ping': ', '.join(args.ping or []),
+        'dns': ', '.join(args.dns or []),
+        'tcp': ', '.join(args.tcp or []),
+        'http': ', '.join(args.http or []),
+    }
+
+
+def override_resolvers(config, args):
+    if not config.has_section('DNS'):
+        config.add_section('DNS')
+    if args.no_dns_benchmark:
+        config['DNS']['resolvers'] = ''
+    elif args.resolver:
+        config['DNS']['resolvers'] = ', '.join(args.resolver)
+
+
+def override_throughput(config, args):
+    if not args.throughput:
+        return
+    host, _, port = args.throughput.rpartition(':') if ':' in args.throughput else (args.throughput, '', '')
+    if not config.has_section('Throughput'):
+        config.add_section('Throughput')
+    config['Throughput']['host'] = host
+    if port:
+        config['Throughput']['port'] = port
+
+
+def serve(args):
+    server = ThroughputServer(args.bind, args.port)
+    print(f"Throughput server listening on {args.bind}:{server.port}", flush=True)
+    stop = threading.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *_: stop.set())
+    server.start()
+    stop.wait()
+    server.close()
+    return 0
+
+
+def override_agent(config, args):
+    if not config.has_section('Agent'):
+        config.add_section('Agent')
+    if args.collector:
+        config['Agent']['collector'] = args.collector
+    if args.agent_name:
+        config['Agent']['name'] = args.agent_name
+
+
+def open_agent(config, targets, dns_bench):
+    from collector import Agent
+    # الواجهة الرسومية تعرض رسوم كل وكيل بهدف ping الأول وخوادم DNS وروابط HTTP الخاصة به
+    info = {'ping': next((t['host'] for t in targets if t['type'] == 'ping'), None),
+            'resolvers': dns_bench.resolvers if dns_bench else [],
+            'http': [t['url'] for t in targets if t['type'] == 'http']}
+    agent = Agent.from_config(config, info)
+    if agent is not None:
+        agent.start()
+    return agent
+
+
+def open_metrics(config, args, gauges=None):
+    INSTRUMENTS.configure(config)
+    if args.metrics_port is not None:
+        if not config.has_section('Diagnostics'):
+            config.add_section('Diagnostics')
+        config['Diagnostics']['metrics_port'] = str(args.metrics_port)
+    metrics = MetricsServer.from_config(config, gauges=gauges)
+    if args.timing or metrics is not None:
+        INSTRUMENTS.enabled = True
+    if metrics is not None:
+        metrics.start()
+        print(f"Metrics on {metrics.url}", file=sys.stderr, flush=True)
+    return metrics
+
+
+def open_profiler(config, args):
+    if not args.profile:
+        return None
+    profiler = SamplingProfiler.from_config(config)
+    profiler.start()
+    return profiler
+
+
+def close_diagnostics(metrics, profiler, args):
+    if metrics is not None:
+        metrics.close()
+    if profiler is not None:
+        profiler.stop()
+        samples = profiler.dump(args.profile)
+        print(f"Profile: {samples} samples written to {args.profile}", file=sys.stderr, flush=True)
+
+
+def collect(config, args):
+    store = open_store(config, args)
+    if store is None:
+        print("The collector needs a result store.", file=sys.stderr)
+        return 2
+    from collector import Collector
+    collector = Collector.from_config(config, store)
+    if args.bind:
+        collector.host = args.bind
+    if args.port:
+        collector.port = args.port
+    metrics = open_metrics(config, args, gauges=lambda: {f'collector_{name}': value
+                                                          for name, value in collector.stats().items()})
+    profiler = open_profiler(config, args)
+
+    async def run():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+        port = await collector.start()
+        print(f"Collector listening on {collector.host}:{port}, writing to {store.path}", flush=True)
+        try:
+            await stop.wait()
+        finally:
+            await collector.close()
+
+    try:
+        asyncio.run(run())
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    finally:
+        store.close()
+        close_diagnostics(metrics, profiler, args)
+    print(json.dumps(collector.stats()), flush=True)
+    return 0
+
+
+def run_path(config, args, targets):
+    from path_analyzer import PathAnalyzer
+    analyzer = PathAnalyzer.from_config(config, args.host or network_core.path_target(config, targets))
+    if args.interval:
+        analyzer.interval = args.interval
+    if args.max_hops:
+        analyzer.max_hops = args.max_hops
+        analyzer.reset()
+
+    async def run():
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+
+        def on_round(snapshot):
+            if analyzer.rounds >= args.count:
+                stop.set()
+
+        await analyzer.run(on_round, stop)
+
+    asyncio.run(run())
+    path = analyzer.snapshot()
+    return {'timestamp': path['timestamp'], 'path': path}
+
+
+def open_store(config, args):
+    if args.no_store:
+        return None
+    from result_store import ResultStore
+    return ResultStore(args.store or config.get('Storage', 'path', fallback='results_store'))
+
+
+def report(results, as_json):
+    if as_json:
+        # العينات الخام كبيرة ولا تفيد في المخرجات النصية
+        results = dict(results, probes=[{k: v for k, v in p.items() if k != 'samples'}
+                                        for p in results.get('probes', [])])
+        if 'ping' in results:
+            results['ping'] = {k: v for k, v in results['ping'].items() if k != 'samples'}
+        print(json.dumps(results, default=str), flush=True)
+    else:
+        print(network_core.format_results(results), flush=True)
+
+
+def import_results(config, args):
+    store = open_store(config, args)
+    if store is None:
+        print("Importing needs a result store.", file=sys.stderr)
+        return 2
+    from importers import Importer
+    from rollups import RollupEngine
+    metrics = open_metrics(config, args, gauges=lambda: {'store_rows': len(store)})
+    profiler = open_profiler(config, args)
+    try:
+        importer = Importer.from_config(config, store, args.files, workers=args.workers)
+        with INSTRUMENTS.stage('import'):
+            stats = importer.run()
+            if stats['imported']:
+                RollupEngine(store).backfill(stats['start'], stats['end'])
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    finally:
+        store.close()
+        close_diagnostics(metrics, profiler, args)
+    for path, error in stats['errors']:
+        print(f"{path}: {error}", file=sys.stderr)
+    if args.json:
+        print(json.dumps({key: value for key, value in stats.items() if key != 'errors'}), flush=True)
+    else:
+        print(f"Imported {stats['imported']} measurements from {stats['files']} file(s), "
+              f"skipped {stats['duplicates']} already stored.", flush=True)
+    return 1 if stats['errors'] else 0
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == 'serve':
+        return serve(args)
+    config = network_core.read_config(args.config)
+    if args.command == 'collect':
+        return collect(config, args)
+    if args.command == 'import':
+        return import_results(config, args)
+    override_targets(config, args)
+    override_throughput(config, args)
+    override_resolvers(config, args)
+    override_agent(config, args)
+    try:
+        engine, targets = network_core.engine_and_targets(config)
+        dns_bench = DnsBenchmark.from_config(config)
+        client = ThroughputClient.from_config(config)
+    except ValueError as e:
+        print(f"Invalid settings: {e}", file=sys.stderr)
+        return 2
+    server = args.server or (network_core.LOCAL_SERVER if args.throughput else 'Default')
+    speed = None if args.no_speedtest else (lambda: network_core.speed_test(server, client))
+    store = open_store(config, args)
+    agent = open_agent(config, targets, dns_bench)
+    metrics = open_metrics(config, args, gauges=lambda: {'store_rows': len(store) if store is not None else None})
+    profiler = open_profiler(config, args)
+
+    if args.command != 'daemon':
+        # SIGTERM ينهي التشغيل الواحد كما يفعل Ctrl-C، فيُغلق المخزن والوكيل
+        signal.signal(signal.SIGTERM, interrupt)
+    try:
+        if args.command == 'daemon':
+            # في الوضع الدائم فقط: run وpath يبقيان قابلين للمقاطعة بـ Ctrl-C
+            stop = threading.Event()
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *_: stop.set())
+            run_daemon(args, config, engine, targets, speed, dns_bench, store, agent, stop)
+        elif args.command == 'path':
+            results = run_path(config, args, targets)
+            save(store, agent, results)
+            report(results, args.json)
+        else:
+            results = network_core.perform_tests(engine, targets, speed=speed, dns_bench=dns_bench)
+            save(store, agent, results)
+            report(results, args.json)
+    except KeyboardInterrupt:
+        print("Interrupted.", file=sys.stderr)
+        return 130
+    finally:
+        engine.http.close()
+        if agent is not None:
+            agent.close()
+            if agent.stats()['queued_rows'] or agent.stats()['unacked']:
+                print(f"Could not deliver every result to the collector: {agent.stats()}", file=sys.stderr)
+        if store is not None:
+            store.close()
+        close_diagnostics(metrics, profiler, args)
+    return 0
+
+
+def interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def save(store, agent, results):
+    if store is not None:
+        with INSTRUMENTS.stage('store.append'):
+            store.append_result(results)
+            store.flush()
+    if agent is not None:
+        agent.submit(results)
+
+
+def report_alerts(detector, results):
+    # التنبيهات إلى stderr حتى لا تختلط بمخرجات JSON
+    for event in detector.process(results):
+        if event['kind'] == 'clear' or detector.should_notify(event):
+            print(f"{event['kind'].upper()}: {event['message']}", file=sys.stderr, flush=True)
+
+
+def run_daemon(args, config, engine, targets, speed, dns_bench, store, agent, stop):
+    interval = args.interval or config.getfloat('Settings', 'interval', fallback=60)
+    schedule = network_core.load_schedule(config, interval)
+    scheduler = Scheduler.from_config(config)
+    # النتائج تصل من خيوط العمل وتُكتب وتُطبع من الخيط الرئيسي فقط
+    results_queue = queue.Queue()
+    network_core.add_test_jobs(scheduler, engine, targets, schedule, speed=speed, callback=results_queue.put,
+                               dns_bench=dns_bench)
+    from anomaly_detector import AnomalyDetector
+    detector = AnomalyDetector.from_config(config)
+    received = 0
+    try:
+        while not stop.is_set() and (args.count is None or received < args.count):
+            try:
+                results = results_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            save(store, agent, results)
+            report(results, args.json)
+            report_alerts(detector, results)
+            received += 1
+    finally:
+        scheduler.stop()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,426 @@
+"""Probe logic shared by the Tk GUI and the headless CLI.
+
+Only standard-library modules are imported here; speedtest is imported
+when a speed test actually runs.
+"""
+import configparser
+import socket
+import threading
+import time
+from concurrent.futures import Future
+from datetime import datetime
+
+from instrumentation import INSTRUMENTS
+from latency_histogram import summarize_samples
+from probe_engine import ProbeEngine, load_targets
+
+PING_HOST = '8.8.8.8'
+SETTINGS_FILE = 'settings.ini'
+SCHEDULE_JOBS = ('ping', 'dns', 'tcp', 'http', 'speedtest', 'dnsbench')
+SPEED_TEST_SERVERS = {
+    'Default': None,
+    'New York': 10556,
+    'London': 6032,
+    'Tokyo': 6087
+}
+# خادم الإنتاجية المحلي (قسم Throughput في الإعدادات) بدلاً من speedtest.net
+LOCAL_SERVER = 'Local'
+SPEED_TEST_CHOICES = list(SPEED_TEST_SERVERS) + [LOCAL_SERVER]
+COLLECTOR_PORT = 5301
+# تقدير مدة كل مرحلة بالثواني لوزن شريط التقدم قبل أن تقاس فعلياً
+STAGE_ESTIMATES = {'ping': 1.0, 'dns': 0.1, 'tcp': 0.1, 'http': 0.5, 'speedtest': 20.0, 'dnsbench': 2.0}
+# الفقد عند الوجهة فوق هذه النسبة يعتبر فقداً حقيقياً في تحليل المسار
+PATH_LOSS_THRESHOLD = 2.0
+PATH_LATENCY_STEP = 10.0
+HTTP_PHASE_NAMES = {'dns': 'DNS resolution', 'connect': 'the TCP connect', 'tls': 'the TLS handshake',
+                    'ttfb': 'waiting for the server (TTFB)', 'transfer': 'the transfer'}
+
+
+def read_config(path=SETTINGS_FILE):
+    config = configparser.ConfigParser()
+    config.read(path)
+    return config
+
+
+def engine_and_targets(config):
+    return ProbeEngine.from_config(config), load_targets(config, default_ping=PING_HOST)
+
+
+def ping(engine, host):
+    try:
+        return engine.prober.ping(host)
+    except Exception as e:
+        return {'output': f"Error during ping test: {str(e)}", 'avg_time': None}
+
+
+def dns_lookup(domain):
+    try:
+        ip = socket.gethostbyname(domain)
+        return {'output': f"IP address of {domain}: {ip}", 'success': True}
+    except Exception as e:
+        return {'output': f"Error during DNS lookup: {str(e)}", 'success': False}
+
+
+def speed_test(server='Default', client=None):
+    """speedtest.net test, or the built-in throughput test when ``server`` is ``LOCAL_SERVER``."""
+    if server == LOCAL_SERVER:
+        if client is None:
+            return {'download': 0, 'upload': 0, 'ping': 0, 'error': "No [Throughput] host configured"}
+        try:
+            return client.run()
+        except Exception as e:
+            return {'download': 0, 'upload': 0, 'ping': 0, 'error': str(e)}
+    try:
+        import speedtest
+        st = speedtest.Speedtest()
+        server_id = SPEED_TEST_SERVERS[server]
+        if server_id:
+            st.get_servers([server_id])
+        else:
+            st.get_best_server()
+        download_speed = st.download() / 1_000_000
+        upload_speed = st.upload() / 1_000_000
+        ping = st.results.ping
+        return {'download': download_speed, 'upload': upload_speed, 'ping': ping}
+    except Exception as e:
+        return {'download': 0, 'upload': 0, 'ping': 0, 'error': str(e)}
+
+
+def path_target(config, targets):
+    """``[Path] host``, else the first ping target."""
+    return (config.get('Path', 'host', fallback='').strip()
+            or next((target['host'] for target in targets if target['type'] == 'ping'), PING_HOST))
+
+
+def timestamp():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def probe_results(probes, when=None):
+    """Result dict for one probe cycle; ping/dns keys only for probe types that ran."""
+    results = {'timestamp': when or timestamp(), 'probes': probes}
+    ping_result = next((p for p in probes if p['type'] == 'ping'), None)
+    dns_result = next((p for p in probes if p['type'] == 'dns'), None)
+    if ping_result is not None:
+        results['ping'] = ping_result
+        if ping_result.get('samples'):
+            results['latency'] = summarize_samples(ping_result['samples'])
+            results['latency']['target'] = ping_result['target']
+    if dns_result is not None:
+        results['dns'] = dns_result
+    return results
+
+
+class Progress:
+    """Percent done of one cycle, advanced as each probe, the speed test and the DNS benchmark finish.
+
+    Every item is weighted by the mean duration of its stage so far
+    (``STAGE_ESTIMATES`` until it has been timed), so the bar moves with
+    the work actually done. ``report`` is called from worker threads.
+    """
+
+    def __init__(self, report, weights):
+        self.report = report
+        self.total = sum(weights) or 1
+        self.done = 0
+        self.lock = threading.Lock()
+
+    def advance(self, weight):
+        with self.lock:
+            self.done += weight
+            value = min(self.done * 100 / self.total, 100)
+        self.report(value)
+
+
+def in_background(func):
+    """Run ``func()`` on a daemon thread; returns a ``Future`` for its result.
+
+    Unlike a ``ThreadPoolExecutor`` worker, the thread is not joined at
+    exit, so Ctrl-C stops a run without waiting for a long speed test.
+    """
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(func())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+
+def perform_tests(engine, targets, speed=None, progress=None, dns_bench=None, instruments=INSTRUMENTS):
+    """Run one probe cycle, with ``speed()`` and the DNS benchmark (if given) running alongside it.
+
+    With timing enabled, ``results['timings']`` holds the milliseconds
+    until the last probe of each type finished, the speed test, the DNS
+    benchmark, the probe cycle and the whole run.
+    """
+    cycle = instruments.cycle()
+    when = timestamp()
+    weights = {stage: instruments.expected(stage, estimate) for stage, estimate in STAGE_ESTIMATES.items()}
+    items = [weights.get(target['type'], 1.0) for target in targets]
+    items += [weights['speedtest']] if speed else []
+    items += [weights['dnsbench']] if dns_bench else []
+    tracker = Progress(progress or (lambda value: None), items)
+    finished = {}
+    started = time.perf_counter()
+
+    def probe_done(result):
+        # الفحوصات متزامنة: مدة النوع هي وقت انتهاء آخر فحص منه
+        finished[result['type']] = time.perf_counter() - started
+        tracker.advance(weights.get(result['type'], 1.0))
+
+    def timed(stage, func):
+        def run():
+            with cycle.stage(stage):
+                result = func()
+            tracker.advance(weights[stage])
+            return result
+        return run
+
+    tracker.report(0)
+    with cycle.stage('total'):
+        # اختبار السرعة يعمل بالتوازي مع دورة الفحوصات بدلاً من انتظارها
+        speed_future = in_background(timed('speedtest', speed)) if speed else None
+        dns_future = in_background(timed('dnsbench', dns_bench.run)) if dns_bench else None
+        with cycle.stage('probes'):
+            probes = engine.run_cycle(targets, on_done=probe_done)
+        for stage, seconds in finished.items():
+            cycle.add(stage, seconds)
+        speed_result = speed_future.result() if speed_future else None
+        dns_benchmark = dns_future.result() if dns_future else None
+
+    results = probe_results(probes, when)
+    results.setdefault('ping', {'output': "No ping targets configured.", 'avg_time': None})
+    results.setdefault('dns', {'output': "No DNS targets configured.", 'success': False})
+    if speed_result is not None:
+        results['speed'] = speed_result
+    if dns_benchmark is not None:
+        results['dns_benchmark'] = dns_benchmark
+    if cycle.timings:
+        results['timings'] = cycle.timings
+    return results
+
+
+def load_schedule(config, interval):
+    """Seconds between runs of each scheduled job; unset jobs use ``interval``."""
+    schedule = {}
+    for job in SCHEDULE_JOBS:
+        value = config.get('Schedule', job, fallback='').strip()
+        schedule[job] = float(value) if value else interval
+    return schedule
+
+
+def timed_job(stage, func, instruments=INSTRUMENTS):
+    """Wrap a scheduled job so its result carries ``timings`` for ``stage`` when timing is on."""
+    def run():
+        cycle = instruments.cycle()
+        with cycle.stage(stage):
+            results = func()
+        if cycle.timings:
+            results['timings'] = cycle.timings
+        return results
+    return run
+
+
+def add_test_jobs(scheduler, engine, targets, schedule, speed=None, callback=None, dns_bench=None):
+    """One scheduler job per probe type, plus the speed test and DNS benchmark if given."""
+    for kind in ('ping', 'dns', 'tcp', 'http'):
+        selected = [target for target in targets if target['type'] == kind]
+        if selected:
+            scheduler.add_job(kind, schedule[kind],
+                              timed_job(kind, lambda selected=selected: probe_results(engine.run_cycle(selected))),
+                              callback)
+    if speed:
+        scheduler.add_job('speedtest', schedule['speedtest'],
+                          timed_job('speedtest', lambda: {'timestamp': timestamp(), 'speed': speed()}), callback)
+    if dns_bench:
+        scheduler.add_job('dnsbench', schedule['dnsbench'],
+                          timed_job('dnsbench', lambda: {'timestamp': timestamp(), 'dns_benchmark': dns_bench.run()}),
+                          callback)
+
+
+def interpret_ping(result):
+    loss = result.get('loss')
+    if result['avg_time'] is not None:
+        if result['avg_time'] < 50:
+            text = "Interpretation: Excellent ping time."
+        elif result['avg_time'] < 100:
+            text = "Interpretation: Good ping time for most applications."
+        else:
+            text = "Interpretation: High ping time might affect real-time applications."
+        if loss:
+            text += (f" {loss:g}% of the packets were lost, which causes stalls and retransmissions;"
+                     f" run a path analysis to find the hop where the loss starts.")
+        return text
+    elif loss == 100:
+        return "Interpretation: All packets were lost. The host is down or blocks ping."
+    else:
+        return "Interpretation: Unable to determine ping time."
+
+
+def interpret_latency(latency):
+    if latency['p50'] is None:
+        return "Interpretation: No latency samples received."
+    text = (f"Latency percentiles: p50 {latency['p50']:.2f} ms, p90 {latency['p90']:.2f} ms, "
+            f"p99 {latency['p99']:.2f} ms, p99.9 {latency['p999']:.2f} ms")
+    if latency['jitter'] is not None:
+        text += f", jitter {latency['jitter']:.2f} ms"
+    if latency['p99'] > 100 and latency['p99'] > 2 * latency['p50']:
+        text += "\nInterpretation: Latency spikes in the tail might affect real-time applications."
+    return text
+
+
+def interpret_dns(result):
+    if result['success']:
+        return "Interpretation: DNS lookup successful. Your DNS is working correctly."
+    else:
+        return "Interpretation: DNS lookup failed. There might be an issue with your DNS server or internet connection."
+
+
+def interpret_http(probes):
+    answered = [probe for probe in probes if probe.get('ttfb') is not None]
+    if not answered:
+        return "Interpretation: No HTTP request completed. Check the URLs or your connection."
+    slowest = max(answered, key=lambda probe: probe['latency'])
+    phase = max(HTTP_PHASE_NAMES, key=lambda name: slowest.get(name) or 0)
+    text = (f"Interpretation: Slowest request is {slowest['target']}, mostly {HTTP_PHASE_NAMES[phase]} "
+            f"({format_ms(slowest[phase])} of {format_ms(slowest['latency'])}).")
+    if slowest.get('warm_total') is not None:
+        text += (f" A reused connection answers in {format_ms(slowest['warm_total'])}, so keeping connections"
+                 f" open saves {format_ms(slowest['latency'] - slowest['warm_total'])} per request.")
+    failed = sum(1 for probe in probes if not probe['success'])
+    if failed:
+        text += f" {failed} of {len(probes)} requests failed."
+    return text
+
+
+def interpret_speed(result):
+    if 'error' in result:
+        return f"Interpretation: Speed test failed. Error: {result['error']}"
+    else:
+        if result['download'] > 100 and result['upload'] > 50:
+            return "Interpretation: Excellent internet speed."
+        elif result['download'] > 25 and result['upload'] > 10:
+            return "Interpretation: Good internet speed for most applications."
+        else:
+            return "Interpretation: Your internet speed might be insufficient for some applications."
+
+
+def interpret_path(path):
+    """Where loss and latency start on the path, MTR style.
+
+    Loss only counts when it carries on to the destination; loss at a
+    single intermediate hop is that router rate-limiting its ICMP answers.
+    """
+    hops = path['hops']
+    if not hops:
+        return "Interpretation: No hop answered yet."
+    final = hops[-1]
+    if not path['reached']:
+        last = next((hop for hop in reversed(hops) if hop['received']), None)
+        if last is None:
+            return "Interpretation: No hop answered. ICMP may be blocked on this network."
+        return (f"Interpretation: The destination did not answer; the path ends after hop {last['hop']} "
+                f"({last['address']}).")
+    if final['loss'] and final['loss'] >= PATH_LOSS_THRESHOLD:
+        start = final
+        for hop in reversed(hops[:-1]):
+            if hop['received'] and (hop['loss'] or 0) < PATH_LOSS_THRESHOLD:
+                break
+            if hop['received']:
+                start = hop
+        return (f"Interpretation: Packet loss starts at hop {start['hop']} ({start['address']}) and continues "
+                f"to the destination ({final['loss']:.1f}% lost).")
+    answered = [hop for hop in hops if hop['p50'] is not None]
+    steps = [(b['p50'] - a['p50'], b) for a, b in zip(answered, answered[1:])
+             if final['p50'] is not None and final['p50'] >= b['p50'] - PATH_LATENCY_STEP]
+    step, hop = max(steps, key=lambda item: item[0], default=(0, None))
+    text = "Interpretation: No loss on the path to the destination."
+    if hop is not None and step >= PATH_LATENCY_STEP:
+        text += f" The largest latency increase (+{step:.1f} ms) is at hop {hop['hop']} ({hop['address']})."
+    return text
+
+
+def format_path(path):
+    lines = [f"Path Analysis to {path['target']} ({path['address']}) via {path['method']}, "
+             f"{path['rounds']} rounds:",
+             f"{'Hop':>3}  {'Address':<18} {'Loss%':>6} {'Sent':>5} {'Last':>8} {'Avg':>8} {'Best':>8} "
+             f"{'Worst':>8} {'p90':>8} {'Jitter':>8}"]
+
+    def cell(value):
+        return f"{value:8.2f}" if value is not None else f"{'-':>8}"
+
+    for hop in path['hops']:
+        loss = f"{hop['loss']:6.1f}" if hop['loss'] is not None else f"{'-':>6}"
+        lines.append(f"{hop['hop']:>3}. {hop['address'] or '???':<18} {loss} {hop['sent']:>5} {cell(hop['last'])} "
+                     f"{cell(hop['mean'])} {cell(hop['best'])} {cell(hop['worst'])} {cell(hop['p90'])} "
+                     f"{cell(hop['jitter'])}" + (" !unreachable" if hop['unreachable'] else ""))
+    lines.append(interpret_path(path))
+    return lines
+
+
+def format_ms(value):
+    return f"{value:.2f} ms" if value is not None else "n/a"
+
+
+def interpret_dns_benchmark(entries):
+    answered = [entry for entry in entries if entry['warm'].get('p50') is not None]
+    if not answered:
+        return "Interpretation: No resolver answered. Check your connection or the [DNS] resolvers."
+    best = min(answered, key=lambda entry: entry['warm']['p50'])
+    return (f"Interpretation: Fastest resolver is {best['resolver']} "
+            f"(cached answers in {format_ms(best['warm']['p50'])}).")
+
+
+def format_results(results):
+    """The human-readable report shown in the Results tab and printed by the CLI.
+
+    Sections are printed only for the tests present in ``results``.
+    """
+    lines = [f"Test Time: {results['timestamp']}", ""]
+    if 'ping' in results:
+        lines += ["Ping Test Results:", results['ping']['output'], interpret_ping(results['ping'])]
+        if results.get('latency'):
+            lines.append(interpret_latency(results['latency']))
+        lines.append("")
+    if 'dns' in results:
+        lines += ["DNS Lookup Results:", results['dns']['output'], interpret_dns(results['dns']), ""]
+    http = [probe for probe in results.get('probes', ()) if probe['type'] == 'http']
+    if http:
+        lines += ["HTTP Request Results:"] + [probe['output'] for probe in http] + [interpret_http(http), ""]
+    if 'speed' in results:
+        speed = results['speed']
+        lines += ["Speed Test Results:",
+                  f"Download Speed: {speed['download']:.2f} Mbps",
+                  f"Upload Speed: {speed['upload']:.2f} Mbps",
+                  f"Ping: {speed['ping']:.2f} ms",
+                  interpret_speed(speed), ""]
+    if results.get('dns_benchmark'):
+        lines.append("DNS Resolver Benchmark:")
+        for entry in results['dns_benchmark']:
+            cold, warm = entry['cold'], entry['warm']
+            lines.append(f"{entry['resolver']:<22} cold p50 {format_ms(cold.get('p50'))}, "
+                         f"p90 {format_ms(cold.get('p90'))}; warm p50 {format_ms(warm.get('p50'))}, "
+                         f"p90 {format_ms(warm.get('p90'))}; "
+                         f"timeouts {entry.get('timeouts', 0)}/{entry.get('queries', 0)}"
+                         + (f", errors {entry['errors']}" if entry.get('errors') else ""))
+        lines += [interpret_dns_benchmark(results['dns_benchmark']), ""]
+
+    if results.get('path'):
+        lines += format_path(results['path']) + [""]
+
+    if results.get('probes'):
+        if lines[-1]:
+            lines.append("")
+        lines.append("Probe Results:")
+        for probe in results['probes']:
+            latency = f"{probe['latency']:.2f} ms" if probe['latency'] is not None else probe.get('error', 'failed')
+            lines.append(f"{probe['type']:<5} {probe['target']:<40} {latency}")
+    if results.get('timings'):
+        lines += ["", "Stage Timings:"]
+        for stage, value in results['timings'].items():
+            lines.append(f"{stage:<12} {format_ms(value)}")
+    return "\n".join(lines).rstrip("\n") + "\n"
@@ -0,0 +1,409 @@
+"""MTR-style path analysis: loss, latency and jitter of every hop.
+
+Each round sends one TTL-limited probe per hop, all at once, and matches
+the ICMP time-exceeded or unreachable answers to their probes. Raw ICMP
+echo needs root; otherwise UDP probes are sent and the ICMP errors are
+read from the socket's error queue (Linux ``IP_RECVERR``), which needs no
+privileges. ``SimulatedPath`` answers like a real path, without a network.
+"""
+import asyncio
+import itertools
+import os
+import random
+import socket
+import struct
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+from latency_prober import ICMP_ECHO_REPLY, ICMP_ECHO_REQUEST, build_echo_request
+
+DEFAULT_MAX_HOPS = 30
+DEFAULT_INTERVAL = 1.0
+DEFAULT_TIMEOUT = 2.0
+DEFAULT_WINDOW = 100
+DEFAULT_BASE_PORT = 33434
+DEFAULT_REPORT_INTERVAL = 60
+METHODS = ('auto', 'icmp', 'udp')
+
+ICMP_DEST_UNREACHABLE = 3
+ICMP_TIME_EXCEEDED = 11
+ICMP_PORT_UNREACHABLE = 3
+# من linux/in.h و linux/errqueue.h؛ بايثون لا يعرّفها
+IP_RECVERR = getattr(socket, 'IP_RECVERR', 11)
+SO_EE_ORIGIN_ICMP = 2
+_EXTENDED_ERR = struct.Struct('=IBBBBII')
+# نرقم مسابير UDP بمنفذ الوجهة لأن ترويسة UDP تعود دائماً في رسالة ICMP
+UDP_PORT_RANGE = 1024
+PAYLOAD = b'\0' * 24
+
+# ما يعيده النقل لكل رد: قفزة وسيطة، الوصول إلى الوجهة، أو "غير قابل للوصول"
+HOP, REACHED, UNREACHABLE = 'hop', 'reached', 'unreachable'
+
+_idents = itertools.count((os.getpid() * 7907) & 0xFFFF)
+
+
+class HopStats:
+    """Loss, latency percentiles and jitter of one hop over its last ``window`` probes.
+
+    RTTs are kept in a ``deque`` of microseconds (``None`` for a lost
+    probe), so memory is fixed by the window and a summary sorts at most
+    ``window`` values.
+    """
+
+    __slots__ = ('rtts', 'addresses', 'unreachable')
+
+    def __init__(self, window=DEFAULT_WINDOW):
+        self.rtts = deque(maxlen=window)
+        self.addresses = Counter()
+        self.unreachable = False
+
+    def add(self, rtt_us, address=None):
+        self.rtts.append(rtt_us)
+        if address is not None:
+            self.addresses[address] += 1
+
+    def summary(self):
+        def ms(value):
+            return value / 1000 if value is not None else None
+
+        received = [rtt for rtt in self.rtts if rtt is not None]
+        ordered = sorted(received)
+        sent = len(self.rtts)
+        stats = {
+            'address': self.addresses.most_common(1)[0][0] if self.addresses else None,
+            'addresses': len(self.addresses),
+            'sent': sent,
+            'received': len(received),
+            'loss': (sent - len(received)) * 100 / sent if sent else None,
+            'last': ms(received[-1]) if received else None,
+            'best': ms(ordered[0]) if ordered else None,
+            'worst': ms(ordered[-1]) if ordered else None,
+            'mean': ms(sum(ordered) / len(ordered)) if ordered else None,
+            'jitter': None,
+            'unreachable': self.unreachable,
+        }
+        for q in (50, 90, 99):
+            stats[f'p{q}'] = ms(ordered[int(q / 100 * (len(ordered) - 1))]) if ordered else None
+        if len(received) > 1:
+            # نفس تعريف LatencyWindow: متوسط الفرق المطلق بين ردين متتاليين
+            stats['jitter'] = ms(sum(abs(b - a) for a, b in zip(received, received[1:])) / (len(received) - 1))
+        return stats
+
+
+class UdpTransport:
+    """UDP probes; ICMP answers are read from the socket error queue (Linux, no privileges).
+
+    The TTL is set per packet with ``IP_TTL``, and ``IP_RECVERR`` queues
+    every ICMP error with the address of the router that sent it and the
+    destination port of the probe, which carries the sequence number.
+    """
+
+    name = 'udp'
+    seq_space = UDP_PORT_RANGE
+
+    def __init__(self, base_port=DEFAULT_BASE_PORT):
+        self.base_port = base_port
+        self.sock = None
+
+    def open(self, loop, address, on_reply):
+        self.loop = loop
+        self.address = address
+        self.on_reply = on_reply
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.IPPROTO_IP, IP_RECVERR, 1)
+        self.sock.setblocking(False)
+        loop.add_reader(self.sock.fileno(), self._read)
+
+    def send(self, ttl, seq):
+        self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_TTL, ttl)
+        try:
+            self.sock.sendto(PAYLOAD, (self.address, self.base_port + seq))
+        except OSError:
+            # خطأ ICMP سابق لم يُقرأ بعد يُعاد مرة واحدة من sendto دون أن يُرسل المسبار
+            self.sock.sendto(PAYLOAD, (self.address, self.base_port + seq))
+
+    def _read(self):
+        while True:
+            try:
+                _, ancillary, _, target = self.sock.recvmsg(512, 512, socket.MSG_ERRQUEUE)
+            except BlockingIOError:
+                break
+            except OSError:
+                continue
+            recv_ns = time.perf_counter_ns()
+            for level, kind, data in ancillary:
+                if level != socket.IPPROTO_IP or kind != IP_RECVERR or len(data) < _EXTENDED_ERR.size + 8:
+                    continue
+                _, origin, icmp_type, code, _, _, _ = _EXTENDED_ERR.unpack_from(data)
+                if origin != SO_EE_ORIGIN_ICMP:
+                    continue
+                offender = socket.inet_ntoa(data[_EXTENDED_ERR.size + 4:_EXTENDED_ERR.size + 8])
+                if icmp_type == ICMP_TIME_EXCEEDED:
+                    reply = HOP
+                elif icmp_type == ICMP_DEST_UNREACHABLE and code == ICMP_PORT_UNREACHABLE:
+                    reply = REACHED
+                else:
+                    reply = UNREACHABLE
+                self.on_reply(target[1] - self.base_port, offender, reply, recv_ns)
+        # منفذ مفتوح على الوجهة يرد ببيانات عادية بدلاً من ICMP
+        while True:
+            try:
+                _, source = self.sock.recvfrom(512)
+            except BlockingIOError:
+                break
+            except OSError:
+                continue
+            self.on_reply(source[1] - self.base_port, source[0], REACHED, time.perf_counter_ns())
+
+    def close(self):
+        if self.sock is not None:
+            self.loop.remove_reader(self.sock.fileno())
+            self.sock.close()
+            self.sock = None
+
+
+class IcmpTransport:
+    """ICMP echo probes on a raw socket (needs root or CAP_NET_RAW)."""
+
+    name = 'icmp'
+    seq_space = 0x10000
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+        self.sock.setblocking(False)
+        self.ident = next(_idents) & 0xFFFF
+
+    def open(self, loop, address, on_reply):
+        self.loop = loop
+        self.address = address
+        self.on_reply = on_reply
+        loop.add_reader(self.sock.fileno(), self._read)
+
+    def send(self, ttl, seq):
+        self.sock.setsockopt(socket.IPPROTO_IP, socket.IP_TTL, ttl)
+        self.sock.sendto(build_echo_request(self.ident, seq, PAYLOAD), (self.address, 0))
+
+    def _read(self):
+        while True:
+            try:
+                packet, source = self.sock.recvfrom(2048)
+            except BlockingIOError:
+                break
+            except OSError:
+                continue
+            recv_ns = time.perf_counter_ns()
+            parsed = self.parse(packet)
+            if parsed is not None:
+                seq, reply = parsed
+                self.on_reply(seq, source[0], reply, recv_ns)
+
+    def parse(self, packet):
+        """``(seq, reply kind)`` for answers to our probes, else None."""
+        icmp = packet[(packet[0] & 0x0F) * 4:]
+        if len(icmp) < 8:
+            return None
+        icmp_type, code, _, ident, seq = struct.unpack_from('!BBHHH', icmp)
+        if icmp_type == ICMP_ECHO_REPLY:
+            return (seq, REACHED) if ident == self.ident else None
+        if icmp_type not in (ICMP_TIME_EXCEEDED, ICMP_DEST_UNREACHABLE):
+            return None
+        # رسالة الخطأ تحمل ترويسة IP للمسبار الأصلي وأول 8 بايتات منه
+        inner = icmp[8:]
+        if len(inner) < 20:
+            return None
+        original = inner[(inner[0] & 0x0F) * 4:]
+        if len(original) < 8:
+            return None
+        original_type, _, _, original_ident, seq = struct.unpack_from('!BBHHH', original)
+        if original_type != ICMP_ECHO_REQUEST or original_ident != self.ident:
+            return None
+        return seq, HOP if icmp_type == ICMP_TIME_EXCEEDED else UNREACHABLE
+
+    def close(self):
+        if self.sock is not None:
+            self.loop.remove_reader(self.sock.fileno())
+            self.sock.close()
+            self.sock = None
+
+
+class SimulatedPath:
+    """Stand-in network path for tests and benchmarks.
+
+    ``hops`` lists ``(address, latency_ms, loss_percent, jitter_ms)`` per
+    hop, the last one being the destination; an address of ``None`` is a
+    hop that never answers. Answers are scheduled on the event loop, so
+    the analyzer runs exactly as against real sockets.
+    """
+
+    name = 'simulated'
+    seq_space = 0x10000
+
+    def __init__(self, hops, seed=None):
+        self.hops = hops
+        self.random = random.Random(seed)
+
+    def open(self, loop, address, on_reply):
+        self.loop = loop
+        self.on_reply = on_reply
+
+    def send(self, ttl, seq):
+        index = min(ttl, len(self.hops)) - 1
+        address, latency, loss, jitter = self.hops[index]
+        if address is None or self.random.random() * 100 < loss:
+            return
+        delay = max(latency + self.random.uniform(-jitter, jitter), 0) / 1000
+        reply = REACHED if index == len(self.hops) - 1 else HOP
+        self.loop.call_later(delay, self.on_reply, seq, address, reply)
+
+    def close(self):
+        pass
+
+
+class PathAnalyzer:
+    """MTR-style path analysis towards one IPv4 host.
+
+    Every ``interval`` seconds one probe per TTL is sent back to back, so
+    the whole path is measured in one pass rather than hop by hop. Once the
+    destination has answered, only TTLs up to it are probed. A probe
+    without an answer after ``timeout`` seconds counts as lost. Each hop
+    keeps rolling ``HopStats`` over its last ``window`` probes.
+
+    Loss at one hop that does not carry on to later hops is usually a
+    router rate-limiting its ICMP answers, not loss of real traffic.
+    """
+
+    def __init__(self, host, max_hops=DEFAULT_MAX_HOPS, interval=DEFAULT_INTERVAL, timeout=DEFAULT_TIMEOUT,
+                 window=DEFAULT_WINDOW, method='auto', base_port=DEFAULT_BASE_PORT):
+        if method not in METHODS:
+            raise ValueError(f"Unknown path probe method: {method}")
+        if not 1 <= max_hops <= 255:
+            raise ValueError("max_hops must be between 1 and 255.")
+        if interval <= 0:
+            raise ValueError("Interval must be positive.")
+        self.host = host
+        self.max_hops = max_hops
+        self.interval = interval
+        self.timeout = timeout
+        self.window = window
+        self.method = method
+        self.base_port = base_port
+        self.address = None
+        self.transport_name = None
+        self.reset()
+
+    @classmethod
+    def from_config(cls, config, host):
+        return cls(host,
+                   max_hops=config.getint('Path', 'max_hops', fallback=DEFAULT_MAX_HOPS),
+                   interval=config.getfloat('Path', 'interval', fallback=DEFAULT_INTERVAL),
+                   timeout=config.getfloat('Path', 'timeout', fallback=DEFAULT_TIMEOUT),
+                   window=config.getint('Path', 'window', fallback=DEFAULT_WINDOW),
+                   method=config.get('Path', 'method', fallback='auto'))
+
+    def reset(self):
+        self.hops = [HopStats(self.window) for _ in range(self.max_hops)]
+        self.path_length = None
+        self.rounds = 0
+        self.next_seq = 0
+
+    def open_transport(self):
+        if self.method in ('auto', 'icmp'):
+            try:
+                return IcmpTransport()
+            except PermissionError:
+                if self.method == 'icmp':
+                    raise PermissionError("Raw ICMP sockets need root or CAP_NET_RAW")
+        return UdpTransport(self.base_port)
+
+    def record(self, ttl, rtt_us, address, reply):
+        hop = self.hops[ttl - 1]
+        hop.add(rtt_us, address)
+        if reply in (REACHED, UNREACHABLE):
+            hop.unreachable = reply == UNREACHABLE
+            if self.path_length is None or ttl < self.path_length:
+                self.path_length = ttl
+        elif self.path_length is not None and ttl >= self.path_length:
+            # قفزة وسيطة عند طول المسار المعروف: المسار تغير وصار أطول
+            self.path_length = None
+
+    async def run(self, on_round=None, stop=None, transport=None):
+        """Probe until ``stop`` is set; ``on_round(snapshot)`` follows every round."""
+        stop = stop or asyncio.Event()
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(self.host, None, family=socket.AF_INET, type=socket.SOCK_DGRAM)
+        self.address = infos[0][4][0]
+        transport = transport or self.open_transport()
+        self.transport_name = transport.name
+        pending = {}
+        timeout_ns = int(self.timeout * 1e9)
+
+        def on_reply(seq, address, reply, recv_ns=None):
+            probe = pending.pop(seq, None)
+            if probe is not None:
+                ttl, send_ns = probe
+                self.record(ttl, ((recv_ns or time.perf_counter_ns()) - send_ns) // 1000, address, reply)
+
+        def expire(now_ns):
+            for seq in [seq for seq, (_, send_ns) in pending.items() if now_ns - send_ns >= timeout_ns]:
+                ttl, _ = pending.pop(seq)
+                if self.path_length is None or ttl <= self.path_length:
+                    self.hops[ttl - 1].add(None)
+
+        transport.open(loop, self.address, on_reply)
+        try:
+            next_round = time.perf_counter()
+            first_round = self.rounds
+            while not stop.is_set():
+                delay = next_round - time.perf_counter()
+                if delay > 0:
+                    try:
+                        await asyncio.wait_for(stop.wait(), delay)
+                        break
+                    except asyncio.TimeoutError:
+                        pass
+                else:
+                    # متأخرون عن الجدول: نفسح للردود المعلقة ثم نبدأ الجولة دون دفعات تعويضية
+                    await asyncio.sleep(0)
+                    next_round = time.perf_counter()
+                next_round += self.interval
+                expire(time.perf_counter_ns())
+                for ttl in range(1, (self.path_length or self.max_hops) + 1):
+                    seq = self.next_seq % transport.seq_space
+                    self.next_seq += 1
+                    pending[seq] = (ttl, time.perf_counter_ns())
+                    try:
+                        transport.send(ttl, seq)
+                    except OSError:
+                        # مثلاً "الشبكة غير قابلة للوصول" مباشرة من النواة
+                        pending.pop(seq, None)
+                        self.hops[ttl - 1].add(None)
+                self.rounds += 1
+                if on_round is not None and self.rounds - first_round > 1:
+                    on_round(self.snapshot())
+            # مهلة أخيرة لردود الجولة الأخيرة قبل عدّ ما تبقى فقداً
+            if pending:
+                await asyncio.sleep(self.timeout)
+                expire(time.perf_counter_ns() + timeout_ns)
+        finally:
+            transport.close()
+
+    def snapshot(self):
+        """Per-hop summaries up to the destination (or the last hop that answered)."""
+        count = self.path_length
+        if count is None:
+            count = max((ttl for ttl, hop in enumerate(self.hops, 1) if hop.addresses), default=0)
+        hops = []
+        for ttl in range(1, count + 1):
+            summary = self.hops[ttl - 1].summary()
+            summary['hop'] = ttl
+            hops.append(summary)
+        return {
+            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'target': self.host,
+            'address': self.address,
+            'method': self.transport_name,
+            'rounds': self.rounds,
+            'reached': self.path_length is not None and not hops[-1]['unreachable'],
+            'hops': hops,
+        }
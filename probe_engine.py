@@ -0,0 +1,121 @@
+import asyncio
+import socket
+import time
+
+from http_probe import HttpProber
+from latency_prober import LatencyProber
+
+DEFAULT_TIMEOUT = 5.0
+DEFAULT_CONCURRENCY = 100
+
+
+def load_targets(config, default_ping='8.8.8.8', default_dns='google.com'):
+    """Build the probe target list from the [Targets] section of settings.ini."""
+    def split(option, fallback):
+        value = config.get('Targets', option, fallback=fallback)
+        return [item.strip() for item in value.split(',') if item.strip()]
+
+    targets = [{'type': 'ping', 'host': host} for host in split('ping', default_ping)]
+    targets += [{'type': 'dns', 'host': domain} for domain in split('dns', default_dns)]
+    for item in split('tcp', ''):
+        host, _, port = item.rpartition(':')
+        if host and port.isdigit():
+            targets.append({'type': 'tcp', 'host': host, 'port': int(port)})
+    targets += [{'type': 'http', 'url': url} for url in split('http', '')]
+    return targets
+
+
+class ProbeEngine:
+    """Runs ping, DNS, TCP-connect and HTTP probes concurrently on one event loop.
+
+    Every probe is bounded by ``timeout`` and at most ``concurrency`` probes
+    are in flight at once, so a cycle costs roughly its slowest probe.
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, concurrency=DEFAULT_CONCURRENCY, prober=None, http=None):
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.prober = prober or LatencyProber()
+        self.http = http or HttpProber()
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(timeout=config.getfloat('Probes', 'timeout', fallback=DEFAULT_TIMEOUT),
+                   concurrency=config.getint('Probes', 'concurrency', fallback=DEFAULT_CONCURRENCY),
+                   prober=LatencyProber.from_config(config),
+                   http=HttpProber.from_config(config))
+
+    async def ping(self, host):
+        result = await self.prober.probe(host)
+        result.update({'latency': result['avg'], 'success': result['received'] > 0})
+        return result
+
+    async def dns(self, domain):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        infos = await loop.getaddrinfo(domain, None, family=socket.AF_INET, type=socket.SOCK_STREAM)
+        latency = (time.perf_counter() - start) * 1000
+        ip = infos[0][4][0]
+        return {'output': f"IP address of {domain}: {ip}", 'ip': ip,
+                'latency': latency, 'success': True}
+
+    async def tcp_connect(self, host, port):
+        start = time.perf_counter()
+        _, writer = await asyncio.open_connection(host, port)
+        latency = (time.perf_counter() - start) * 1000
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+        return {'output': f"Connected to {host}:{port} in {latency:.2f} ms",
+                'latency': latency, 'success': True}
+
+    async def run_probe(self, target, semaphore=None):
+        semaphore = semaphore or asyncio.Semaphore(1)
+        kind = target['type']
+        if kind == 'ping':
+            probe = self.ping(target['host'])
+        elif kind == 'dns':
+            probe = self.dns(target['host'])
+        elif kind == 'tcp':
+            probe = self.tcp_connect(target['host'], target['port'])
+        elif kind == 'http':
+            probe = self.http.request(target['url'])
+        else:
+            raise ValueError(f"Unknown probe type: {kind}")
+
+        if kind == 'http':
+            label = target['url']
+        else:
+            label = f"{target['host']}:{target['port']}" if kind == 'tcp' else target['host']
+        # مهلة ping يجب أن تتسع لكل العينات المجدولة
+        timeout = max(self.timeout, self.prober.max_duration()) if kind == 'ping' else self.timeout
+        async with semaphore:
+            try:
+                result = await asyncio.wait_for(probe, timeout)
+            except asyncio.TimeoutError:
+                result = {'output': f"{kind} probe to {label} timed out after {timeout:g} s",
+                          'latency': None, 'success': False, 'error': 'timeout'}
+            except Exception as e:
+                result = {'output': f"Error during {kind} probe to {label}: {str(e)}",
+                          'latency': None, 'success': False, 'error': str(e)}
+        if kind == 'ping':
+            result.setdefault('avg_time', None)
+        result.update({'type': kind, 'target': label})
+        return result
+
+    async def run_cycle_async(self, targets, on_done=None):
+        """Probe every target; ``on_done(result)`` is called as each probe finishes."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(target):
+            result = await self.run_probe(target, semaphore)
+            on_done(result)
+            return result
+
+        probe = run if on_done else (lambda target: self.run_probe(target, semaphore))
+        return list(await asyncio.gather(*(probe(t) for t in targets)))
+
+    def run_cycle(self, targets, on_done=None):
+        return asyncio.run(self.run_cycle_async(targets, on_done))
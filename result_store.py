@@ -0,0 +1,565 @@
+import ast
+import json
+import os
+import re
+import threading
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+DEFAULT_PATH = 'results_store'
+DEFAULT_CHUNK_ROWS = 65536
+DEFAULT_CACHED_CHUNKS = 8
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+DNS_BENCH_PHASES = ('cold', 'warm')
+DNS_BENCH_STATS = ('p50', 'p90', 'p99', 'mean')
+PATH_STATS = ('loss', 'mean', 'p50', 'p90', 'p99', 'jitter')
+HTTP_STATS = ('dns', 'connect', 'tls', 'ttfb', 'transfer', 'warm_ttfb', 'warm_total', 'status')
+
+# صف ثابت العرض: 16 بايت لكل قياس
+ROW_DTYPE = np.dtype([('ts', '<i8'), ('target', '<u2'), ('metric', '<u2'), ('value', '<f4')])
+# المعرفات من نوع u2، فلا يتسع المخزن لأكثر من هذا العدد من أسماء الأهداف أو المقاييس
+MAX_NAMES = 65536
+
+CHUNK_MAGIC = b'NPRC'
+CHUNK_VERSION = 1
+_CHUNK_HEADER = np.dtype([('magic', 'S4'), ('version', '<u4'), ('rows', '<u4'),
+                          ('ts_min', '<i8'), ('ts_max', '<i8')])
+
+_PING_TEXT = {
+    'ping.min': re.compile(r'Minimum Time:\s*([\d.]+)'),
+    'ping.max': re.compile(r'Maximum Time:\s*([\d.]+)'),
+    'ping.avg': re.compile(r'Average Time:\s*([\d.]+)'),
+    'ping.loss': re.compile(r'Packet Loss:\s*([\d.]+)'),
+}
+_SPEED_TEXT = {
+    'speed.download': re.compile(r'Download Speed:\s*([\d.]+)'),
+    'speed.upload': re.compile(r'Upload Speed:\s*([\d.]+)'),
+}
+_WEBSITE_TEXT = re.compile(r'Website Response Time \((.*?)\):\s*([\d.]+)')
+
+
+def to_micros(timestamp):
+    if isinstance(timestamp, str):
+        timestamp = datetime.strptime(timestamp, TIMESTAMP_FORMAT).timestamp()
+    return int(round(timestamp * 1_000_000))
+
+
+def format_micros(ts):
+    return datetime.fromtimestamp(ts / 1_000_000).strftime(TIMESTAMP_FORMAT)
+
+
+def flatten_result(result):
+    """Turn one history entry into ``(timestamp, target, metric, value)`` rows."""
+    ts = to_micros(result['timestamp'])
+    rows = []
+
+    def add(target, metric, value):
+        if value is not None:
+            rows.append((ts, target, metric, float(value)))
+
+    probes = result.get('probes')
+    if probes is None and 'ping' in result:
+        # سجلات قديمة بدون قائمة الفحوصات
+        probes = [dict(result['ping'], type='ping', target=''),
+                  dict(result['dns'], type='dns', target='')]
+    for probe in probes or []:
+        kind, target = probe['type'], probe['target']
+        if kind == 'ping':
+            add(target, 'ping.avg', probe.get('avg_time'))
+            for stat in ('min', 'max', 'mdev', 'loss'):
+                add(target, f'ping.{stat}', probe.get(stat))
+        else:
+            add(target, f'{kind}.success', 1 if probe.get('success') else 0)
+            add(target, f'{kind}.latency', probe.get('latency'))
+            if kind == 'http':
+                for stat in HTTP_STATS:
+                    add(target, f'http.{stat}', probe.get(stat))
+
+    if 'speed' in result:
+        for stat in ('download', 'upload', 'ping'):
+            add('speedtest', f'speed.{stat}', result['speed'].get(stat))
+
+    latency = result.get('latency')
+    if latency:
+        for stat in ('p50', 'p90', 'p99', 'p999', 'mean', 'jitter', 'loss'):
+            add(latency.get('target', ''), f'latency.{stat}', latency.get(stat))
+
+    for entry in result.get('dns_benchmark', ()):
+        for phase in DNS_BENCH_PHASES:
+            for stat in DNS_BENCH_STATS:
+                add(entry['resolver'], f'dnsbench.{phase}.{stat}', entry[phase].get(stat))
+        add(entry['resolver'], 'dnsbench.queries', entry.get('queries'))
+        add(entry['resolver'], 'dnsbench.timeouts', entry.get('timeouts'))
+        add(entry['resolver'], 'dnsbench.errors', entry.get('errors'))
+
+    path = result.get('path')
+    if path:
+        # كل قفزة هدف مستقل: "8.8.8.8 hop 3"
+        for hop in path['hops']:
+            for stat in PATH_STATS:
+                add(f"{path['target']} hop {hop['hop']}", f'path.{stat}', hop.get(stat))
+
+    for stage, value in (result.get('timings') or {}).items():
+        add('', f'timing.{stage}', value)
+    return rows
+
+
+def history_entry(record):
+    """Rebuild a GUI history entry from a grouped ``records()`` item."""
+    values = {}
+    for _, metric, value in record['values']:
+        values.setdefault(metric, value)
+    entry = {'timestamp': record['timestamp']}
+    # الاختبارات المجدولة تحفظ كل نوع على حدة، فنعيد فقط الأقسام المسجلة
+    if 'ping.avg' in values or 'ping.loss' in values:
+        entry['ping'] = {'output': '', 'avg_time': values.get('ping.avg'), 'loss': values.get('ping.loss')}
+    if 'dns.success' in values:
+        dns_success = bool(values['dns.success'])
+        entry['dns'] = {'output': f"DNS lookup {'succeeded' if dns_success else 'failed'}", 'success': dns_success}
+    if 'speed.download' in values:
+        entry['speed'] = {stat: values.get(f'speed.{stat}', 0) for stat in ('download', 'upload', 'ping')}
+    bench = {}
+    for target, metric, value in record['values']:
+        if metric.startswith('dnsbench.'):
+            resolver = bench.setdefault(target, {'resolver': target, **{phase: {} for phase in DNS_BENCH_PHASES}})
+            parts = metric.split('.')
+            if len(parts) == 3:
+                resolver[parts[1]][parts[2]] = value
+            else:
+                resolver[parts[1]] = int(value)
+    if bench:
+        entry['dns_benchmark'] = list(bench.values())
+    timings = {metric[len('timing.'):]: value for metric, value in values.items() if metric.startswith('timing.')}
+    if timings:
+        entry['timings'] = timings
+    if 'latency.p50' in values:
+        entry['latency'] = {stat: values.get(f'latency.{stat}')
+                            for stat in ('p50', 'p90', 'p99', 'p999', 'mean', 'jitter', 'loss')}
+    return entry
+
+
+def parse_legacy_csv_row(row):
+    """Rows from ``save_results`` or from the older multi-line text layout."""
+    ts = to_micros(row[0])
+    rows = []
+
+    def add(target, metric, value):
+        if value not in (None, '', 'None'):
+            rows.append((ts, target, metric, float(value)))
+
+    if len(row) == 6:
+        # Timestamp, Ping, DNS Lookup, Download, Upload, Speedtest Ping
+        add('', 'ping.avg', row[1])
+        add('', 'dns.success', 1 if row[2] == 'Success' else 0)
+        add('speedtest', 'speed.download', row[3])
+        add('speedtest', 'speed.upload', row[4])
+        add('speedtest', 'speed.ping', row[5])
+        return rows
+
+    if len(row) > 1:
+        if row[1].lstrip().startswith('{'):
+            ping = ast.literal_eval(row[1])
+            for stat, key in (('avg', 'avg'), ('min', 'min'), ('max', 'max'), ('loss', 'packet_loss')):
+                add('', f'ping.{stat}', ping.get(key))
+        else:
+            for metric, pattern in _PING_TEXT.items():
+                match = pattern.search(row[1])
+                add('', metric, match.group(1) if match else None)
+    if len(row) > 2:
+        if row[2].lstrip().startswith('{'):
+            speed = ast.literal_eval(row[2])
+            for stat in ('download', 'upload', 'ping'):
+                add('speedtest', f'speed.{stat}', speed.get(stat))
+        else:
+            for metric, pattern in _SPEED_TEXT.items():
+                match = pattern.search(row[2])
+                add('speedtest', metric, match.group(1) if match else None)
+    if len(row) > 3:
+        match = _WEBSITE_TEXT.search(row[3])
+        if match:
+            add(match.group(1), 'http.response_time', match.group(2))
+        else:
+            try:
+                add('website', 'http.response_time', float(row[3]))
+            except ValueError:
+                pass
+    return rows
+
+
+def _pack_chunk(rows):
+    ts = rows['ts']
+    header = np.zeros(1, dtype=_CHUNK_HEADER)
+    header[0] = (CHUNK_MAGIC, CHUNK_VERSION, len(rows), ts.min(), ts.max())
+    # الطوابع الزمنية تحفظ كفروقات متتالية لتنضغط جيداً
+    deltas = np.diff(ts, prepend=np.int64(0))
+    parts = [header.tobytes()]
+    for column in (deltas, rows['target'], rows['metric'], rows['value']):
+        # byte-shuffle: بايتات الأس والعلامة المتشابهة تتجاور فيرتفع معدل الضغط
+        column = np.ascontiguousarray(column)
+        shuffled = column.view(np.uint8).reshape(-1, column.itemsize).T
+        blob = zlib.compress(shuffled.tobytes(), 6)
+        parts.append(np.uint32(len(blob)).tobytes())
+        parts.append(blob)
+    return b''.join(parts)
+
+
+def _unpack_chunk(data):
+    header = np.frombuffer(data, dtype=_CHUNK_HEADER, count=1)[0]
+    if header['magic'] != CHUNK_MAGIC or header['version'] != CHUNK_VERSION:
+        raise ValueError("Not a result store chunk")
+    rows = np.empty(int(header['rows']), dtype=ROW_DTYPE)
+    offset = _CHUNK_HEADER.itemsize
+    for name, dtype in (('ts', '<i8'), ('target', '<u2'), ('metric', '<u2'), ('value', '<f4')):
+        size = int(np.frombuffer(data, dtype='<u4', count=1, offset=offset)[0])
+        offset += 4
+        planes = np.frombuffer(zlib.decompress(data[offset:offset + size]), dtype=np.uint8)
+        rows[name] = planes.reshape(np.dtype(dtype).itemsize, -1).T.copy().view(dtype).ravel()
+        offset += size
+    rows['ts'] = np.cumsum(rows['ts'])
+    return rows
+
+
+class ResultStore:
+    """Append-only, columnar store for measurement rows.
+
+    New rows are appended as 16-byte fixed-width records to ``active.bin``.
+    Every ``chunk_rows`` rows the active file is sealed into an immutable,
+    column-wise zlib-compressed chunk whose time range is kept in
+    ``catalog.json``, so time-range queries only decode overlapping chunks.
+    Target and metric names are interned into small integer ids.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, chunk_rows=DEFAULT_CHUNK_ROWS,
+                 cached_chunks=DEFAULT_CACHED_CHUNKS):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.cached_chunks = cached_chunks
+        self.lock = threading.RLock()
+        self._cache = OrderedDict()
+        os.makedirs(path, exist_ok=True)
+
+        self.catalog_path = os.path.join(path, 'catalog.json')
+        if os.path.exists(self.catalog_path):
+            with open(self.catalog_path) as f:
+                self.catalog = json.load(f)
+        else:
+            self.catalog = {'targets': [], 'metrics': [], 'chunks': []}
+        self._target_ids = {name: i for i, name in enumerate(self.catalog['targets'])}
+        self._metric_ids = {name: i for i, name in enumerate(self.catalog['metrics'])}
+
+        self.active_path = os.path.join(path, 'active.bin')
+        self._active = open(self.active_path, 'ab')
+        # نتجاهل سجلاً ناقصاً في نهاية الملف بعد انقطاع مفاجئ
+        size = self._active.tell()
+        if size % ROW_DTYPE.itemsize:
+            self._active.truncate(size - size % ROW_DTYPE.itemsize)
+            self._active.seek(0, os.SEEK_END)
+        self.active_rows = self._active.tell() // ROW_DTYPE.itemsize
+
+    def __len__(self):
+        return self.active_rows + sum(chunk['rows'] for chunk in self.catalog['chunks'])
+
+    @property
+    def targets(self):
+        return self.catalog['targets']
+
+    @property
+    def metrics(self):
+        return self.catalog['metrics']
+
+    def _save_catalog(self):
+        tmp_path = self.catalog_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.catalog, f)
+        os.replace(tmp_path, self.catalog_path)
+
+    def _intern(self, ids, names, name):
+        if name not in ids:
+            if len(names) >= MAX_NAMES:
+                kind = 'target' if names is self.catalog['targets'] else 'metric'
+                raise ValueError(f"Cannot add {kind} {name!r}: the store holds at most {MAX_NAMES} {kind} names.")
+            ids[name] = len(names)
+            names.append(name)
+            self._save_catalog()
+        return ids[name]
+
+    def target_id(self, name):
+        return self._target_ids.get(name)
+
+    def metric_id(self, name):
+        return self._metric_ids.get(name)
+
+    def intern_target(self, name):
+        with self.lock:
+            return self._intern(self._target_ids, self.catalog['targets'], name)
+
+    def intern_metric(self, name):
+        with self.lock:
+            return self._intern(self._metric_ids, self.catalog['metrics'], name)
+
+    def append_array(self, rows):
+        """Append rows already encoded as ``ROW_DTYPE`` with interned ids."""
+        with self.lock:
+            self._write(np.ascontiguousarray(rows, dtype=ROW_DTYPE))
+
+    def append(self, timestamp, target, metric, value):
+        self.append_many([(timestamp, target, metric, value)])
+
+    def append_many(self, rows):
+        with self.lock:
+            batch = np.empty(len(rows), dtype=ROW_DTYPE)
+            for i, (ts, target, metric, value) in enumerate(rows):
+                batch[i] = (ts if isinstance(ts, (int, np.integer)) else to_micros(ts),
+                            self._intern(self._target_ids, self.catalog['targets'], target),
+                            self._intern(self._metric_ids, self.catalog['metrics'], metric),
+                            value)
+            self._write(batch)
+
+    def append_result(self, result):
+        self.append_many(flatten_result(result))
+
+    def _write(self, batch):
+        while len(batch):
+            room = self.chunk_rows - self.active_rows
+            self._active.write(batch[:room].tobytes())
+            self.active_rows += min(room, len(batch))
+            batch = batch[room:]
+            if self.active_rows >= self.chunk_rows:
+                self._seal()
+        self._active.flush()
+
+    def _seal(self):
+        self._active.flush()
+        rows = np.fromfile(self.active_path, dtype=ROW_DTYPE)
+        if not len(rows):
+            return
+        name = f"chunk-{len(self.catalog['chunks']):06d}.bin"
+        with open(os.path.join(self.path, name), 'wb') as f:
+            f.write(_pack_chunk(rows))
+        self.catalog['chunks'].append({'file': name, 'rows': int(len(rows)),
+                                       'ts_min': int(rows['ts'].min()), 'ts_max': int(rows['ts'].max())})
+        self._save_catalog()
+        self._active.seek(0)
+        self._active.truncate()
+        self.active_rows = 0
+
+    def _load_chunk(self, name):
+        if name in self._cache:
+            self._cache.move_to_end(name)
+            return self._cache[name]
+        with open(os.path.join(self.path, name), 'rb') as f:
+            rows = _unpack_chunk(f.read())
+        self._cache[name] = rows
+        if len(self._cache) > self.cached_chunks:
+            self._cache.popitem(last=False)
+        return rows
+
+    def _active_array(self):
+        self._active.flush()
+        if not self.active_rows:
+            return np.empty(0, dtype=ROW_DTYPE)
+        return np.fromfile(self.active_path, dtype=ROW_DTYPE, count=self.active_rows)
+
+    def iter_chunks(self, start=None, end=None):
+        """Yield row arrays of every chunk overlapping ``[start, end]`` (microseconds)."""
+        with self.lock:
+            chunks = list(self.catalog['chunks'])
+        for chunk in chunks:
+            if start is not None and chunk['ts_max'] < start:
+                continue
+            if end is not None and chunk['ts_min'] > end:
+                continue
+            with self.lock:
+                rows = self._load_chunk(chunk['file'])
+            yield rows
+        with self.lock:
+            rows = self._active_array()
+        if len(rows):
+            yield rows
+
+    def query(self, start=None, end=None, target=None, metric=None):
+        """Rows in a time range, optionally filtered by target and metric name."""
+        start = to_micros(start) if start is not None and not isinstance(start, int) else start
+        end = to_micros(end) if end is not None and not isinstance(end, int) else end
+        target_id = self.target_id(target) if target is not None else None
+        metric_id = self.metric_id(metric) if metric is not None else None
+        if (target is not None and target_id is None) or (metric is not None and metric_id is None):
+            return np.empty(0, dtype=ROW_DTYPE)
+
+        parts = []
+        for rows in self.iter_chunks(start, end):
+            mask = np.ones(len(rows), dtype=bool)
+            if start is not None:
+                mask &= rows['ts'] >= start
+            if end is not None:
+                mask &= rows['ts'] <= end
+            if target_id is not None:
+                mask &= rows['target'] == target_id
+            if metric_id is not None:
+                mask &= rows['metric'] == metric_id
+            parts.append(rows[mask])
+        return np.concatenate(parts) if parts else np.empty(0, dtype=ROW_DTYPE)
+
+    def tail(self, count):
+        """The last ``count`` appended rows, decoding only the chunks needed."""
+        with self.lock:
+            parts = [self._active_array()]
+            remaining = count - len(parts[0])
+            for chunk in reversed(self.catalog['chunks']):
+                if remaining <= 0:
+                    break
+                rows = self._load_chunk(chunk['file'])
+                parts.insert(0, rows)
+                remaining -= len(rows)
+        rows = np.concatenate(parts)
+        return rows[-count:] if count else rows[:0]
+
+    def latest(self, count):
+        """The ``count`` rows with the newest timestamps, in time order.
+
+        Unlike ``tail`` this ignores the order rows were appended in, so an
+        import of older results does not push the recent ones out. Chunks
+        are read newest first until no other chunk can hold a newer row.
+        """
+        if not count:
+            return np.empty(0, dtype=ROW_DTYPE)
+        with self.lock:
+            parts = [self._active_array()]
+            have = len(parts[0])
+            for chunk in sorted(self.catalog['chunks'], key=lambda chunk: chunk['ts_max'], reverse=True):
+                if have >= count:
+                    cutoff = np.partition(np.concatenate([part['ts'] for part in parts]), have - count)[have - count]
+                    if chunk['ts_max'] < cutoff:
+                        break
+                rows = self._load_chunk(chunk['file'])
+                parts.append(rows)
+                have += len(rows)
+        rows = np.concatenate(parts)
+        return rows[np.argsort(rows['ts'], kind='stable')][-count:]
+
+    def latest_records(self, count):
+        """Every row of the ``count`` newest timestamps, in time order.
+
+        Same as ``latest`` but counted in records, however many rows each
+        record has.
+        """
+        if not count:
+            return np.empty(0, dtype=ROW_DTYPE)
+        with self.lock:
+            parts = [self._active_array()]
+            for chunk in sorted(self.catalog['chunks'], key=lambda chunk: chunk['ts_max'], reverse=True):
+                stamps = np.unique(np.concatenate([part['ts'] for part in parts]))
+                if len(stamps) >= count and chunk['ts_max'] < stamps[-count]:
+                    break
+                parts.append(self._load_chunk(chunk['file']))
+        rows = np.concatenate(parts)
+        stamps = np.unique(rows['ts'])
+        if len(stamps) > count:
+            rows = rows[rows['ts'] >= stamps[-count]]
+        return rows[np.argsort(rows['ts'], kind='stable')]
+
+    def _group(self, rows):
+        targets, metrics = self.catalog['targets'], self.catalog['metrics']
+        rows = rows[np.argsort(rows['ts'], kind='stable')]
+        items = rows.tolist()
+        first = 0
+        for last in (np.flatnonzero(np.diff(rows['ts'])) + 1).tolist() + [len(items)]:
+            if last > first:
+                # float32 يحفظ 7 أرقام معنوية؛ نتجنب ذيولاً مثل 14.829999923706055
+                yield items[first][0], [(targets[target], metrics[metric], float('%.7g' % value))
+                                        for _, target, metric, value in items[first:last]]
+            first = last
+
+    def records(self, rows):
+        """Group rows by timestamp into time-ordered ``{'timestamp', 'values'}`` records."""
+        return [{'timestamp': format_micros(ts), 'values': values} for ts, values in self._group(rows)]
+
+    def count_rows(self, start=None, end=None):
+        """Upper bound on the rows in ``[start, end]``, read from the chunk index only."""
+        with self.lock:
+            total = self.active_rows
+            for chunk in self.catalog['chunks']:
+                if (start is None or chunk['ts_max'] >= start) and (end is None or chunk['ts_min'] <= end):
+                    total += chunk['rows']
+        return total
+
+    def time_range(self):
+        """``(first, last)`` timestamp in the store, ``(None, None)`` when empty."""
+        with self.lock:
+            rows = self._active_array()
+            bounds = [(chunk['ts_min'], chunk['ts_max']) for chunk in self.catalog['chunks']]
+        if len(rows):
+            bounds.append((int(rows['ts'].min()), int(rows['ts'].max())))
+        if not bounds:
+            return None, None
+        return min(first for first, _ in bounds), max(last for _, last in bounds)
+
+    def position(self):
+        """``(chunk, row)`` just past the last stored row, for ``iter_records(since=...)``.
+
+        Chunks are never rewritten and the active file becomes the next
+        chunk when sealed, so a position stays valid as rows are added.
+        """
+        with self.lock:
+            return len(self.catalog['chunks']), self.active_rows
+
+    def iter_records(self, start=None, end=None, since=None, until=None):
+        """Stream grouped records in time order, one record per timestamp.
+
+        Chunks are taken in order of their first timestamp, and rows are
+        only yielded once no later chunk can hold the same or an older
+        timestamp. Stores written in time order thus hold one decoded chunk
+        at a time; after an out-of-order import only the chunks whose time
+        ranges overlap are held together. ``since``/``until`` are
+        ``position()`` values that limit the rows to those stored between
+        them, whatever their timestamps.
+        """
+        with self.lock:
+            chunks = list(self.catalog['chunks'])
+            active = self._active_array()
+        first, offset = since or (0, 0)
+        last, limit = until or (len(chunks), len(active))
+        segments = []
+        for index in range(first, last + 1):
+            low = offset if index == first else 0
+            high = limit if index == last else None
+            if index < len(chunks):
+                chunk = chunks[index]
+                segments.append((chunk['ts_min'], chunk['ts_max'], chunk['file'], low, high))
+            elif index == len(chunks) and len(active[low:high]):
+                rows = active[low:high]
+                segments.append((int(rows['ts'].min()), int(rows['ts'].max()), rows, 0, None))
+        segments = [segment for segment in segments
+                    if (start is None or segment[1] >= start) and (end is None or segment[0] <= end)]
+        segments.sort(key=lambda segment: segment[0])
+
+        pending = np.empty(0, dtype=ROW_DTYPE)
+        for i, (_, _, source, low, high) in enumerate(segments):
+            if isinstance(source, str):
+                with self.lock:
+                    source = self._load_chunk(source)
+            source = source[low:high]
+            mask = np.ones(len(source), dtype=bool)
+            if start is not None:
+                mask &= source['ts'] >= start
+            if end is not None:
+                mask &= source['ts'] <= end
+            pending = np.concatenate((pending, source[mask]))
+            pending = pending[np.argsort(pending['ts'], kind='stable')]
+            # ما قبل بداية المقطع التالي لن يضاف إليه شيء
+            cutoff = segments[i + 1][0] if i + 1 < len(segments) else None
+            ready = len(pending) if cutoff is None else int(np.searchsorted(pending['ts'], cutoff))
+            for ts, values in self._group(pending[:ready]):
+                yield {'timestamp': format_micros(ts), 'ts': ts, 'values': values}
+            pending = pending[ready:]
+
+    def flush(self):
+        with self.lock:
+            self._active.flush()
+
+    def close(self):
+        with self.lock:
+            self._active.close()
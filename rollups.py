@@ -0,0 +1,300 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+MINUTE = 60_000_000
+HOUR = 60 * MINUTE
+DAY = 24 * HOUR
+# من الأدق إلى الأخشن؛ كل مستوى ملف ثابت العرض في مجلد rollups داخل المخزن
+LEVELS = (('1min', MINUTE), ('1h', HOUR), ('1d', DAY))
+PERCENTILES = (50, 90, 99)
+DEFAULT_MAX_POINTS = 2000
+# نترك الدقيقة الحالية مفتوحة قليلاً لنتائج تصل متأخرة من خيوط العمل
+GRACE = 5_000_000
+STATE_FILE = 'state.json'
+# عدد الدلاء المنسوخة في كل كتابة عند إعادة ملء مدى زمني
+BACKFILL_SLICE = 1 << 20
+
+BUCKET_DTYPE = np.dtype([('start', '<i8'), ('target', '<u2'), ('metric', '<u2'), ('count', '<u4'),
+                         ('min', '<f4'), ('max', '<f4'), ('mean', '<f4'),
+                         ('p50', '<f4'), ('p90', '<f4'), ('p99', '<f4')])
+
+
+def local_offset():
+    """Local UTC offset in microseconds, so day buckets start at local midnight."""
+    return int(datetime.now().astimezone().utcoffset().total_seconds() * 1_000_000)
+
+
+def bucket_start(ts, width, offset=0):
+    return (ts + offset) // width * width - offset
+
+
+def aggregate(rows, width, offset=0):
+    """Bucket ``ROW_DTYPE`` rows by (bucket start, target, metric).
+
+    One ``lexsort`` orders the rows by group and by value inside each
+    group, so count, sum, min and max come from ``reduceat`` and the
+    percentiles are read straight from the sorted values (linear
+    interpolation, like ``np.percentile``). Buckets come out sorted by
+    start time.
+    """
+    if not len(rows):
+        return np.empty(0, dtype=BUCKET_DTYPE)
+    starts = bucket_start(rows['ts'], width, offset)
+    values = rows['value'].astype(np.float64)
+    order = np.lexsort((values, rows['metric'], rows['target'], starts))
+    starts, targets, metrics, values = starts[order], rows['target'][order], rows['metric'][order], values[order]
+
+    changed = (np.diff(starts) != 0) | (np.diff(targets) != 0) | (np.diff(metrics) != 0)
+    first = np.concatenate(([0], np.flatnonzero(changed) + 1))
+    last = np.append(first[1:], len(values)) - 1
+    count = last - first + 1
+
+    buckets = np.empty(len(first), dtype=BUCKET_DTYPE)
+    buckets['start'] = starts[first]
+    buckets['target'] = targets[first]
+    buckets['metric'] = metrics[first]
+    buckets['count'] = count
+    buckets['min'] = values[first]
+    buckets['max'] = values[last]
+    buckets['mean'] = np.add.reduceat(values, first) / count
+    for q in PERCENTILES:
+        position = first + (count - 1) * (q / 100)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.minimum(lower + 1, last)
+        buckets[f'p{q}'] = values[lower] + (values[upper] - values[lower]) * (position - lower)
+    return buckets
+
+
+def raw_buckets(rows):
+    """Raw rows in bucket layout (count 1), so callers handle one shape."""
+    buckets = np.empty(len(rows), dtype=BUCKET_DTYPE)
+    buckets['start'] = rows['ts']
+    buckets['target'] = rows['target']
+    buckets['metric'] = rows['metric']
+    buckets['count'] = 1
+    for field in ('min', 'max', 'mean') + tuple(f'p{q}' for q in PERCENTILES):
+        buckets[field] = rows['value']
+    return buckets[np.argsort(buckets['start'], kind='stable')]
+
+
+class RollupEngine:
+    """Per-minute, per-hour and per-day aggregates of a ``ResultStore``.
+
+    Closed buckets are appended once to ``<store>/rollups/<level>.bin`` and
+    read back through ``np.memmap``; ``state.json`` records how far each
+    level is sealed. ``update()`` only aggregates the rows since the last
+    seal, so keeping up costs one small store query per minute. The bucket
+    still open is aggregated from raw rows when queried.
+
+    Rows appended with timestamps before the sealed point (an import of
+    old results) are not picked up by ``update()``; ``backfill()``
+    recomputes just the buckets of their time range.
+    """
+
+    def __init__(self, store, levels=LEVELS, offset=None):
+        self.store = store
+        self.levels = levels
+        self.offset = local_offset() if offset is None else offset
+        self.path = os.path.join(store.path, 'rollups')
+        self.lock = threading.RLock()
+        self._maps = {}
+        os.makedirs(self.path, exist_ok=True)
+        self.state_path = os.path.join(self.path, STATE_FILE)
+        state = {}
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                state = json.load(f)
+        if state.get('offset') != self.offset:
+            # تغير المنطقة الزمنية يغير حدود الأيام: نعيد البناء من الصفر
+            state = {}
+        self.sealed = {name: state.get('sealed', {}).get(name) for name, _ in levels}
+        self._check_files()
+
+    def _file(self, name):
+        return os.path.join(self.path, f'{name}.bin')
+
+    def _check_files(self):
+        for name, _ in self.levels:
+            path = self._file(name)
+            if self.sealed[name] is None and os.path.exists(path):
+                os.remove(path)
+            elif os.path.exists(path):
+                size = os.path.getsize(path)
+                if size % BUCKET_DTYPE.itemsize:
+                    with open(path, 'r+b') as f:
+                        f.truncate(size - size % BUCKET_DTYPE.itemsize)
+
+    def _save_state(self):
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'offset': self.offset, 'sealed': self.sealed}, f)
+        os.replace(tmp_path, self.state_path)
+
+    def buckets(self, name):
+        """All sealed buckets of a level, memory-mapped and sorted by start."""
+        with self.lock:
+            path = self._file(name)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            cached = self._maps.get(name)
+            if cached is None or len(cached) * BUCKET_DTYPE.itemsize != size:
+                cached = (np.memmap(path, dtype=BUCKET_DTYPE, mode='r') if size
+                          else np.empty(0, dtype=BUCKET_DTYPE))
+                self._maps[name] = cached
+            return cached
+
+    def update(self, now=None):
+        """Seal every bucket that ended before ``now`` (microseconds); returns buckets written."""
+        if now is None:
+            now = int(time.time() * 1_000_000) - GRACE
+        written = 0
+        changed = False
+        with self.lock:
+            first_ts = None
+            for name, width in self.levels:
+                boundary = int(bucket_start(now, width, self.offset))
+                sealed = self.sealed[name]
+                if sealed is None:
+                    if first_ts is None:
+                        first_ts = self.store.time_range()[0]
+                    if first_ts is None:
+                        continue
+                    sealed = int(bucket_start(first_ts, width, self.offset))
+                if sealed >= boundary:
+                    continue
+                # على دفعات يومية حتى لا يُحمّل كامل التاريخ في الذاكرة عند البناء الأول
+                step = max(width, DAY)
+                with open(self._file(name), 'ab') as f:
+                    while sealed < boundary:
+                        stop = min(sealed + step, boundary)
+                        buckets = aggregate(self.store.query(sealed, stop - 1), width, self.offset)
+                        f.write(buckets.tobytes())
+                        written += len(buckets)
+                        sealed = stop
+                self.sealed[name] = sealed
+                changed = True
+            if changed:
+                self._save_state()
+        return written
+
+    def rebuild(self):
+        """Drop every level and aggregate the whole store again."""
+        with self.lock:
+            self._maps.clear()
+            for name, _ in self.levels:
+                self.sealed[name] = None
+                if os.path.exists(self._file(name)):
+                    os.remove(self._file(name))
+            self._save_state()
+            return self.update()
+
+    def backfill(self, start, end):
+        """Recompute the sealed buckets overlapping ``[start, end]`` (microseconds).
+
+        The new buckets replace the old ones in each level file, which is
+        rewritten in slices; buckets not sealed yet are left to
+        ``update()``. Returns the number of buckets written.
+        """
+        written = 0
+        with self.lock:
+            for name, width in self.levels:
+                sealed = self.sealed[name]
+                first = int(bucket_start(start, width, self.offset))
+                if sealed is None or first >= sealed:
+                    continue
+                last = min(int(bucket_start(end, width, self.offset)) + width, sealed)
+                buckets = self.buckets(name)
+                lo = int(np.searchsorted(buckets['start'], first))
+                hi = int(np.searchsorted(buckets['start'], last))
+                tmp_path = self._file(name) + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    for offset in range(0, lo, BACKFILL_SLICE):
+                        f.write(buckets[offset:min(offset + BACKFILL_SLICE, lo)].tobytes())
+                    step = max(width, DAY)
+                    while first < last:
+                        stop = min(first + step, last)
+                        fresh = aggregate(self.store.query(first, stop - 1), width, self.offset)
+                        f.write(fresh.tobytes())
+                        written += len(fresh)
+                        first = stop
+                    for offset in range(hi, len(buckets), BACKFILL_SLICE):
+                        f.write(buckets[offset:min(offset + BACKFILL_SLICE, len(buckets))].tobytes())
+                # الخريطة القديمة قد تبقى بالحجم نفسه فلا يكشف buckets() التغيير
+                self._maps.pop(name, None)
+                del buckets
+                os.replace(tmp_path, self._file(name))
+        return written
+
+    def _ids(self, target, metric):
+        target_id = self.store.target_id(target) if target is not None else None
+        metric_id = self.store.metric_id(metric) if metric is not None else None
+        missing = (target is not None and target_id is None) or (metric is not None and metric_id is None)
+        return target_id, metric_id, missing
+
+    def level_buckets(self, name, start=None, end=None, target=None, metric=None):
+        """Buckets of one level starting in ``[start, end]``, the open tail included."""
+        width = dict(self.levels)[name]
+        target_id, metric_id, missing = self._ids(target, metric)
+        if missing:
+            return np.empty(0, dtype=BUCKET_DTYPE)
+        if start is not None:
+            start = int(bucket_start(start, width, self.offset))
+        with self.lock:
+            sealed = self.sealed[name]
+            buckets = self.buckets(name)
+        starts = buckets['start']
+        lo = np.searchsorted(starts, start) if start is not None else 0
+        hi = np.searchsorted(starts, end, side='right') if end is not None else len(buckets)
+        parts = [self._filter(buckets[lo:hi], target_id, metric_id)]
+
+        # الدلو المفتوح (وما بعده) يُحسب من الصفوف الخام عند الطلب
+        tail = sealed if start is None or (sealed is not None and sealed > start) else start
+        if end is None or tail is None or tail <= end:
+            parts.append(aggregate(self.store.query(tail, end, target, metric), width, self.offset))
+        return np.concatenate(parts)
+
+    @staticmethod
+    def _filter(buckets, target_id, metric_id):
+        if target_id is None and metric_id is None:
+            return np.array(buckets)
+        mask = np.ones(len(buckets), dtype=bool)
+        if target_id is not None:
+            mask &= buckets['target'] == target_id
+        if metric_id is not None:
+            mask &= buckets['metric'] == metric_id
+        return buckets[mask]
+
+    def resolution_for(self, start, end, target=None, metric=None, max_points=DEFAULT_MAX_POINTS):
+        """``'raw'`` or the finest level that yields at most ``max_points`` values.
+
+        The raw row count comes from the hourly buckets, so choosing never
+        reads raw rows.
+        """
+        hourly = self.level_buckets('1h', start, end, target, metric)
+        samples = int(hourly['count'].sum())
+        if samples <= max_points:
+            return 'raw'
+        if start is None:
+            start = int(hourly['start'][0]) if len(hourly) else 0
+        if end is None:
+            end = int(time.time() * 1_000_000)
+        series = max(len(np.unique(hourly['target'].astype(np.int64) << 16 | hourly['metric'])), 1)
+        for name, width in self.levels:
+            if min(samples, series * ((end - start) // width + 1)) <= max_points:
+                return name
+        return self.levels[-1][0]
+
+    def series(self, start=None, end=None, target=None, metric=None, max_points=DEFAULT_MAX_POINTS):
+        """``(resolution, buckets)`` at the finest resolution that fits ``max_points``.
+
+        Raw rows are returned as one-sample buckets, so callers always read
+        ``start``, ``mean``, ``min``, ``max`` and the percentiles.
+        """
+        resolution = self.resolution_for(start, end, target, metric, max_points)
+        if resolution == 'raw':
+            return resolution, raw_buckets(self.store.query(start, end, target, metric))
+        return resolution, self.level_buckets(resolution, start, end, target, metric)
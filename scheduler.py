@@ -0,0 +1,170 @@
+import threading
+import time
+
+OVERRUN_POLICIES = ('skip', 'queue')
+
+
+class _Job:
+    def __init__(self, name, interval, func, callback, overrun, next_run):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.callback = callback
+        self.overrun = overrun
+        self.next_run = next_run
+        self.queued = False
+        self.runs = 0
+        self.skipped = 0
+        self.overruns = 0
+        self.last_duration = None
+        self.last_error = None
+
+
+class Scheduler:
+    """Runs named jobs at fixed rates, each run on its own worker thread.
+
+    Tick times are ``start + k * interval`` on the monotonic clock, so a
+    slow run never shifts later ticks. A job never overlaps itself: a tick
+    that arrives while the previous run is still going is skipped, or with
+    the ``'queue'`` policy remembered and run as soon as the previous run
+    finishes (at most one run is queued). Since no job waits for a thread
+    held by another, a long speed test never delays the ping job.
+    ``callback(result)`` is called from the worker thread; GUI callers
+    must hand the result to their own event loop.
+
+    ``run_once`` is refused while ``max_runs`` runs (scheduled or one-off)
+    are outstanding, so one-off runs under distinct names cannot pile up
+    threads without limit. Scheduled jobs are not counted against it
+    beyond their own single run each.
+    """
+
+    def __init__(self, overrun='skip', clock=time.monotonic, max_runs=8):
+        if overrun not in OVERRUN_POLICIES:
+            raise ValueError(f"Unknown overrun policy: {overrun}")
+        if max_runs < 1:
+            raise ValueError("max_runs must be at least 1.")
+        self.overrun = overrun
+        self.max_runs = max_runs
+        self.clock = clock
+        self.jobs = {}
+        # threads: تشغيلات أرسلت ولم تنته بعد؛ active: التشغيلات التي بدأت فعلاً
+        self.threads = {}
+        self.active = set()
+        self.condition = threading.Condition()
+        self.thread = None
+        self.stopped = False
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(overrun=config.get('Schedule', 'overrun', fallback='skip'),
+                   max_runs=config.getint('Schedule', 'max_runs', fallback=8))
+
+    def add_job(self, name, interval, func, callback=None, overrun=None, delay=0):
+        if interval <= 0:
+            raise ValueError("Interval must be positive.")
+        overrun = overrun or self.overrun
+        if overrun not in OVERRUN_POLICIES:
+            raise ValueError(f"Unknown overrun policy: {overrun}")
+        with self.condition:
+            self.jobs[name] = _Job(name, interval, func, callback, overrun, self.clock() + delay)
+            self._ensure_thread()
+            self.condition.notify()
+
+    def remove_job(self, name):
+        with self.condition:
+            self.jobs.pop(name, None)
+
+    def clear(self):
+        with self.condition:
+            self.jobs.clear()
+
+    def run_once(self, name, func, callback=None):
+        """Run ``func`` now unless a run with the same name is still going
+        or ``max_runs`` runs are already outstanding."""
+        with self.condition:
+            if name in self.threads or self.stopped or len(self.threads) >= self.max_runs:
+                return False
+            self._dispatch(name, func, callback, None)
+            return True
+
+    def stats(self):
+        with self.condition:
+            return {name: {'interval': job.interval, 'runs': job.runs, 'skipped': job.skipped,
+                           'overruns': job.overruns, 'last_duration': job.last_duration,
+                           'last_error': job.last_error, 'running': name in self.active}
+                    for name, job in self.jobs.items()}
+
+    def stop(self, wait=False):
+        with self.condition:
+            self.stopped = True
+            self.jobs.clear()
+            self.condition.notify()
+            threads = list(self.threads.values())
+        if wait:
+            for thread in threads:
+                thread.join()
+
+    def _ensure_thread(self):
+        if self.thread is None and not self.stopped:
+            self.thread = threading.Thread(target=self._loop, name='scheduler-clock', daemon=True)
+            self.thread.start()
+
+    def _loop(self):
+        with self.condition:
+            while not self.stopped:
+                now = self.clock()
+                for job in list(self.jobs.values()):
+                    if job.next_run <= now:
+                        self._tick(job, now)
+                if self.jobs:
+                    timeout = max(min(job.next_run for job in self.jobs.values()) - self.clock(), 0)
+                else:
+                    timeout = None
+                self.condition.wait(timeout)
+
+    def _tick(self, job, now):
+        if job.name in self.active:
+            if job.overrun == 'queue':
+                job.queued = True
+            else:
+                job.skipped += 1
+        elif job.name not in self.threads:
+            self._dispatch(job.name, job.func, job.callback, job)
+        # وإلا فالتشغيل السابق أرسل ولم يبدأ بعد، فهذه النبضة تندمج فيه
+        # نتقدم إلى أول نبضة قادمة؛ النبضات الفائتة بالكامل (مثل سكون النظام) تحسب كمتخطاة
+        missed = int((now - job.next_run) // job.interval)
+        job.skipped += missed
+        job.next_run += (missed + 1) * job.interval
+
+    def _dispatch(self, name, func, callback, job):
+        thread = threading.Thread(target=self._run, args=(name, func, callback, job),
+                                  name=f'scheduler-{name}', daemon=True)
+        self.threads[name] = thread
+        thread.start()
+
+    def _run(self, name, func, callback, job):
+        with self.condition:
+            self.active.add(name)
+            if job is not None:
+                job.runs += 1
+        started = self.clock()
+        result = error = None
+        try:
+            result = func()
+        except Exception as e:
+            error = str(e)
+        duration = self.clock() - started
+
+        with self.condition:
+            self.active.discard(name)
+            self.threads.pop(name, None)
+            if job is not None:
+                job.last_duration = duration
+                job.last_error = error
+                if duration > job.interval:
+                    job.overruns += 1
+                if job.queued and self.jobs.get(name) is job and not self.stopped:
+                    job.queued = False
+                    self._dispatch(name, func, callback, job)
+        if error is None and callback is not None:
+            callback(result)
@@ -1,33 +1,56 @@
 import os
-import platform
-import subprocess
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from threading import Thread
-import socket
-import speedtest
-import csv
 from datetime import datetime
 import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+import matplotlib.dates as mdates
 from matplotlib.figure import Figure
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet
-import threading
-import json
-import openpyxl
-from plyer import notification
 import configparser
-
-PING_HOST = '8.8.8.8'
-SPEED_TEST_SERVERS = {
-    'Default': None,
-    'New York': 10556,
-    'London': 6032,
-    'Tokyo': 6087
+import time
+from probe_engine import ProbeEngine, load_targets
+from latency_prober import LatencySampler
+import network_core
+from network_core import PING_HOST, SPEED_TEST_CHOICES
+from throughput import ThroughputClient
+from dns_benchmark import DnsBenchmark
+from path_analyzer import DEFAULT_REPORT_INTERVAL, PathAnalyzer
+from anomaly_detector import AnomalyDetector
+from scheduler import Scheduler
+import asyncio
+from collections import deque
+from result_store import ResultStore, history_entry, to_micros
+from rollups import DAY, RollupEngine
+from collector import Collector, agent_target, load_agents
+from instrumentation import INSTRUMENTS, MetricsServer, SamplingProfiler
+from exporters import CsvExporter, ExcelExporter, JsonLinesExporter, PdfExporter
+from importers import Importer
+from live_graphs import LivePlot
+import numpy as np
+
+STORE_PATH = 'results_store'
+HISTORY_WINDOW = 5000
+LOCAL_AGENT = 'Local'
+AGENT_REFRESH_MS = 15000
+DIAGNOSTICS_REFRESH_MS = 1000
+PATH_COLUMNS = [('address', 'Address'), ('loss', 'Loss %'), ('sent', 'Sent'), ('last', 'Last'), ('mean', 'Avg'),
+                ('best', 'Best'), ('worst', 'Worst'), ('p90', 'p90'), ('jitter', 'Jitter')]
+TIMING_COLUMNS = [('count', 'Count'), ('last', 'Last (ms)'), ('mean', 'Mean (ms)'), ('p50', 'p50 (ms)'),
+                  ('p99', 'p99 (ms)'), ('max', 'Max (ms)')]
+GRAPH_WINDOWS = {
+    'All': None,
+    '1 hour': 1 / 24,
+    '24 hours': 1,
+    '7 days': 7
 }
+PING_SERIES = [('p50', 'b-', 'Ping Time (p50)'), ('p90', 'c-', 'p90'), ('p99', 'm-', 'p99'), ('p999', 'r:', 'p99.9')]
+SPEED_SERIES = [('download', 'g-', 'Download'), ('upload', 'r-', 'Upload')]
+# سلاسل الرسوم كما تقرأ من المخزن: (رقم الرسم، السلسلة، المقياس)
+GRAPH_METRICS = [(0, 'p50', 'ping.avg'), (0, 'p50', 'latency.p50'), (0, 'p90', 'latency.p90'),
+                 (0, 'p99', 'latency.p99'), (0, 'p999', 'latency.p999'),
+                 (1, 'download', 'speed.download'), (1, 'upload', 'speed.upload')]
+
 
 class NetworkPerformanceTool:
     def __init__(self, master):
@@ -40,17 +63,52 @@ class NetworkPerformanceTool:
 
         self.results_frame = ttk.Frame(self.notebook)
         self.graph_frame = ttk.Frame(self.notebook)
+        self.path_frame = ttk.Frame(self.notebook)
+        self.diagnostics_frame = ttk.Frame(self.notebook)
 
         self.notebook.add(self.results_frame, text='Results')
         self.notebook.add(self.graph_frame, text='Graphs')
+        self.notebook.add(self.path_frame, text='Path')
+        self.notebook.add(self.diagnostics_frame, text='Diagnostics')
 
         self.setup_results_frame()
         self.setup_graph_frame()
+        self.setup_path_frame()
 
-        self.history = []
-
+        # السجل الكامل يحفظ في مخزن دائم، وفي الذاكرة نافذة محدودة فقط
+        config = configparser.ConfigParser()
+        config.read('settings.ini')
+        self.store = ResultStore(config.get('Storage', 'path', fallback=STORE_PATH))
+        self.history = deque(maxlen=config.getint('Storage', 'history_window', fallback=HISTORY_WINDOW))
+        self.restore_history()
+        # الرسوم تقرأ ملخصات الدقيقة/الساعة/اليوم للفترات الطويلة بدلاً من الصفوف الخام
+        self.rollups = RollupEngine(self.store)
+        self.rollups.update()
+        # المجمّع يعمل داخل البرنامج حتى يبقى للمخزن كاتب واحد
+        self.collector = None
+        self.collector_loop = None
+        if config.getboolean('Collector', 'enabled', fallback=False):
+            self.start_collector(Collector.from_config(config, self.store))
+        # توقيت المراحل ونقطة /metrics والمحلل بالعينات، وكلها معطلة افتراضياً
+        INSTRUMENTS.configure(config)
+        self.profiler = SamplingProfiler.from_config(config)
+        self.metrics_server = MetricsServer.from_config(config, gauges=self.metrics_gauges)
+        if self.metrics_server is not None:
+            try:
+                self.metrics_server.start()
+            except OSError as e:
+                tk.messagebox.showerror("Metrics", f"Could not start the metrics endpoint: {str(e)}")
+                self.metrics_server = None
+        self.setup_diagnostics_frame()
+        self.probe_engine = ProbeEngine()
+        self.targets = load_targets(configparser.ConfigParser(), default_ping=PING_HOST)
+        self.throughput_client = None
+        self.dns_bench = None
+        self.detector = AnomalyDetector()
+
+        # جدولة ثابتة المعدل، لكل تشغيل خيطه، بدلاً من سلسلة Timer
+        self.scheduler = Scheduler()
         self.auto_test_running = False
-        self.auto_test_timer = None
 
         # إضافة عناصر واجهة المستخدم الجديدة
         self.auto_test_frame = ttk.Frame(self.results_frame)
@@ -69,15 +127,39 @@ class NetworkPerformanceTool:
         self.auto_test_button = ttk.Button(self.auto_test_frame, text="Start Auto Test", command=self.toggle_auto_test)
         self.auto_test_button.pack(side=tk.LEFT, padx=5)
 
+        # تحليل المسار (MTR) يعمل في حلقة asyncio خاصة مثل وضع أخذ العينات
+        self.path_loop = None
+        self.path_stop = None
+
+        # وضع أخذ العينات المستمر لقياس زمن الاستجابة بدقة عالية
+        self.sampling_loop = None
+        self.sampling_stop = None
+
+        self.sampling_frame = ttk.Frame(self.results_frame)
+        self.sampling_frame.pack(pady=5)
+
+        self.sampling_label = ttk.Label(self.sampling_frame, text="Sampling Rate (probes/s):")
+        self.sampling_label.pack(side=tk.LEFT)
+
+        self.sampling_entry = ttk.Entry(self.sampling_frame, width=5)
+        self.sampling_entry.insert(0, "100")
+        self.sampling_entry.pack(side=tk.LEFT, padx=5)
+
+        self.sampling_button = ttk.Button(self.sampling_frame, text="Start Sampling", command=self.toggle_sampling)
+        self.sampling_button.pack(side=tk.LEFT, padx=5)
+
         self.setup_menu()
         self.load_settings()
+        self.reload_graphs()
+        self.master.after(AGENT_REFRESH_MS, self.refresh_agent_graphs)
+        self.master.after(DIAGNOSTICS_REFRESH_MS, self.refresh_diagnostics)
 
     def setup_results_frame(self):
         self.output_text = tk.Text(self.results_frame, height=25, width=80)
         self.output_text.pack(padx=10, pady=10)
 
         self.server_var = tk.StringVar(value='Default')
-        server_menu = ttk.OptionMenu(self.results_frame, self.server_var, 'Default', *SPEED_TEST_SERVERS.keys())
+        server_menu = ttk.OptionMenu(self.results_frame, self.server_var, 'Default', *SPEED_TEST_CHOICES)
         server_menu.pack(pady=5)
 
         self.run_button = ttk.Button(self.results_frame, text="Run Tests", command=self.run_tests)
@@ -92,14 +174,224 @@ class NetworkPerformanceTool:
         self.progress_bar = ttk.Progressbar(self.results_frame, length=300, mode='determinate')
         self.progress_bar.pack(pady=10)
 
+        # نطاق زمني اختياري لعمليات التصدير
+        self.export_frame = ttk.Frame(self.results_frame)
+        self.export_frame.pack(pady=5)
+        ttk.Label(self.export_frame, text="Export From:").pack(side=tk.LEFT)
+        self.export_from_entry = ttk.Entry(self.export_frame, width=19)
+        self.export_from_entry.pack(side=tk.LEFT, padx=5)
+        ttk.Label(self.export_frame, text="To:").pack(side=tk.LEFT)
+        self.export_to_entry = ttk.Entry(self.export_frame, width=19)
+        self.export_to_entry.pack(side=tk.LEFT, padx=5)
+        self.export_since_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(self.export_frame, text="Only new since last export",
+                        variable=self.export_since_var).pack(side=tk.LEFT, padx=5)
+
     def setup_graph_frame(self):
-        self.figure = Figure(figsize=(8, 8))
-        self.ax1 = self.figure.add_subplot(211)
-        self.ax2 = self.figure.add_subplot(212)
-        
+        controls = ttk.Frame(self.graph_frame)
+        controls.pack(side=tk.TOP, fill=tk.X)
+        ttk.Label(controls, text="Time Window:").pack(side=tk.LEFT)
+        self.graph_window_var = tk.StringVar(value='All')
+        ttk.OptionMenu(controls, self.graph_window_var, 'All', *GRAPH_WINDOWS.keys(),
+                       command=self.set_graph_window).pack(side=tk.LEFT, padx=5)
+        ttk.Label(controls, text="Agent:").pack(side=tk.LEFT, padx=(10, 0))
+        self.graph_agent_var = tk.StringVar(value=LOCAL_AGENT)
+        self.agent_box = ttk.Combobox(controls, textvariable=self.graph_agent_var, values=[LOCAL_AGENT],
+                                      state='readonly', width=20, postcommand=self.refresh_agent_list)
+        self.agent_box.bind('<<ComboboxSelected>>', lambda event: self.reload_graphs())
+        self.agent_box.pack(side=tk.LEFT, padx=5)
+
+        self.figure = Figure(figsize=(8, 13))
+        self.ax1 = self.figure.add_subplot(411)
+        self.ax2 = self.figure.add_subplot(412)
+        self.ax3 = self.figure.add_subplot(413)
+        self.ax4 = self.figure.add_subplot(414)
+
         self.canvas = FigureCanvasTkAgg(self.figure, master=self.graph_frame)
+
+        # كل سلسلة تملك خطاً واحداً يعاد استخدامه، والرسم يتم بالـ blitting
+        self.ping_plot = LivePlot(self.canvas, self.ax1)
+        for name, fmt, label in PING_SERIES:
+            self.ping_plot.add_series(name, fmt, label)
+        self.ax1.set_ylabel('Ping Time (ms)')
+        self.ax1.set_title('Ping Time History')
+        self.ax1.legend(loc='upper left')
+        self.ax1.tick_params(axis='x', rotation=45)
+
+        self.speed_plot = LivePlot(self.canvas, self.ax2)
+        for name, fmt, label in SPEED_SERIES:
+            self.speed_plot.add_series(name, fmt, label)
+        self.ax2.set_ylabel('Speed (Mbps)')
+        self.ax2.set_title('Internet Speed History')
+        self.ax2.legend(loc='upper left')
+        self.ax2.tick_params(axis='x', rotation=45)
+
+        # سلسلة لكل خادم DNS تضاف عند ظهوره لأول مرة
+        self.dns_plot = LivePlot(self.canvas, self.ax3)
+        self.ax3.set_ylabel('DNS p50 (ms)')
+        self.ax3.set_title('DNS Resolver Latency History')
+        self.ax3.tick_params(axis='x', rotation=45)
+
+        # سلسلتان لكل رابط HTTP: اتصال جديد واتصال معاد استخدامه
+        self.http_plot = LivePlot(self.canvas, self.ax4)
+        self.ax4.set_ylabel('Request Time (ms)')
+        self.ax4.set_title('HTTP Request Time History')
+        self.ax4.tick_params(axis='x', rotation=45)
+        self.plots = (self.ping_plot, self.speed_plot, self.dns_plot, self.http_plot)
+
+        self.figure.tight_layout()
         self.canvas.draw()
         self.canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
+        NavigationToolbar2Tk(self.canvas, self.graph_frame)
+
+    def setup_path_frame(self):
+        controls = ttk.Frame(self.path_frame)
+        controls.pack(side=tk.TOP, fill=tk.X, padx=10, pady=5)
+        ttk.Label(controls, text="Destination:").pack(side=tk.LEFT)
+        self.path_entry = ttk.Entry(controls, width=30)
+        self.path_entry.pack(side=tk.LEFT, padx=5)
+        self.path_button = ttk.Button(controls, text="Start Path Analysis", command=self.toggle_path_analysis)
+        self.path_button.pack(side=tk.LEFT, padx=5)
+
+        self.path_tree = ttk.Treeview(self.path_frame, columns=[name for name, _ in PATH_COLUMNS])
+        self.path_tree.heading('#0', text='Hop')
+        self.path_tree.column('#0', width=50, anchor=tk.E)
+        for name, title in PATH_COLUMNS:
+            self.path_tree.heading(name, text=title)
+            self.path_tree.column(name, width=140 if name == 'address' else 70,
+                                  anchor=tk.W if name == 'address' else tk.E)
+        self.path_tree.pack(side=tk.TOP, fill=tk.BOTH, expand=1, padx=10, pady=5)
+        self.path_label = ttk.Label(self.path_frame, text="", wraplength=850)
+        self.path_label.pack(side=tk.TOP, anchor=tk.W, padx=10, pady=5)
+
+    def toggle_path_analysis(self):
+        if self.path_loop:
+            self.stop_path_analysis()
+        else:
+            self.start_path_analysis()
+
+    def start_path_analysis(self):
+        config = configparser.ConfigParser()
+        config.read('settings.ini')
+        host = self.path_entry.get().strip() or network_core.path_target(config, self.targets)
+        try:
+            analyzer = PathAnalyzer.from_config(config, host)
+        except ValueError as e:
+            tk.messagebox.showerror("Error", str(e))
+            return
+        report_interval = config.getfloat('Path', 'report_interval', fallback=DEFAULT_REPORT_INTERVAL)
+
+        loop = asyncio.new_event_loop()
+        self.path_loop = loop
+        self.path_stop = asyncio.Event()
+        self.path_button.config(text="Stop Path Analysis")
+        last_report = [time.monotonic()]
+
+        def on_round(snapshot):
+            self.master.after(0, self.show_path, snapshot)
+            # ملخص لكل قفزة يحفظ في السجل كل report_interval ثانية
+            if time.monotonic() - last_report[0] >= report_interval:
+                last_report[0] = time.monotonic()
+                self.deliver_results({'timestamp': snapshot['timestamp'], 'path': snapshot})
+
+        def run():
+            try:
+                loop.run_until_complete(analyzer.run(on_round, self.path_stop))
+                snapshot = analyzer.snapshot()
+                if snapshot['hops']:
+                    self.master.after(0, self.show_path, snapshot)
+                    self.deliver_results({'timestamp': snapshot['timestamp'], 'path': snapshot})
+            except Exception as e:
+                self.master.after(0, tk.messagebox.showerror, "Error", f"Path analysis stopped: {str(e)}")
+            finally:
+                loop.close()
+                self.master.after(0, self.path_finished)
+
+        Thread(target=run, daemon=True).start()
+
+    def stop_path_analysis(self):
+        if self.path_loop:
+            self.path_loop.call_soon_threadsafe(self.path_stop.set)
+
+    def path_finished(self):
+        self.path_loop = None
+        self.path_stop = None
+        self.path_button.config(text="Start Path Analysis")
+
+    def show_path(self, path):
+        self.path_tree.delete(*self.path_tree.get_children())
+        for hop in path['hops']:
+            values = []
+            for name, _ in PATH_COLUMNS:
+                value = hop[name]
+                if name == 'address':
+                    value = (value or '???') + (" !unreachable" if hop['unreachable'] else "")
+                elif isinstance(value, float):
+                    value = f"{value:.1f}" if name == 'loss' else f"{value:.2f}"
+                elif value is None:
+                    value = '-'
+                values.append(value)
+            self.path_tree.insert('', tk.END, text=str(hop['hop']), values=values)
+        self.path_label.config(text=f"{path['target']} ({path['address']}) via {path['method']}, "
+                                    f"{path['rounds']} rounds. " + network_core.interpret_path(path))
+
+    def setup_diagnostics_frame(self):
+        controls = ttk.Frame(self.diagnostics_frame)
+        controls.pack(side=tk.TOP, fill=tk.X, padx=10, pady=5)
+        self.timing_var = tk.BooleanVar(value=INSTRUMENTS.enabled)
+        ttk.Checkbutton(controls, text="Record stage timings", variable=self.timing_var,
+                        command=self.toggle_timing).pack(side=tk.LEFT)
+        ttk.Button(controls, text="Reset", command=INSTRUMENTS.reset).pack(side=tk.LEFT, padx=5)
+        self.profile_button = ttk.Button(controls, text="Start Profiler", command=self.toggle_profiler)
+        self.profile_button.pack(side=tk.LEFT, padx=5)
+
+        if self.metrics_server is not None:
+            endpoint = f"Metrics endpoint: {self.metrics_server.url}"
+        else:
+            endpoint = "Metrics endpoint disabled (set [Diagnostics] metrics_port)"
+        ttk.Label(self.diagnostics_frame, text=endpoint).pack(side=tk.TOP, anchor=tk.W, padx=10)
+
+        self.timing_tree = ttk.Treeview(self.diagnostics_frame, columns=[name for name, _ in TIMING_COLUMNS])
+        self.timing_tree.heading('#0', text='Stage')
+        for name, title in TIMING_COLUMNS:
+            self.timing_tree.heading(name, text=title)
+            self.timing_tree.column(name, width=90, anchor=tk.E)
+        self.timing_tree.pack(side=tk.TOP, fill=tk.BOTH, expand=1, padx=10, pady=10)
+
+    def toggle_timing(self):
+        INSTRUMENTS.enabled = self.timing_var.get()
+
+    def refresh_diagnostics(self):
+        # نحدث الجدول فقط والتبويب ظاهر
+        if self.notebook.select() == str(self.diagnostics_frame):
+            self.timing_tree.delete(*self.timing_tree.get_children())
+            for row in INSTRUMENTS.snapshot():
+                values = [row['count']] + [f"{row[name]:.2f}" for name, _ in TIMING_COLUMNS[1:]]
+                self.timing_tree.insert('', tk.END, text=row['stage'], values=values)
+        self.master.after(DIAGNOSTICS_REFRESH_MS, self.refresh_diagnostics)
+
+    def toggle_profiler(self):
+        if not self.profiler.running:
+            self.profiler.samples.clear()
+            self.profiler.start()
+            self.profile_button.config(text="Stop Profiler")
+            return
+        self.profiler.stop()
+        self.profile_button.config(text="Start Profiler")
+        file_path = filedialog.asksaveasfilename(defaultextension=".folded",
+                                                 filetypes=[("Folded stacks", "*.folded"), ("Text files", "*.txt")])
+        if file_path:
+            samples = self.profiler.dump(file_path)
+            tk.messagebox.showinfo("Profile Saved", f"Saved {samples} samples to {file_path}")
+
+    def metrics_gauges(self):
+        # يستدعى من خيط خادم المقاييس عند كل طلب
+        gauges = {'store_rows': len(self.store), 'history_entries': len(self.history),
+                  'scheduled_jobs': len(self.scheduler.jobs)}
+        if self.collector is not None:
+            for name, value in self.collector.stats().items():
+                gauges[f'collector_{name}'] = value
+        return gauges
 
     def toggle_auto_test(self):
         if self.auto_test_running:
@@ -120,186 +412,386 @@ class NetworkPerformanceTool:
             tk.messagebox.showerror("Error", str(e))
             return
 
+        config = configparser.ConfigParser()
+        config.read('settings.ini')
+        try:
+            schedule = network_core.load_schedule(config, interval)
+            server = self.server_var.get()
+            network_core.add_test_jobs(self.scheduler, self.probe_engine, self.targets, schedule,
+                                       speed=lambda: self.speed_test(server), callback=self.deliver_results,
+                                       dns_bench=self.dns_bench)
+        except ValueError as e:
+            self.scheduler.clear()
+            tk.messagebox.showerror("Error", f"Invalid [Schedule] settings: {e}")
+            return
+
         self.auto_test_running = True
         self.auto_test_button.config(text="Stop Auto Test")
-        self.run_tests()
-        self.schedule_next_test(interval)
 
     def stop_auto_test(self):
         self.auto_test_running = False
         self.auto_test_button.config(text="Start Auto Test")
-        if self.auto_test_timer:
-            self.auto_test_timer.cancel()
+        self.scheduler.clear()
 
-    def schedule_next_test(self, interval):
-        if self.auto_test_running:
-            self.auto_test_timer = threading.Timer(interval, self.run_auto_test)
-            self.auto_test_timer.start()
+    def toggle_sampling(self):
+        if self.sampling_loop:
+            self.stop_sampling()
+        else:
+            self.start_sampling()
 
-    def run_auto_test(self):
-        self.run_tests()
+    def start_sampling(self):
+        host = next((t['host'] for t in self.targets if t['type'] == 'ping'), PING_HOST)
         try:
-            interval = float(self.interval_entry.get())
-            if interval < 1:
-                raise ValueError("Interval must be at least 1 second.")
-            if interval < 10:
-                self.warning_label.config(text="Warning: Short intervals may affect network performance.")
-            else:
-                self.warning_label.config(text="")
-            self.schedule_next_test(interval)
+            sampler = LatencySampler(host, rate=float(self.sampling_entry.get()),
+                                     prober=self.probe_engine.prober)
         except ValueError as e:
-            self.stop_auto_test()
-            tk.messagebox.showerror("Error", str(e) + " Auto test stopped.")
+            tk.messagebox.showerror("Error", str(e))
+            return
+
+        loop = asyncio.new_event_loop()
+        self.sampling_loop = loop
+        self.sampling_stop = asyncio.Event()
+        self.sampling_button.config(text="Stop Sampling")
+
+        def on_window(summary):
+            self.master.after(0, self.add_latency_window, summary)
+
+        def run():
+            try:
+                loop.run_until_complete(sampler.run(on_window, self.sampling_stop))
+            except Exception as e:
+                self.master.after(0, tk.messagebox.showerror, "Error", f"Sampling stopped: {str(e)}")
+            finally:
+                loop.close()
+                self.master.after(0, self.sampling_finished)
+
+        Thread(target=run, daemon=True).start()
+
+    def stop_sampling(self):
+        if self.sampling_loop:
+            self.sampling_loop.call_soon_threadsafe(self.sampling_stop.set)
+
+    def sampling_finished(self):
+        self.sampling_loop = None
+        self.sampling_stop = None
+        self.sampling_button.config(text="Start Sampling")
+
+    def add_latency_window(self, summary):
+        entry = {'timestamp': summary['timestamp'], 'latency': summary}
+        self.history.append(entry)
+        self.store.append_result(entry)
+        self.rollups.update()
+        self.plot_result(entry)
+        self.update_graphs()
+        self.check_for_notifications(entry)
+
+    def restore_history(self):
+        rows = self.store.latest_records(self.history.maxlen)
+        self.history.extend(history_entry(record) for record in self.store.records(rows))
+
+    def import_results(self):
+        file_paths = filedialog.askopenfilenames(filetypes=[("Results", "*.csv *.json *.jsonl *.xlsx"),
+                                                            ("CSV files", "*.csv"),
+                                                            ("JSON files", "*.json *.jsonl"),
+                                                            ("Excel files", "*.xlsx")])
+        if not file_paths:
+            return
+        config = configparser.ConfigParser()
+        config.read('settings.ini')
+
+        def progress(done, total):
+            self.master.after(0, self.update_progress, done * 100 / total)
+
+        try:
+            importer = Importer.from_config(config, self.store, file_paths, progress=progress)
+        except ValueError as e:
+            tk.messagebox.showerror("Import Failed", str(e))
+            return
+
+        def run():
+            try:
+                with INSTRUMENTS.stage('import'):
+                    stats = importer.run()
+                    if stats['imported']:
+                        # الصفوف المستوردة قد تسبق الدلاء المختومة
+                        self.rollups.backfill(stats['start'], stats['end'])
+            except Exception as e:
+                self.master.after(0, tk.messagebox.showerror, "Import Failed", str(e))
+                return
+            self.master.after(0, imported, stats)
+
+        def imported(stats):
+            if stats['imported']:
+                self.history.clear()
+                self.restore_history()
+                self.reload_graphs()
+            message = (f"Imported {stats['imported']} measurements from {stats['files']} file(s), "
+                       f"skipped {stats['duplicates']} already stored.")
+            if stats['errors']:
+                message += "\n\n" + "\n".join(f"{path}: {error}" for path, error in stats['errors'])
+                tk.messagebox.showwarning("Import Finished With Errors", message)
+            else:
+                tk.messagebox.showinfo("Import Successful", message)
+
+        # الاستيراد يعمل في خيط منفصل حتى لا تتجمد الواجهة
+        self.progress_bar['value'] = 0
+        Thread(target=run, daemon=True).start()
 
     def run_tests(self):
         self.run_button.config(state='disabled')
         self.output_text.delete(1.0, tk.END)
         self.progress_bar['value'] = 0
-        
-        def run():
-            results = self.perform_tests()
-            self.history.append(results)
-            self.master.after(0, self.update_output, results)
-            self.master.after(0, self.update_graphs)
-            self.check_for_notifications(results)
-        
-        Thread(target=run).start()
+        server = self.server_var.get()
+
+        def finished(results):
+            self.deliver_results(results)
+            self.master.after(0, lambda: self.run_button.config(state='normal'))
+
+        if not self.scheduler.run_once('tests', lambda: self.perform_tests(server), finished):
+            self.run_button.config(state='normal')
+
+    def deliver_results(self, results):
+        # يستدعى من خيط العامل: كل تحديثات الواجهة تمر عبر master.after
+        self.master.after(0, self.record_results, results)
+        self.check_for_notifications(results)
+
+    def record_results(self, results):
+        self.history.append(results)
+        with INSTRUMENTS.stage('store.append'):
+            self.store.append_result(results)
+        with INSTRUMENTS.stage('rollups.update'):
+            self.rollups.update()
+        self.update_output(results)
+
+    def latest_results(self):
+        """Most recent result of every test type, merged into one entry."""
+        latest = {}
+        probes = {}
+        timings = {}
+        for result in reversed(self.history):
+            for key in ('timestamp', 'ping', 'latency', 'dns', 'speed', 'dns_benchmark', 'path'):
+                if key in result and key not in latest:
+                    latest[key] = result[key]
+            for probe in result.get('probes', ()):
+                probes.setdefault((probe['type'], probe['target']), probe)
+            for stage, value in result.get('timings', {}).items():
+                timings.setdefault(stage, value)
+        if probes:
+            latest['probes'] = list(probes.values())
+        if timings:
+            latest['timings'] = timings
+        return latest
 
     def update_output(self, results):
-        self.output_text.insert(tk.END, f"Test Time: {results['timestamp']}\n\n")
-        self.output_text.insert(tk.END, "Ping Test Results:\n")
-        self.output_text.insert(tk.END, results['ping']['output'] + "\n")
-        self.output_text.insert(tk.END, self.interpret_ping(results['ping']) + "\n\n")
-
-        self.output_text.insert(tk.END, "DNS Lookup Results:\n")
-        self.output_text.insert(tk.END, results['dns']['output'] + "\n")
-        self.output_text.insert(tk.END, self.interpret_dns(results['dns']) + "\n\n")
-
-        self.output_text.insert(tk.END, "Speed Test Results:\n")
-        self.output_text.insert(tk.END, f"Download Speed: {results['speed']['download']:.2f} Mbps\n")
-        self.output_text.insert(tk.END, f"Upload Speed: {results['speed']['upload']:.2f} Mbps\n")
-        self.output_text.insert(tk.END, f"Ping: {results['speed']['ping']:.2f} ms\n")
-        self.output_text.insert(tk.END, self.interpret_speed(results['speed']) + "\n")
-
-        self.run_button.config(state='normal')
+        self.output_text.delete(1.0, tk.END)
+        self.output_text.insert(tk.END, network_core.format_results(self.latest_results()))
+        self.plot_result(results)
         self.update_graphs()
 
     def update_progress(self, value):
         self.progress_bar['value'] = value
 
     def ping(self, host):
-        param = '-n' if platform.system().lower() == 'windows' else '-c'
-        command = f"ping {param} 4 {host}"
-        try:
-            result = subprocess.run(command, stdout=subprocess.PIPE, shell=True, text=True)
-            output = result.stdout
-            avg_time = float(output.split('Average = ')[-1].split('ms')[0])
-            return {'output': output, 'avg_time': avg_time}
-        except Exception as e:
-            return {'output': f"Error during ping test: {str(e)}", 'avg_time': None}
+        return network_core.ping(self.probe_engine, host)
 
     def dns_lookup(self, domain):
-        try:
-            ip = socket.gethostbyname(domain)
-            return {'output': f"IP address of {domain}: {ip}", 'success': True}
-        except Exception as e:
-            return {'output': f"Error during DNS lookup: {str(e)}", 'success': False}
+        return network_core.dns_lookup(domain)
 
-    def speed_test(self):
-        try:
-            st = speedtest.Speedtest()
-            server_id = SPEED_TEST_SERVERS[self.server_var.get()]
-            if server_id:
-                st.get_servers([server_id])
-            else:
-                st.get_best_server()
-            download_speed = st.download() / 1_000_000
-            upload_speed = st.upload() / 1_000_000
-            ping = st.results.ping
-            return {'download': download_speed, 'upload': upload_speed, 'ping': ping}
-        except Exception as e:
-            return {'download': 0, 'upload': 0, 'ping': 0, 'error': str(e)}
+    def speed_test(self, server='Default'):
+        return network_core.speed_test(server, self.throughput_client)
 
     def interpret_ping(self, result):
-        if result['avg_time'] is not None:
-            if result['avg_time'] < 50:
-                return "Interpretation: Excellent ping time."
-            elif result['avg_time'] < 100:
-                return "Interpretation: Good ping time for most applications."
-            else:
-                return "Interpretation: High ping time might affect real-time applications."
-        else:
-            return "Interpretation: Unable to determine ping time."
+        return network_core.interpret_ping(result)
+
+    def interpret_latency(self, latency):
+        return network_core.interpret_latency(latency)
 
     def interpret_dns(self, result):
-        if result['success']:
-            return "Interpretation: DNS lookup successful. Your DNS is working correctly."
-        else:
-            return "Interpretation: DNS lookup failed. There might be an issue with your DNS server or internet connection."
+        return network_core.interpret_dns(result)
 
     def interpret_speed(self, result):
-        if 'error' in result:
-            return f"Interpretation: Speed test failed. Error: {result['error']}"
-        else:
-            if result['download'] > 100 and result['upload'] > 50:
-                return "Interpretation: Excellent internet speed."
-            elif result['download'] > 25 and result['upload'] > 10:
-                return "Interpretation: Good internet speed for most applications."
-            else:
-                return "Interpretation: Your internet speed might be insufficient for some applications."
+        return network_core.interpret_speed(result)
 
     def save_results(self):
         file_path = filedialog.asksaveasfilename(defaultextension=".csv",
                                                  filetypes=[("CSV files", "*.csv")])
         if file_path:
-            with open(file_path, 'w', newline='') as csvfile:
-                writer = csv.writer(csvfile)
-                writer.writerow(['Timestamp', 'Ping (ms)', 'DNS Lookup', 'Download Speed (Mbps)', 'Upload Speed (Mbps)', 'Speedtest Ping (ms)'])
-                for result in self.history:
-                    writer.writerow([
-                        result['timestamp'],
-                        result['ping']['avg_time'],
-                        'Success' if result['dns']['success'] else 'Failure',
-                        result['speed']['download'],
-                        result['speed']['upload'],
-                        result['speed']['ping']
-                    ])
-            tk.messagebox.showinfo("Save Successful", f"Results saved to {file_path}")
-
-    def update_graphs(self):
-        if len(self.history) < 2:  # نحتاج على الأقل نقطتين لرسم خط
-            return
-
-        self.ax1.clear()
-        self.ax2.clear()
+            self.start_export(CsvExporter, file_path, "Results saved to")
 
-        timestamps = [result['timestamp'] for result in self.history]
-        ping_times = [result['ping']['avg_time'] for result in self.history if result['ping']['avg_time'] is not None]
-        download_speeds = [result['speed']['download'] for result in self.history]
-        upload_speeds = [result['speed']['upload'] for result in self.history]
+    def export_options(self):
+        try:
+            start = self.export_from_entry.get().strip() or None
+            end = self.export_to_entry.get().strip() or None
+            options = {'start': start and to_micros(start), 'end': end and to_micros(end),
+                       'since_last': self.export_since_var.get()}
+        except ValueError:
+            raise ValueError("Export range must use the format YYYY-MM-DD HH:MM:SS.")
+        return options
+
+    def start_export(self, exporter_class, file_path, message, **kwargs):
+        try:
+            kwargs.update(self.export_options())
+        except ValueError as e:
+            tk.messagebox.showerror("Error", str(e))
+            return
 
-        if ping_times:
-            self.ax1.plot(timestamps, ping_times, 'b-', label='Ping Time')
-            self.ax1.set_ylabel('Ping Time (ms)')
-            self.ax1.set_title('Ping Time History')
-            self.ax1.legend()
-            self.ax1.tick_params(axis='x', rotation=45)
+        def progress(done, total):
+            self.master.after(0, self.update_progress, done * 100 / total)
 
-        self.ax2.plot(timestamps, download_speeds, 'g-', label='Download')
-        self.ax2.plot(timestamps, upload_speeds, 'r-', label='Upload')
-        self.ax2.set_ylabel('Speed (Mbps)')
-        self.ax2.set_title('Internet Speed History')
-        self.ax2.legend()
-        self.ax2.tick_params(axis='x', rotation=45)
+        stage = f"export.{exporter_class.__name__.replace('Exporter', '').lower()}"
 
-        self.figure.tight_layout()
-        self.canvas.draw()
+        def run():
+            try:
+                with INSTRUMENTS.stage(stage):
+                    exported = exporter_class(self.store, file_path, progress=progress, **kwargs).run()
+            except Exception as e:
+                self.master.after(0, tk.messagebox.showerror, "Export Failed", str(e))
+                return
+            self.master.after(0, tk.messagebox.showinfo, "Export Successful",
+                              f"{message} {file_path} ({exported} records)")
+
+        # التصدير يعمل في خيط منفصل حتى لا تتجمد الواجهة
+        self.progress_bar['value'] = 0
+        Thread(target=run, daemon=True).start()
+
+    def graph_points(self, result):
+        ping = {}
+        latency = result.get('latency')
+        if latency:
+            ping = {name: latency.get(name) for name, _, _ in PING_SERIES}
+        elif result.get('ping'):
+            ping = {'p50': result['ping']['avg_time']}
+        speed = {}
+        if 'speed' in result:
+            speed = {name: result['speed'][name] for name, _, _ in SPEED_SERIES}
+        dns = {}
+        for entry in result.get('dns_benchmark', ()):
+            for phase in ('cold', 'warm'):
+                dns[f"{entry['resolver']} {phase}"] = entry[phase].get('p50')
+        http = {}
+        for probe in result.get('probes', ()):
+            if probe['type'] == 'http':
+                http[f"{probe['target']} cold"] = probe['latency']
+                http[f"{probe['target']} warm"] = probe.get('warm_total')
+        return ping, speed, dns, http
+
+    @staticmethod
+    def add_phase_series(plot, names):
+        for name in names:
+            plot.ensure_series(name, '-' if name.endswith(' cold') else '--', name)
+
+    def plot_result(self, result):
+        if self.graph_agent_var.get() != LOCAL_AGENT:
+            return
+        x = mdates.date2num(datetime.strptime(result['timestamp'], "%Y-%m-%d %H:%M:%S"))
+        points = self.graph_points(result)
+        self.add_phase_series(self.dns_plot, points[2])
+        self.add_phase_series(self.http_plot, points[3])
+        for plot, values in zip(self.plots, points):
+            for name, value in values.items():
+                plot.append(name, x, value)
+
+    def graph_series(self):
+        """``(plot, series, target, metric)`` for everything the graphs draw."""
+        agent = self.graph_agent_var.get()
+        if agent == LOCAL_AGENT:
+            host = next((t['host'] for t in self.targets if t['type'] == 'ping'), PING_HOST)
+            resolvers = self.dns_bench.resolvers if self.dns_bench else []
+            urls = [t['url'] for t in self.targets if t['type'] == 'http']
+
+            def stored(target):
+                return target
+        else:
+            # أهداف الوكيل تحفظ في المخزن باسم "الوكيل/الهدف"
+            info = load_agents(self.store.path).get(agent, {})
+            host = info.get('ping') or PING_HOST
+            resolvers = info.get('resolvers', [])
+            urls = info.get('http', [])
+
+            def stored(target):
+                return agent_target(agent, target)
+        for index, name, metric in GRAPH_METRICS:
+            yield self.plots[index], name, stored(host if index == 0 else 'speedtest'), metric
+        for resolver in resolvers:
+            for phase in ('cold', 'warm'):
+                yield self.dns_plot, f"{resolver} {phase}", stored(resolver), f'dnsbench.{phase}.p50'
+        for url in urls:
+            yield self.http_plot, f"{url} cold", stored(url), 'http.latency'
+            yield self.http_plot, f"{url} warm", stored(url), 'http.warm_total'
+
+    def refresh_agent_list(self):
+        self.agent_box['values'] = [LOCAL_AGENT] + sorted(load_agents(self.store.path))
+
+    def refresh_agent_graphs(self):
+        # نتائج الوكلاء تصل عبر المجمّع لا عبر record_results، فنعيد تحميلها دورياً
+        if self.graph_agent_var.get() != LOCAL_AGENT:
+            self.rollups.update()
+            self.reload_graphs()
+        self.master.after(AGENT_REFRESH_MS, self.refresh_agent_graphs)
+
+    def start_collector(self, collector):
+        loop = asyncio.new_event_loop()
+        Thread(target=loop.run_forever, name='collector', daemon=True).start()
+        try:
+            asyncio.run_coroutine_threadsafe(collector.start(), loop).result()
+        except OSError as e:
+            loop.call_soon_threadsafe(loop.stop)
+            tk.messagebox.showerror("Collector", f"Could not start the collector: {str(e)}")
+            return
+        self.collector = collector
+        self.collector_loop = loop
+
+    def stop_collector(self):
+        if self.collector is not None:
+            asyncio.run_coroutine_threadsafe(self.collector.close(), self.collector_loop).result()
+            self.collector_loop.call_soon_threadsafe(self.collector_loop.stop)
+            self.collector = None
+
+    def reload_graphs(self):
+        with INSTRUMENTS.stage('graph.reload'):
+            self._reload_graphs()
+
+    def _reload_graphs(self):
+        for plot in self.plots:
+            plot.clear()
+        days = GRAPH_WINDOWS[self.graph_window_var.get()]
+        end = to_micros(datetime.now().timestamp())
+        start = end - int(days * DAY) if days else None
+        series = {}
+        for plot, name, target, metric in self.graph_series():
+            # أدق دقة تتسع في عدد النقاط: صفوف خام لساعة، ملخصات يومية لأشهر
+            _, buckets = self.rollups.series(start, end, target, metric)
+            if len(buckets):
+                xs, ys = series.setdefault((plot, name), ([], []))
+                xs.append(buckets['start'])
+                ys.append(buckets['mean'])
+        self.add_phase_series(self.dns_plot, [name for plot, name in series if plot is self.dns_plot])
+        self.add_phase_series(self.http_plot, [name for plot, name in series if plot is self.http_plot])
+        for (plot, name), (xs, ys) in series.items():
+            xs, ys = np.concatenate(xs), np.concatenate(ys)
+            order = np.argsort(xs, kind='stable')
+            local = (xs[order] + self.rollups.offset).astype('datetime64[us]')
+            plot.extend(name, mdates.date2num(local), ys[order])
+        self.update_graphs(force=True)
+
+    def set_graph_window(self, choice):
+        self.reload_graphs()
+        for plot in self.plots:
+            plot.set_window(GRAPH_WINDOWS[choice])
+
+    def update_graphs(self, force=False):
+        # يرسم النقاط الجديدة فقط؛ إعادة الرسم الكامل عند تغير حدود المحاور
+        with INSTRUMENTS.stage('graph.redraw'):
+            for plot in self.plots:
+                plot.refresh(force)
 
     def save_pdf_report(self):
         file_path = filedialog.asksaveasfilename(defaultextension=".pdf",
                                                  filetypes=[("PDF files", "*.pdf")])
         if file_path:
-            doc = SimpleDocTemplate(file_path, pagesize=letter)
+            from reportlab.platypus import Paragraph, Spacer
+            from reportlab.lib.styles import getSampleStyleSheet
+
             styles = getSampleStyleSheet()
             elements = []
 
@@ -308,24 +800,30 @@ class NetworkPerformanceTool:
             elements.append(Spacer(1, 12))
 
             # Add latest test results
-            if self.history:
-                latest_result = self.history[-1]
+            latest_result = self.latest_results()
+            if latest_result:
                 elements.append(Paragraph(f"Latest Test Results ({latest_result['timestamp']})", styles['Heading2']))
                 elements.append(Spacer(1, 6))
 
-                # Ping results
+            # Ping results
+            if 'ping' in latest_result:
                 elements.append(Paragraph("Ping Test Results:", styles['Heading3']))
                 elements.append(Paragraph(f"Average Ping Time: {latest_result['ping']['avg_time']} ms", styles['Normal']))
                 elements.append(Paragraph(self.interpret_ping(latest_result['ping']), styles['Normal']))
+            if latest_result.get('latency'):
+                for line in self.interpret_latency(latest_result['latency']).split("\n"):
+                    elements.append(Paragraph(line, styles['Normal']))
                 elements.append(Spacer(1, 6))
 
-                # DNS results
+            # DNS results
+            if 'dns' in latest_result:
                 elements.append(Paragraph("DNS Lookup Results:", styles['Heading3']))
                 elements.append(Paragraph(latest_result['dns']['output'], styles['Normal']))
                 elements.append(Paragraph(self.interpret_dns(latest_result['dns']), styles['Normal']))
                 elements.append(Spacer(1, 6))
 
-                # Speed test results
+            # Speed test results
+            if 'speed' in latest_result:
                 elements.append(Paragraph("Speed Test Results:", styles['Heading3']))
                 elements.append(Paragraph(f"Download Speed: {latest_result['speed']['download']:.2f} Mbps", styles['Normal']))
                 elements.append(Paragraph(f"Upload Speed: {latest_result['speed']['upload']:.2f} Mbps", styles['Normal']))
@@ -333,43 +831,20 @@ class NetworkPerformanceTool:
                 elements.append(Paragraph(self.interpret_speed(latest_result['speed']), styles['Normal']))
                 elements.append(Spacer(1, 12))
 
-            # Add history table
-            elements.append(Paragraph("Test History", styles['Heading2']))
-            elements.append(Spacer(1, 6))
-
-            data = [['Timestamp', 'Ping (ms)', 'DNS Lookup', 'Download (Mbps)', 'Upload (Mbps)', 'Speedtest Ping (ms)']]
-            for result in self.history:
-                data.append([
-                    result['timestamp'],
-                    f"{result['ping']['avg_time']:.2f}" if result['ping']['avg_time'] is not None else 'N/A',
-                    'Success' if result['dns']['success'] else 'Failure',
-                    f"{result['speed']['download']:.2f}",
-                    f"{result['speed']['upload']:.2f}",
-                    f"{result['speed']['ping']:.2f}"
-                ])
-
-            table = Table(data)
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 8),
-                ('TOPPADDING', (0, 1), (-1, -1), 6),
-                ('BOTTOMPADDING', (0, 1), (-1, -1), 6),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black)
-            ]))
-            elements.append(table)
-
-            # Build the PDF
-            doc.build(elements)
-            tk.messagebox.showinfo("Save Successful", f"PDF report saved to {file_path}")
+            # DNS resolver benchmark
+            if latest_result.get('dns_benchmark'):
+                elements.append(Paragraph("DNS Resolver Benchmark:", styles['Heading3']))
+                for entry in latest_result['dns_benchmark']:
+                    elements.append(Paragraph(
+                        f"{entry['resolver']}: cold p50 {network_core.format_ms(entry['cold'].get('p50'))}, "
+                        f"warm p50 {network_core.format_ms(entry['warm'].get('p50'))}, "
+                        f"timeouts {entry.get('timeouts', 0)}/{entry.get('queries', 0)}", styles['Normal']))
+                elements.append(Paragraph(network_core.interpret_dns_benchmark(latest_result['dns_benchmark']),
+                                          styles['Normal']))
+                elements.append(Spacer(1, 12))
+
+            self.start_export(PdfExporter, file_path, "PDF report saved to", intro=elements,
+                              rollups=self.rollups)
 
     def setup_menu(self):
         menubar = tk.Menu(self.master)
@@ -377,6 +852,7 @@ class NetworkPerformanceTool:
 
         file_menu = tk.Menu(menubar, tearoff=0)
         menubar.add_cascade(label="File", menu=file_menu)
+        file_menu.add_command(label="Import Results...", command=self.import_results)
         file_menu.add_command(label="Export to Excel", command=self.export_to_excel)
         file_menu.add_command(label="Export to JSON", command=self.export_to_json)
         file_menu.add_separator()
@@ -390,14 +866,36 @@ class NetworkPerformanceTool:
         config = configparser.ConfigParser()
         try:
             config.read('settings.ini')
-            interval = config.getint('Settings', 'interval', fallback=60)
-            self.interval_entry.delete(0, tk.END)
-            self.interval_entry.insert(0, str(interval))
-        except:
-            pass
+        except configparser.Error as e:
+            tk.messagebox.showerror("Settings", f"Could not read settings.ini; using the defaults.\n{e}")
+            return
+        errors = []
+
+        # كل قسم على حدة: قيمة خاطئة في قسم لا تترك الأقسام التالية على قيمها الافتراضية
+        def parse(sections, load, default):
+            try:
+                return load(config)
+            except (ValueError, configparser.Error) as e:
+                errors.append(f"{sections}: {e}")
+                return default
+
+        interval = parse('[Settings]', lambda config: config.getint('Settings', 'interval', fallback=60), 60)
+        self.interval_entry.delete(0, tk.END)
+        self.interval_entry.insert(0, str(interval))
+        self.probe_engine = parse('[Probes]/[HTTP]', ProbeEngine.from_config, self.probe_engine)
+        self.targets = parse('[Targets]', lambda config: load_targets(config, default_ping=PING_HOST), self.targets)
+        self.throughput_client = parse('[Throughput]', ThroughputClient.from_config, self.throughput_client)
+        self.dns_bench = parse('[DNS]', DnsBenchmark.from_config, self.dns_bench)
+        self.detector = parse('[Alerts]', AnomalyDetector.from_config, self.detector)
+        schedule = parse('[Schedule]', Scheduler.from_config, self.scheduler)
+        self.scheduler.overrun, self.scheduler.max_runs = schedule.overrun, schedule.max_runs
+        if errors:
+            tk.messagebox.showwarning("Settings", "These settings are invalid and were left at their defaults:\n"
+                                      + "\n".join(errors))
 
     def save_settings(self):
         config = configparser.ConfigParser()
+        config.read('settings.ini')  # نحافظ على الأقسام الأخرى مثل Targets
         config['Settings'] = {'interval': self.interval_entry.get()}
         with open('settings.ini', 'w') as configfile:
             config.write(configfile)
@@ -407,61 +905,39 @@ class NetworkPerformanceTool:
         file_path = filedialog.asksaveasfilename(defaultextension=".xlsx",
                                                  filetypes=[("Excel files", "*.xlsx")])
         if file_path:
-            wb = openpyxl.Workbook()
-            ws = wb.active
-            ws.append(['Timestamp', 'Ping (ms)', 'DNS Lookup', 'Download Speed (Mbps)', 'Upload Speed (Mbps)', 'Speedtest Ping (ms)'])
-            for result in self.history:
-                ws.append([
-                    result['timestamp'],
-                    result['ping']['avg_time'],
-                    'Success' if result['dns']['success'] else 'Failure',
-                    result['speed']['download'],
-                    result['speed']['upload'],
-                    result['speed']['ping']
-                ])
-            wb.save(file_path)
-            tk.messagebox.showinfo("Export Successful", f"Data exported to {file_path}")
+            self.start_export(ExcelExporter, file_path, "Data exported to")
 
     def export_to_json(self):
-        file_path = filedialog.asksaveasfilename(defaultextension=".json",
-                                                 filetypes=[("JSON files", "*.json")])
+        file_path = filedialog.asksaveasfilename(defaultextension=".jsonl",
+                                                 filetypes=[("JSON Lines files", "*.jsonl"), ("JSON files", "*.json")])
         if file_path:
-            with open(file_path, 'w') as f:
-                json.dump(self.history, f, indent=4)
-            tk.messagebox.showinfo("Export Successful", f"Data exported to {file_path}")
-
-    def perform_tests(self):
-        self.update_progress(20)
-        ping_result = self.ping(PING_HOST)
-        self.update_progress(40)
-        dns_result = self.dns_lookup('google.com')
-        self.update_progress(60)
-        speed_result = self.speed_test()
-        self.update_progress(100)
-        
-        return {
-            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            'ping': ping_result,
-            'dns': dns_result,
-            'speed': speed_result
-        }
+            self.start_export(JsonLinesExporter, file_path, "Data exported to")
+
+    def perform_tests(self, server='Default'):
+        return network_core.perform_tests(self.probe_engine, self.targets,
+                                          speed=lambda: self.speed_test(server),
+                                          progress=lambda value: self.master.after(0, self.update_progress, value),
+                                          dns_bench=self.dns_bench)
 
     def check_for_notifications(self, results):
-        # يمكنك تخصيص الشروط حسب احتياجاتك
-        if results['speed']['download'] < 5:  # إذا كانت سرعة التنزيل أقل من 5 Mbps
-            notification.notify(
-                title='Low Download Speed',
-                message=f"Download speed is {results['speed']['download']:.2f} Mbps",
-                app_name='Network Performance Tool'
-            )
-        if results['speed']['upload'] < 1:  # إذا كانت سرعة الرفع أقل من 1 Mbps
-            notification.notify(
-                title='Low Upload Speed',
-                message=f"Upload speed is {results['speed']['upload']:.2f} Mbps",
-                app_name='Network Performance Tool'
-            )
+        # كاشف تدفقي (EWMA/الوسيط/CUSUM) بدلاً من عتبة ثابتة لكل عينة منفردة
+        for event in self.detector.process(results):
+            if self.detector.should_notify(event):
+                from plyer import notification
+                notification.notify(
+                    title='Network Performance Alert',
+                    message=event['message'],
+                    app_name='Network Performance Tool'
+                )
 
 if __name__ == "__main__":
     root = tk.Tk()
     app = NetworkPerformanceTool(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    app.scheduler.stop()
+    app.stop_collector()
+    if app.metrics_server is not None:
+        app.metrics_server.close()
+    app.profiler.stop()
+    app.probe_engine.http.close()
+    app.store.close()
\ No newline at end of file
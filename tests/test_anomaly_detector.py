@@ -0,0 +1,28 @@
+import random
+import statistics
+
+from anomaly_detector import AnomalyDetector, MetricState
+
+
+def test_mad_is_taken_around_the_current_median():
+    state = MetricState(1, window=60)
+    rng = random.Random(1)
+    values = [10 + rng.random() for _ in range(60)] + [100 + rng.random() for _ in range(40)]
+    for value in values:
+        state.add(value)
+        window = values[:state.count][-60:]
+        median = statistics.median(window)
+        assert state.median() == median
+        assert state.mad() == statistics.median(abs(v - median) for v in window)
+
+
+def test_sustained_shift_alerts_once_and_a_spike_does_not():
+    detector = AnomalyDetector()
+    events = [detector.observe('8.8.8.8', 'ping.avg', 20.0 + i % 3) for i in range(30)]
+    assert detector.observe('8.8.8.8', 'ping.avg', 500.0) is None
+    events += [detector.observe('8.8.8.8', 'ping.avg', 20.0 + i % 3) for i in range(10)]
+    assert not any(events)
+    shifted = [detector.observe('8.8.8.8', 'ping.avg', 80.0) for _ in range(10)]
+    alerts = [event for event in shifted if event is not None]
+    assert len(alerts) == 1 and alerts[0]['kind'] == 'alert'
+    assert alerts[0]['baseline'] < 25
@@ -0,0 +1,120 @@
+import asyncio
+import socket
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import collector as collector_module
+from collector import Agent, Collector, agent_target, decode_batch, encode_batch, load_agents
+from result_store import ResultStore
+
+START = 1_700_000_000 * 1_000_000
+METRICS = ['ping.avg', 'ping.loss', 'dns.latency']
+TOKEN = 'secret'
+
+
+def rows_for(first, count):
+    return [(START + (first + i) // len(METRICS) * 1_000_000, '8.8.8.8', METRICS[(first + i) % len(METRICS)],
+             float(i)) for i in range(count)]
+
+
+@pytest.fixture
+def collector(tmp_path):
+    store = ResultStore(str(tmp_path / 'store'))
+    collector = Collector(store, '127.0.0.1', 0, token=TOKEN)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    asyncio.run_coroutine_threadsafe(collector.start(), loop).result()
+    yield collector
+    asyncio.run_coroutine_threadsafe(collector.close(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+    store.close()
+
+
+def wait_for(predicate, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_resent_batch_is_written_once(tmp_path):
+    store = ResultStore(str(tmp_path / 'store'))
+    collector = Collector(store, '127.0.0.1', 0)
+    collector.agents['site'] = {'session': None, 'seq': 0}
+    first = encode_batch(7, 1, rows_for(0, 30))
+    assert collector.ingest('site', first) == (7, 1)
+    assert collector.ingest('site', first) == (7, 1)
+    assert collector.stats()['duplicates'] == 1 and len(store) == 30
+
+    collector.ingest('site', encode_batch(7, 2, rows_for(30, 30)))
+    # وكيل أعيد تشغيله يبدأ جلسة جديدة من الرقم 1
+    collector.ingest('site', encode_batch(8, 1, rows_for(60, 30)))
+    assert collector.stats()['batches'] == 3 and len(store) == 90
+    assert len(store.query(target=agent_target('site', '8.8.8.8'))) == 90
+    store.close()
+
+
+def test_agents_deliver_every_row_once_across_a_dropped_connection(collector):
+    names = ['site-0', 'site-1', 'site-2']
+    agents = [Agent(name, '127.0.0.1', collector.port, batch_rows=200, flush_interval=0.05, token=TOKEN)
+              for name in names]
+    for agent in agents:
+        agent.start()
+    for first in range(0, 3000, 300):
+        for agent in agents:
+            agent.submit_rows(rows_for(first, 300))
+        if first == 1500:
+            for agent in agents:
+                wait_for(lambda: agent.sock is not None)
+                agent.sock.shutdown(socket.SHUT_RDWR)
+    for agent in agents:
+        agent.close(timeout=30)
+        assert agent.stats()['queued_rows'] == 0 and agent.stats()['unacked'] == 0
+
+    store = collector.store
+    stored = store.query()
+    assert len(stored) == len(np.unique(stored[['ts', 'target', 'metric']])) == 3 * 3000
+    for name in names:
+        assert len(store.query(target=agent_target(name, '8.8.8.8'))) == 3000
+    assert collector.stats()['errors'] == 0
+    collector.save_state()
+    assert set(load_agents(store.path)) == set(names)
+
+
+def test_bad_frame_is_counted_as_an_error(collector):
+    with socket.create_connection(('127.0.0.1', collector.port)) as sock:
+        sock.sendall(b'GET / HTTP/1.1\r\n\r\n')
+        sock.settimeout(5)
+        assert sock.recv(1) == b''
+    wait_for(lambda: collector.stats()['errors'] == 1)
+    assert len(collector.store) == 0
+
+
+def test_agent_with_a_wrong_token_is_refused(collector):
+    agent = Agent('intruder', '127.0.0.1', collector.port, flush_interval=0.05, token='guess')
+    agent.start()
+    agent.submit_rows(rows_for(0, 30))
+    wait_for(lambda: collector.stats()['errors'] >= 1)
+    agent.close(timeout=0.5)
+    assert len(collector.store) == 0 and 'intruder' not in collector.agents
+
+
+def test_collector_without_a_token_stays_on_loopback(tmp_path):
+    store = ResultStore(str(tmp_path / 'store'))
+    with pytest.raises(ValueError, match='token'):
+        asyncio.run(Collector(store, '0.0.0.0', 0).start())
+    store.close()
+
+
+def test_batch_that_decompresses_past_the_limit_is_rejected(monkeypatch):
+    payload = encode_batch(7, 1, rows_for(0, 3000))
+    assert len(decode_batch(payload)[4]) == 3000
+    monkeypatch.setattr(collector_module, 'MAX_BATCH', 16 * 1000)
+    with pytest.raises(ValueError, match='larger than'):
+        decode_batch(payload)
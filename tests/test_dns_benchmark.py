@@ -0,0 +1,89 @@
+import asyncio
+import socket
+
+from dns_benchmark import DnsBenchmark, ResolverClient, parse_resolver, start_stub_resolver
+
+DOMAINS = ['example.com', 'example.net', 'example.org', 'wikipedia.org', 'github.com']
+
+
+async def bench_stub(domains=DOMAINS, **kwargs):
+    transport, server, port = await start_stub_resolver(**kwargs)
+    try:
+        return await DnsBenchmark([f'127.0.0.1:{port}'], domains, timeout=1.0).bench_resolver(f'127.0.0.1:{port}')
+    finally:
+        transport.close()
+        server.close()
+        await server.wait_closed()
+
+
+def test_parse_resolver():
+    assert parse_resolver('9.9.9.9') == ('9.9.9.9', 53)
+    assert parse_resolver('127.0.0.1:5353') == ('127.0.0.1', 5353)
+
+
+def test_stub_answers_every_query():
+    async def query():
+        transport, server, port = await start_stub_resolver(address='10.1.2.3')
+        client = ResolverClient('127.0.0.1', port, timeout=1.0)
+        try:
+            await client.open()
+            return await client.query('example.com')
+        finally:
+            client.close()
+            transport.close()
+            server.close()
+            await server.wait_closed()
+
+    rtt, response, via = asyncio.run(query())
+    assert via == 'udp' and response['rcode'] == 0 and response['addresses'] == ['10.1.2.3']
+    assert rtt > 0
+
+
+def test_cold_pass_pays_for_cache_misses():
+    result = asyncio.run(bench_stub(miss_delay=0.05))
+    assert result['queries'] == result['answered']
+    assert result['timeouts'] == result['errors'] == result['tcp_fallbacks'] == 0
+    assert result['cold']['p50'] >= 50
+    assert result['warm']['p50'] < 50
+
+
+def test_cold_pass_misses_the_cache_on_every_run():
+    async def twice():
+        transport, server, port = await start_stub_resolver(miss_delay=0.05)
+        bench = DnsBenchmark([f'127.0.0.1:{port}'], DOMAINS, timeout=1.0)
+        try:
+            return [await bench.bench_resolver(f'127.0.0.1:{port}') for _ in range(2)]
+        finally:
+            transport.close()
+            server.close()
+            await server.wait_closed()
+
+    first, second = asyncio.run(twice())
+    # الأسماء الشائعة صارت في الذاكرة المؤقتة، لكن الاسم العشوائي لا يكون كذلك أبداً
+    assert first['cold']['p50'] >= 50 and second['cold']['p50'] >= 50
+    assert second['warm']['p50'] < 50
+    assert second['queries'] == 2 * len(DOMAINS)
+
+
+def test_truncated_answers_are_retried_over_tcp():
+    result = asyncio.run(bench_stub(truncate=True))
+    assert result['queries'] == result['answered'] == result['tcp_fallbacks']
+    assert result['errors'] == 0
+
+
+def test_refused_resolver_counts_errors():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    result = DnsBenchmark([f'127.0.0.1:{port}'], DOMAINS, timeout=1.0).run()[0]
+    assert result['answered'] == 0 and result['timeouts'] == 0
+    assert result['errors'] == result['queries'] > 0
+    assert result['cold']['p50'] is None
+
+
+def test_silent_resolver_times_out():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as silent:
+        silent.bind(('127.0.0.1', 0))
+        resolver = f'127.0.0.1:{silent.getsockname()[1]}'
+        result = DnsBenchmark([resolver], DOMAINS[:2], timeout=0.1).run()[0]
+    assert result['answered'] == 0 and result['timeouts'] == result['queries'] > 0
@@ -0,0 +1,53 @@
+import csv
+
+import pytest
+
+from exporters import EXPORT_COLUMNS, CsvExporter, Exporter
+from result_store import ResultStore
+
+START = 1_700_000_000 * 1_000_000
+
+
+def test_exporter_needs_the_file_methods(tmp_path):
+    store = ResultStore(str(tmp_path / 'store'))
+    with pytest.raises(TypeError):
+        Exporter(store, str(tmp_path / 'out.csv'))
+
+    class Partial(Exporter):
+        def open(self):
+            pass
+
+    with pytest.raises(TypeError):
+        Partial(store, str(tmp_path / 'out.csv'))
+    store.close()
+
+
+def test_since_last_appends_only_new_records(tmp_path):
+    store = ResultStore(str(tmp_path / 'store'))
+    path = str(tmp_path / 'out.csv')
+    store.append_many([(START + i * 1_000_000, '8.8.8.8', 'ping.avg', float(i)) for i in range(3)])
+    assert CsvExporter(store, path, since_last=True).run() == 3
+    store.append_many([(START + i * 1_000_000, '8.8.8.8', 'ping.avg', float(i)) for i in range(3, 5)])
+    assert CsvExporter(store, path, since_last=True).run() == 2
+
+    with open(path, newline='') as f:
+        rows = list(csv.reader(f))
+    assert rows[0] == EXPORT_COLUMNS
+    assert [row[1] for row in rows[1:]] == ['0.0', '1.0', '2.0', '3.0', '4.0']
+    store.close()
+
+
+def test_since_last_exports_late_rows_with_older_timestamps(tmp_path):
+    store = ResultStore(str(tmp_path / 'store'), chunk_rows=4)
+    path = str(tmp_path / 'out.csv')
+    store.append_many([(START + i * 1_000_000, '8.8.8.8', 'ping.avg', float(i)) for i in range(10, 15)])
+    assert CsvExporter(store, path, since_last=True).run() == 5
+    # صفوف مستوردة بعد التصدير لكنها أقدم من كل ما صدّر
+    store.append_many([(START + i * 1_000_000, '8.8.8.8', 'ping.avg', float(i)) for i in range(3)])
+    assert CsvExporter(store, path, since_last=True).run() == 3
+    assert CsvExporter(store, path, since_last=True).run() == 0
+
+    with open(path, newline='') as f:
+        rows = list(csv.reader(f))
+    assert [row[1] for row in rows[1:]] == ['10.0', '11.0', '12.0', '13.0', '14.0', '0.0', '1.0', '2.0']
+    store.close()
@@ -0,0 +1,104 @@
+import asyncio
+import shutil
+import subprocess
+
+import pytest
+
+from http_probe import HttpProber, LocalHttpServer
+
+
+@pytest.fixture
+def server():
+    server = LocalHttpServer(body_size=4096)
+    server.start()
+    yield server
+    server.close()
+
+
+@pytest.fixture(scope='module')
+def certificate(tmp_path_factory):
+    if shutil.which('openssl') is None:
+        pytest.skip("needs the openssl command for a self-signed certificate")
+    directory = tmp_path_factory.mktemp('cert')
+    cert, key = str(directory / 'cert.pem'), str(directory / 'key.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '1',
+                    '-keyout', key, '-out', cert, '-subj', '/CN=localhost',
+                    '-addext', 'subjectAltName=IP:127.0.0.1,DNS:localhost'],
+                   check=True, capture_output=True)
+    return cert, key
+
+
+def fetch(prober, url, times=2):
+    async def main():
+        return [await prober.request(url) for _ in range(times)]
+
+    try:
+        return asyncio.run(main())
+    finally:
+        prober.close()
+
+
+def test_request_times_every_phase(server):
+    first, = fetch(HttpProber(), server.url, times=1)
+    assert first['success'] and first['status'] == 200 and first['bytes'] == 4096
+    assert first['tls'] is None and not first['resumed']
+    for phase in ('dns', 'connect', 'ttfb', 'transfer'):
+        assert first[phase] >= 0
+    assert first['latency'] == pytest.approx(first['dns'] + first['connect'] + first['ttfb'] + first['transfer'])
+    assert first['warm_total'] is not None and not first['pooled']
+    assert f"{server.url}: HTTP 200, 4096 bytes" in first['output']
+
+
+def test_warm_requests_reuse_the_pooled_connection(server):
+    prober = HttpProber()
+
+    async def main():
+        first = await prober.request(server.url)
+        idle = sum(len(connections) for connections in prober.pool.values())
+        second = await prober.request(server.url)
+        return first, idle, second
+
+    try:
+        first, idle, second = asyncio.run(main())
+    finally:
+        prober.close()
+    assert idle == 1
+    assert not first['pooled'] and second['pooled']
+    assert "over the pooled connection" in second['output']
+
+
+def test_keep_alive_off_leaves_no_idle_connection(server):
+    prober = HttpProber(keep_alive=False)
+    results = fetch(prober, server.url)
+    assert not any(result['pooled'] for result in results)
+    assert prober.pool == {}
+
+
+def test_https_resumes_the_cached_session(certificate):
+    server = LocalHttpServer(body_size=1024, certfile=certificate[0], keyfile=certificate[1])
+    url = server.start()
+    try:
+        first, second = fetch(HttpProber(ca_file=certificate[0]), url)
+        plain = fetch(HttpProber(session_cache=False, ca_file=certificate[0]), url)
+    finally:
+        server.close()
+    assert url.startswith('https://')
+    assert first['success'] and first['tls'] is not None
+    assert not first['resumed'] and second['resumed']
+    assert "resumed" in second['output']
+    assert not any(result['resumed'] for result in plain)
+
+
+def test_unverified_certificate_fails(certificate):
+    server = LocalHttpServer(certfile=certificate[0], keyfile=certificate[1])
+    url = server.start()
+    try:
+        with pytest.raises(OSError):
+            fetch(HttpProber(), url, times=1)
+    finally:
+        server.close()
+
+
+def test_unsupported_url_is_rejected():
+    with pytest.raises(ValueError):
+        fetch(HttpProber(), 'ftp://127.0.0.1/', times=1)
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from exporters import EXPORTERS
+from importers import Importer
+from result_store import ResultStore
+
+START = 1_700_000_000 * 1_000_000
+METRICS = [('8.8.8.8', 'ping.avg'), ('google.com', 'dns.success'), ('speedtest', 'speed.download'),
+           ('speedtest', 'speed.upload'), ('speedtest', 'speed.ping'), ('8.8.8.8', 'ping.loss')]
+
+
+def exported(tmp_path, extension, records=200):
+    source = ResultStore(str(tmp_path / ('source' + extension)))
+    source.append_many([(START + i * 1_000_000, target, metric, float(i % 50))
+                        for i in range(records) for target, metric in METRICS])
+    path = str(tmp_path / ('export' + extension))
+    EXPORTERS[extension](source, path).run()
+    rows = source.query()
+    source.close()
+    return path, rows
+
+
+def named(store, rows):
+    return sorted((int(row['ts']), store.targets[row['target']], store.metrics[row['metric']], float(row['value']))
+                  for row in rows)
+
+
+def test_json_lines_round_trip(tmp_path):
+    path, rows = exported(tmp_path, '.jsonl')
+    source = ResultStore(str(tmp_path / 'source.jsonl'))
+    store = ResultStore(str(tmp_path / 'import'))
+    stats = Importer(store, [path], workers=1).run()
+    assert stats['errors'] == []
+    assert stats['imported'] == len(store) == len(rows)
+    assert (stats['start'], stats['end']) == (START, START + 199 * 1_000_000)
+    assert named(store, store.query()) == named(source, rows)
+    store.close()
+    source.close()
+
+
+def test_csv_rows_without_targets_match_stored_results(tmp_path):
+    path, rows = exported(tmp_path, '.csv')
+    store = ResultStore(str(tmp_path / 'import'))
+    # الجدول لا يحفظ ping.loss ولا أهداف ping وDNS
+    assert Importer(store, [path], workers=1).run()['imported'] == 200 * 5
+    source = ResultStore(str(tmp_path / 'source.csv'))
+    stats = Importer(source, [path], workers=1).run()
+    assert stats['imported'] == 0 and len(source) == len(rows)
+    source.close()
+    store.close()
+
+
+def test_second_import_finds_only_duplicates(tmp_path):
+    path, rows = exported(tmp_path, '.jsonl')
+    store = ResultStore(str(tmp_path / 'import'))
+    assert Importer(store, [path], workers=1).run()['imported'] == len(rows)
+    again = Importer(store, [path], workers=1).run()
+    assert again['imported'] == 0 and again['duplicates'] == len(rows)
+    assert len(store) == len(rows)
+    store.close()
+
+
+def test_parallel_import_of_several_files(tmp_path):
+    jsonl, rows = exported(tmp_path, '.jsonl')
+    csv, _ = exported(tmp_path, '.csv')
+    store = ResultStore(str(tmp_path / 'import'))
+    stats = Importer(store, [jsonl, csv], workers=2, batch_rows=100).run()
+    assert stats['errors'] == []
+    assert stats['rows'] == len(rows) + 200 * 5
+    assert stats['imported'] == len(store) == len(rows)
+    stored = store.query()
+    assert len(np.unique(stored[['ts', 'target', 'metric']])) == len(stored)
+    store.close()
+
+
+def test_unreadable_file_is_reported(tmp_path):
+    path = tmp_path / 'broken.json'
+    path.write_text('[{"timestamp": "2023-11-14 22:13:20"},')
+    store = ResultStore(str(tmp_path / 'import'))
+    stats = Importer(store, [str(path)], workers=1).run()
+    assert len(stats['errors']) == 1 and stats['errors'][0][0] == str(path)
+    store.close()
+
+
+def test_unsupported_extension_is_rejected(tmp_path):
+    store = ResultStore(str(tmp_path / 'import'))
+    with pytest.raises(ValueError):
+        Importer(store, [str(tmp_path / 'results.txt')])
+    store.close()
+
+
+def test_file_given_twice_is_read_once(tmp_path):
+    path, rows = exported(tmp_path, '.jsonl')
+    other = tmp_path / 'other'
+    other.mkdir()
+    store = ResultStore(str(tmp_path / 'import'))
+    importer = Importer(store, [path, path, str(other / '..' / 'export.jsonl')], workers=2, batch_rows=100)
+    assert importer.paths == [path]
+    stats = importer.run()
+    assert stats['files'] == 1 and stats['rows'] == stats['imported'] == len(rows)
+    assert stats['errors'] == []
+    store.close()
@@ -0,0 +1,87 @@
+import asyncio
+import configparser
+import socket
+
+import pytest
+
+from latency_histogram import LatencyHistogram
+from latency_prober import LatencyProber, LatencySampler, start_udp_echo_responder, summarize
+
+
+async def probe_echo(prober):
+    transport, port = await start_udp_echo_responder()
+    prober.udp_port = port
+    try:
+        return await prober.probe('127.0.0.1')
+    finally:
+        transport.close()
+
+
+def test_udp_probe_against_the_loopback_responder():
+    prober = LatencyProber(count=5, interval=0.01, timeout=1.0, method='udp')
+    stats = asyncio.run(probe_echo(prober))
+    assert stats['method'] == 'udp' and stats['address'] == '127.0.0.1'
+    assert (stats['sent'], stats['received'], stats['loss']) == (5, 5, 0)
+    assert 0 < stats['min'] <= stats['avg'] <= stats['max'] < 1000
+    assert "5 packets transmitted, 5 received, 0% packet loss" in stats['output']
+
+
+def test_silent_host_is_reported_as_loss():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as silent:
+        silent.bind(('127.0.0.1', 0))
+        prober = LatencyProber(count=3, interval=0.01, timeout=0.1, method='udp',
+                               udp_port=silent.getsockname()[1])
+        stats = prober.ping('127.0.0.1')
+    assert (stats['sent'], stats['received'], stats['loss']) == (3, 0, 100)
+    assert stats['avg'] is None and "100% packet loss" in stats['output']
+
+
+def test_tcp_probe_times_the_handshake():
+    with socket.socket() as listener:
+        listener.bind(('127.0.0.1', 0))
+        listener.listen(8)
+        prober = LatencyProber(count=3, interval=0.01, method='tcp', tcp_port=listener.getsockname()[1])
+        stats = prober.ping('127.0.0.1')
+    assert stats['method'] == 'tcp' and stats['received'] == 3
+
+
+def test_summarize_counts_lost_samples():
+    stats = summarize([(0, 1000), (1, None), (2, 3000), (3, None)])
+    assert (stats['sent'], stats['received'], stats['loss']) == (4, 2, 50)
+    assert (stats['min'], stats['avg'], stats['max'], stats['mdev']) == (1.0, 2.0, 3.0, 1.0)
+
+
+def test_sampler_closes_full_windows():
+    windows = []
+
+    async def run():
+        transport, port = await start_udp_echo_responder()
+        stop = asyncio.Event()
+        sampler = LatencySampler('127.0.0.1', rate=100, window=0.1,
+                                 prober=LatencyProber(timeout=0.2, method='udp', udp_port=port))
+
+        def on_window(summary):
+            windows.append(summary)
+            if len(windows) == 3:
+                stop.set()
+
+        try:
+            await asyncio.wait_for(sampler.run(on_window, stop), 10)
+        finally:
+            transport.close()
+
+    asyncio.run(run())
+    assert len(windows) >= 3
+    for summary in windows[:3]:
+        assert summary['sent'] == 10 and summary['received'] == 10 and summary['loss'] == 0
+        assert summary['p50'] is not None
+        assert LatencyHistogram.from_dict(summary['histogram']).total == 10
+
+
+def test_probe_count_must_be_positive():
+    config = configparser.ConfigParser()
+    config.read_string("[Probes]\nping_count = 0\n")
+    with pytest.raises(ValueError):
+        LatencyProber.from_config(config)
+    with pytest.raises(ValueError):
+        LatencyProber(count=-1)
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+matplotlib = pytest.importorskip('matplotlib')
+matplotlib.use('Agg')
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg  # noqa: E402
+from matplotlib.figure import Figure  # noqa: E402
+
+from live_graphs import LivePlot  # noqa: E402
+
+
+def make_plot(size):
+    figure = Figure(figsize=(8, 4))
+    canvas = FigureCanvasAgg(figure)
+    plot = LivePlot(canvas, figure.add_subplot(111))
+    plot.add_series('ping', 'b-', 'Ping')
+    xs = 20000 + np.arange(size) / 86400
+    plot.extend('ping', xs, np.random.default_rng(0).lognormal(3, 0.3, size))
+    canvas.draw()
+    return canvas, plot
+
+
+def test_lines_are_decimated_to_the_pixel_width():
+    canvas, plot = make_plot(1_000_000)
+    plot.refresh(force=True)
+    line = plot.series['ping'][1]
+    assert len(line.get_xdata()) <= 2 * plot.ax.bbox.width + 8
+    assert line.get_ydata().max() == plot.series['ping'][0].y.values.max()
+
+
+def test_forced_refresh_redraws_the_axes_only_when_the_limits_change(monkeypatch):
+    canvas, plot = make_plot(10_000)
+    plot.refresh(force=True)
+    draws = []
+    monkeypatch.setattr(canvas, 'draw_idle', lambda: draws.append(1))
+    plot.refresh(force=True)
+    assert draws == []
+    plot.set_window(1 / 24)
+    assert draws == [1]
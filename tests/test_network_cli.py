@@ -0,0 +1,39 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from result_store import ResultStore
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize('signum', [signal.SIGINT, signal.SIGTERM])
+def test_signal_stops_a_run_and_closes_the_store(tmp_path, signum):
+    config = tmp_path / 'settings.ini'
+    config.write_text("[DNS]\ntimeout = 30\n")
+    store = tmp_path / 'store'
+    # محلل صامت يبقي الاختبار مشغولاً حتى تصل الإشارة
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as silent:
+        silent.bind(('127.0.0.1', 0))
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'network_cli', '--config', str(config), '--store', str(store),
+             '--ping', '127.0.0.1', '--no-speedtest', '--resolver', f'127.0.0.1:{silent.getsockname()[1]}', 'run'],
+            cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        try:
+            deadline = time.monotonic() + 20
+            while not (store / 'active.bin').exists():
+                assert time.monotonic() < deadline and process.poll() is None, "the run did not start"
+                time.sleep(0.05)
+            time.sleep(0.5)
+            process.send_signal(signum)
+            _, stderr = process.communicate(timeout=10)
+        finally:
+            process.kill()
+    assert process.returncode == 130
+    assert b"Interrupted." in stderr
+    ResultStore(str(store)).close()
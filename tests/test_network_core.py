@@ -0,0 +1,31 @@
+import threading
+
+import pytest
+
+from network_core import in_background
+
+
+def test_in_background_returns_the_result():
+    assert in_background(lambda: 42).result(timeout=5) == 42
+
+
+def test_in_background_raises_the_error():
+    def fail():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError, match="boom"):
+        in_background(fail).result(timeout=5)
+
+
+def test_in_background_uses_a_daemon_thread():
+    started, release = threading.Event(), threading.Event()
+
+    def work():
+        started.set()
+        release.wait(5)
+        return threading.current_thread().daemon
+
+    future = in_background(work)
+    assert started.wait(5) and not future.done()
+    release.set()
+    assert future.result(timeout=5) is True
@@ -0,0 +1,48 @@
+import asyncio
+
+from network_core import format_path, interpret_path
+from path_analyzer import PathAnalyzer, SimulatedPath
+
+
+def analyze(hops, rounds=200):
+    analyzer = PathAnalyzer('127.0.0.1', interval=0.002, timeout=0.05, window=rounds)
+
+    async def main():
+        stop = asyncio.Event()
+
+        def on_round(snapshot):
+            if analyzer.rounds >= rounds:
+                stop.set()
+
+        await analyzer.run(on_round, stop, transport=SimulatedPath(hops, seed=1))
+
+    asyncio.run(main())
+    return analyzer.snapshot()
+
+
+def test_loss_is_traced_to_the_first_lossy_hop():
+    hops = [(f'10.0.{ttl}.1', 0.5, 20 if ttl >= 4 else 40 if ttl == 2 else 0, 0.1) for ttl in range(1, 7)]
+    path = analyze(hops)
+    assert path['reached'] and len(path['hops']) == 6
+    assert [hop['address'] for hop in path['hops']] == [hop[0] for hop in hops]
+    for hop, (_, _, loss, _) in zip(path['hops'], hops):
+        assert abs(hop['loss'] - loss) < 10
+    # الفقد عند القفزة 2 وحدها تحديد لمعدل ICMP وليس فقداً حقيقياً
+    assert "Packet loss starts at hop 4 (10.0.4.1)" in interpret_path(path)
+
+
+def test_latency_step_is_reported_without_loss():
+    hops = [('10.0.1.1', 0.5, 0, 0), ('10.0.2.1', 1.0, 0, 0), ('10.0.3.1', 30.0, 0, 0), ('10.0.4.1', 30.5, 0, 0)]
+    path = analyze(hops, rounds=50)
+    verdict = interpret_path(path)
+    assert "No loss on the path" in verdict
+    assert "at hop 3 (10.0.3.1)" in verdict
+
+
+def test_silent_destination_ends_the_path():
+    hops = [('10.0.1.1', 0.5, 0, 0), ('10.0.2.1', 0.5, 0, 0), (None, 0.5, 0, 0)]
+    path = analyze(hops, rounds=20)
+    assert not path['reached']
+    assert "path ends after hop 2 (10.0.2.1)" in interpret_path(path)
+    lines = format_path(path)
+    assert lines[-1] == interpret_path(path) and len(lines) == 2 + len(path['hops']) + 1
@@ -0,0 +1,61 @@
+from result_store import ResultStore
+from rollups import HOUR, MINUTE, RollupEngine
+
+START = 1_700_000_000 * 1_000_000 // HOUR * HOUR
+
+
+def fill(store, minutes):
+    rows = []
+    for minute in range(minutes):
+        for second in range(0, 60, 10):
+            ts = START + minute * MINUTE + second * 1_000_000
+            rows.append((ts, '8.8.8.8', 'ping.avg', float(minute)))
+            rows.append((ts, 'example.com', 'dns.latency', 100.0 + second))
+    store.append_many(rows)
+    return rows
+
+
+def test_rollups_aggregate_each_minute(tmp_path):
+    store = ResultStore(str(tmp_path / 'store'))
+    fill(store, 120)
+    rollups = RollupEngine(store, offset=0)
+    assert rollups.update(now=START + 2 * HOUR) > 0
+
+    minutes = rollups.level_buckets('1min', target='8.8.8.8', metric='ping.avg')
+    assert len(minutes) == 120
+    assert minutes['count'].tolist() == [6] * 120
+    assert minutes['mean'].tolist() == [float(m) for m in range(120)]
+    hours = rollups.level_buckets('1h', metric='dns.latency')
+    assert hours['count'].tolist() == [360, 360]
+    assert hours['min'].tolist() == [100.0, 100.0] and hours['max'].tolist() == [150.0, 150.0]
+    store.close()
+
+
+def test_series_picks_a_coarser_level_for_long_ranges(tmp_path):
+    store = ResultStore(str(tmp_path / 'store'))
+    fill(store, 120)
+    rollups = RollupEngine(store, offset=0)
+    rollups.update(now=START + 2 * HOUR)
+
+    resolution, buckets = rollups.series(target='8.8.8.8', metric='ping.avg', max_points=1000)
+    assert resolution == 'raw' and len(buckets) == 720
+    resolution, buckets = rollups.series(START, START + 2 * HOUR - 1, target='8.8.8.8',
+                                         metric='ping.avg', max_points=200)
+    assert resolution == '1min' and len(buckets) == 120
+    store.close()
+
+
+def test_backfill_replaces_sealed_buckets(tmp_path):
+    store = ResultStore(str(tmp_path / 'store'))
+    fill(store, 60)
+    rollups = RollupEngine(store, offset=0)
+    rollups.update(now=START + HOUR)
+    old = START + 5 * MINUTE + 5_000_000
+    store.append(old, '8.8.8.8', 'ping.avg', 1000.0)
+
+    assert rollups.level_buckets('1min', START + 5 * MINUTE, START + 5 * MINUTE,
+                                 target='8.8.8.8')['count'].tolist() == [6]
+    rollups.backfill(old, old)
+    bucket = rollups.level_buckets('1min', START + 5 * MINUTE, START + 5 * MINUTE, target='8.8.8.8')
+    assert bucket['count'].tolist() == [7] and bucket['max'].tolist() == [1000.0]
+    store.close()
@@ -0,0 +1,107 @@
+import threading
+import time
+
+from scheduler import Scheduler
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def advance(scheduler, clock, seconds):
+    clock.now += seconds
+    with scheduler.condition:
+        scheduler.condition.notify()
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_long_jobs_do_not_delay_short_ones():
+    clock = FakeClock()
+    scheduler = Scheduler(clock=clock)
+    release = threading.Event()
+    pings = []
+    try:
+        scheduler.add_job('speedtest', 900, release.wait)
+        scheduler.add_job('dnsbench', 300, release.wait)
+        scheduler.add_job('ping', 1, lambda: pings.append(clock.now))
+        for expected in range(1, 4):
+            wait_for(lambda: len(pings) == expected)
+            advance(scheduler, clock, 1)
+        stats = scheduler.stats()
+        assert pings == [0.0, 1.0, 2.0]
+        assert stats['speedtest']['running'] and stats['dnsbench']['running']
+        assert stats['ping']['skipped'] == 0
+    finally:
+        release.set()
+        scheduler.stop(wait=True)
+
+
+def test_tick_during_a_run_is_skipped():
+    clock = FakeClock()
+    scheduler = Scheduler(clock=clock)
+    release = threading.Event()
+    try:
+        scheduler.add_job('slow', 1, release.wait)
+        wait_for(lambda: scheduler.stats()['slow']['running'])
+        advance(scheduler, clock, 1)
+        wait_for(lambda: scheduler.stats()['slow']['skipped'] == 1)
+        assert scheduler.stats()['slow']['runs'] == 1
+    finally:
+        release.set()
+        scheduler.stop(wait=True)
+
+
+def test_queue_policy_runs_once_after_the_overrun():
+    clock = FakeClock()
+    scheduler = Scheduler(overrun='queue', clock=clock)
+    release = threading.Event()
+    try:
+        scheduler.add_job('slow', 1, release.wait)
+        wait_for(lambda: scheduler.stats()['slow']['running'])
+        advance(scheduler, clock, 1)
+        wait_for(lambda: scheduler.jobs['slow'].queued)
+        release.set()
+        wait_for(lambda: scheduler.stats()['slow']['runs'] == 2 and not scheduler.stats()['slow']['running'])
+        assert scheduler.stats()['slow']['skipped'] == 0
+    finally:
+        release.set()
+        scheduler.stop(wait=True)
+
+
+def test_run_once_does_not_overlap_itself():
+    scheduler = Scheduler()
+    release = threading.Event()
+    results = []
+    try:
+        assert scheduler.run_once('tests', release.wait, results.append)
+        assert not scheduler.run_once('tests', release.wait)
+        release.set()
+        wait_for(lambda: results == [True])
+        assert scheduler.run_once('tests', lambda: 'again', results.append)
+        wait_for(lambda: results == [True, 'again'])
+    finally:
+        scheduler.stop(wait=True)
+
+
+def test_run_once_is_capped_by_max_runs():
+    scheduler = Scheduler(max_runs=2)
+    release = threading.Event()
+    try:
+        assert scheduler.run_once('a', release.wait)
+        assert scheduler.run_once('b', release.wait)
+        assert not scheduler.run_once('c', release.wait)
+        release.set()
+        wait_for(lambda: not scheduler.threads)
+        assert scheduler.run_once('c', lambda: None)
+    finally:
+        scheduler.stop(wait=True)
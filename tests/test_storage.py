@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from result_store import MAX_NAMES, ResultStore
+
+MINUTE = 60_000_000
+START = 1_700_000_000 * 1_000_000 // (60 * MINUTE) * (60 * MINUTE)
+
+
+def fill(store, minutes):
+    rows = []
+    for minute in range(minutes):
+        for second in range(0, 60, 10):
+            ts = START + minute * MINUTE + second * 1_000_000
+            rows.append((ts, '8.8.8.8', 'ping.avg', float(minute)))
+            rows.append((ts, 'example.com', 'dns.latency', 100.0 + second))
+    store.append_many(rows)
+    return rows
+
+
+def test_query_filters_across_sealed_chunks(tmp_path):
+    store = ResultStore(str(tmp_path / 'store'), chunk_rows=50)
+    rows = fill(store, 30)
+    assert len(store) == len(rows)
+    assert store.catalog['chunks'], "rows should have been sealed into chunks"
+
+    ping = store.query(target='8.8.8.8', metric='ping.avg')
+    assert len(ping) == len(rows) // 2
+    window = store.query(START + 10 * MINUTE, START + 20 * MINUTE - 1, metric='ping.avg')
+    assert sorted(set(window['value'].tolist())) == [float(m) for m in range(10, 20)]
+    assert len(store.query(target='unknown')) == 0
+    assert store.time_range() == (START, rows[-1][0])
+    store.close()
+
+
+def test_store_reopens_with_its_rows(tmp_path):
+    store = ResultStore(str(tmp_path / 'store'), chunk_rows=50)
+    rows = fill(store, 5)
+    store.close()
+    store = ResultStore(str(tmp_path / 'store'), chunk_rows=50)
+    assert len(store) == len(rows)
+    assert np.array_equal(store.tail(3)['ts'], [row[0] for row in rows[-3:]])
+    store.close()
+
+
+def test_latest_records_counts_timestamps_not_rows(tmp_path):
+    store = ResultStore(str(tmp_path / 'store'), chunk_rows=50)
+    rows = fill(store, 30)
+    # سجل قديم مستورد بعد الجديد لا يزيح السجلات الأحدث
+    store.append(START - MINUTE, '8.8.8.8', 'ping.avg', 1.0)
+    latest = store.latest_records(5)
+    assert len(np.unique(latest['ts'])) == 5 and len(latest) == 10
+    assert latest['ts'].tolist() == sorted(row[0] for row in rows[-10:])
+    assert len(store.latest_records(10_000)) == len(rows) + 1
+    assert len(store.latest_records(0)) == 0
+    store.close()
+
+
+def test_iter_records_merges_overlapping_chunks_by_time(tmp_path):
+    store = ResultStore(str(tmp_path / 'store'), chunk_rows=50)
+    rows = fill(store, 20)
+    # استيراد متأخر يعيد نفس الطوابع الزمنية بمقياس آخر في مقاطع لاحقة
+    store.append_many([(ts, '8.8.8.8', 'ping.loss', 0.0) for ts, target, _, _ in rows if target == '8.8.8.8'])
+    records = list(store.iter_records())
+    stamps = [record['ts'] for record in records]
+    assert stamps == sorted(set(ts for ts, _, _, _ in rows))
+    assert all(len(record['values']) == 3 for record in records)
+    window = list(store.iter_records(START + 5 * MINUTE, START + 6 * MINUTE - 1))
+    assert [record['ts'] for record in window] == [START + 5 * MINUTE + s * 1_000_000 for s in range(0, 60, 10)]
+    store.close()
+
+
+def test_too_many_names_is_an_error(tmp_path):
+    store = ResultStore(str(tmp_path / 'store'))
+    names = [f'host-{i}' for i in range(MAX_NAMES)]
+    store.catalog['targets'].extend(names)
+    store._target_ids.update((name, i) for i, name in enumerate(names))
+    assert store.intern_target('host-7') == 7
+    with pytest.raises(ValueError, match='at most 65536 target names'):
+        store.append(START, 'one-too-many', 'ping.avg', 1.0)
+    assert len(store) == 0
+    store.close()
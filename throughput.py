@@ -0,0 +1,221 @@
+import os
+import socket
+import socketserver
+import struct
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_PORT = 5201
+DEFAULT_STREAMS = 4
+DEFAULT_DURATION = 5.0
+DEFAULT_WARMUP = 1.0
+DEFAULT_BUFFER_SIZE = 128 * 1024
+
+MAGIC = b'NPT1'
+DOWNLOAD = 0
+UPLOAD = 1
+# magic, direction, duration (s), warm-up (s)
+_REQUEST = struct.Struct('!4sBdd')
+# bytes received after the warm-up, seconds they took
+_REPORT = struct.Struct('!Qd')
+
+
+def _recv_exact(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("Connection closed during handshake")
+        data += chunk
+    return data
+
+
+def _payload_file(size):
+    payload = tempfile.TemporaryFile()
+    payload.write(os.urandom(size))
+    payload.flush()
+    return payload
+
+
+def send_for(sock, payload, size, duration):
+    """Send ``payload`` repeatedly for ``duration`` seconds.
+
+    ``os.sendfile`` copies straight from the page cache into the socket;
+    where it is missing the bytes go through one reused ``memoryview``.
+    """
+    deadline = time.monotonic() + duration
+    sent = 0
+    fd = sock.fileno()
+    if hasattr(os, 'sendfile'):
+        file_fd = payload.fileno()
+        while time.monotonic() < deadline:
+            sent += os.sendfile(fd, file_fd, 0, size)
+    else:
+        payload.seek(0)
+        view = memoryview(payload.read(size))
+        while time.monotonic() < deadline:
+            sent += sock.send(view)
+    return sent
+
+
+def receive_until_eof(sock, buffer_size, warmup):
+    """Read until the sender closes; returns bytes and seconds after the warm-up."""
+    view = memoryview(bytearray(buffer_size))
+    warm_end = time.monotonic() + warmup
+    counted = 0
+    last = warm_end
+    while True:
+        received = sock.recv_into(view)
+        if not received:
+            break
+        now = time.monotonic()
+        # البايتات خلال فترة الإحماء (بطء البداية في TCP) لا تحسب
+        if now >= warm_end:
+            counted += received
+            last = now
+    return counted, max(last - warm_end, 0.0)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        sock = self.request
+        server = self.server
+        sock.settimeout(server.stream_timeout)
+        magic, direction, duration, warmup = _REQUEST.unpack(_recv_exact(sock, _REQUEST.size))
+        if magic != MAGIC:
+            return
+        sock.settimeout(None)
+        if direction == DOWNLOAD:
+            send_for(sock, server.payload, server.buffer_size, duration)
+            sock.shutdown(socket.SHUT_WR)
+            sock.settimeout(server.stream_timeout)
+            # ننتظر إغلاق العميل حتى لا تضيع البيانات المتبقية في المخزن
+            while sock.recv(4096):
+                pass
+        else:
+            sock.settimeout(duration + server.stream_timeout)
+            counted, seconds = receive_until_eof(sock, server.buffer_size, warmup)
+            sock.sendall(_REPORT.pack(counted, seconds))
+
+
+class ThroughputServer(socketserver.ThreadingTCPServer):
+    """iperf-style endpoint: one thread per stream, sends or sinks data on request."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, host='0.0.0.0', port=DEFAULT_PORT, buffer_size=DEFAULT_BUFFER_SIZE, timeout=5.0):
+        super().__init__((host, port), _Handler)
+        self.buffer_size = buffer_size
+        self.stream_timeout = timeout
+        self.payload = _payload_file(buffer_size)
+        self.thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        """Serve from a background thread; returns the bound port."""
+        self.thread = threading.Thread(target=self.serve_forever, name='throughput-server', daemon=True)
+        self.thread.start()
+        return self.port
+
+    def server_close(self):
+        super().server_close()
+        self.payload.close()
+
+    def close(self):
+        if self.thread is not None:
+            self.shutdown()
+            self.thread = None
+        self.server_close()
+
+
+class ThroughputClient:
+    """Multi-stream TCP download/upload test against a ``ThroughputServer``.
+
+    Each direction opens ``streams`` parallel connections for ``duration``
+    seconds. The receiving side measures, ignoring the first ``warmup``
+    seconds, and the result is the sum of the per-stream rates in Mbps.
+    """
+
+    def __init__(self, host, port=DEFAULT_PORT, streams=DEFAULT_STREAMS, duration=DEFAULT_DURATION,
+                 warmup=DEFAULT_WARMUP, buffer_size=DEFAULT_BUFFER_SIZE, timeout=5.0):
+        if duration <= warmup:
+            raise ValueError("Duration must be longer than the warm-up.")
+        self.host = host
+        self.port = port
+        self.streams = streams
+        self.duration = duration
+        self.warmup = warmup
+        self.buffer_size = buffer_size
+        self.timeout = timeout
+
+    @classmethod
+    def from_config(cls, config):
+        """None when no ``[Throughput] host`` is configured."""
+        host = config.get('Throughput', 'host', fallback='').strip()
+        if not host:
+            return None
+        return cls(
+            host,
+            port=config.getint('Throughput', 'port', fallback=DEFAULT_PORT),
+            streams=config.getint('Throughput', 'streams', fallback=DEFAULT_STREAMS),
+            duration=config.getfloat('Throughput', 'duration', fallback=DEFAULT_DURATION),
+            warmup=config.getfloat('Throughput', 'warmup', fallback=DEFAULT_WARMUP),
+            buffer_size=config.getint('Throughput', 'buffer_size', fallback=DEFAULT_BUFFER_SIZE),
+        )
+
+    def _connect(self, direction):
+        started = time.monotonic()
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        connect_time = (time.monotonic() - started) * 1000
+        sock.sendall(_REQUEST.pack(MAGIC, direction, self.duration, self.warmup))
+        return sock, connect_time
+
+    def _download_stream(self):
+        sock, connect_time = self._connect(DOWNLOAD)
+        with sock:
+            sock.settimeout(self.duration + self.timeout)
+            counted, seconds = receive_until_eof(sock, self.buffer_size, self.warmup)
+        return counted, seconds, connect_time
+
+    def _upload_stream(self, payload):
+        sock, connect_time = self._connect(UPLOAD)
+        with sock:
+            sock.settimeout(None)
+            send_for(sock, payload, self.buffer_size, self.duration)
+            sock.shutdown(socket.SHUT_WR)
+            sock.settimeout(self.timeout)
+            counted, seconds = _REPORT.unpack(_recv_exact(sock, _REPORT.size))
+        return counted, seconds, connect_time
+
+    def _run_streams(self, stream):
+        with ThreadPoolExecutor(max_workers=self.streams) as pool:
+            results = list(pool.map(lambda _: stream(), range(self.streams)))
+        mbps = sum(counted * 8 / seconds for counted, seconds, _ in results if seconds) / 1_000_000
+        return mbps, [connect_time for _, _, connect_time in results]
+
+    def download(self):
+        return self._run_streams(self._download_stream)[0]
+
+    def upload(self):
+        with _payload_file(self.buffer_size) as payload:
+            return self._run_streams(lambda: self._upload_stream(payload))[0]
+
+    def run(self):
+        """Same fields as the speedtest.net result; ``ping`` is the mean TCP connect time."""
+        download, connect_times = self._run_streams(self._download_stream)
+        with _payload_file(self.buffer_size) as payload:
+            upload, more_times = self._run_streams(lambda: self._upload_stream(payload))
+        connect_times += more_times
+        return {
+            'download': download,
+            'upload': upload,
+            'ping': sum(connect_times) / len(connect_times),
+            'server': f"{self.host}:{self.port}",
+            'streams': self.streams,
+        }